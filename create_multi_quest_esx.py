@@ -1,18 +1,34 @@
 """Script to create an ESX file with multiple quests, each with one objective and multiple aliases"""
 
+import logging
+import os
 import sys
+from dataclasses import replace
+from typing import Dict, List, Optional
 
 from esx_lib import (
+    COUNTERS,
     ESXTES4,
     # ESXAlias, # No longer needed for manual creation
     ESXElement,
     # ESXObjective, # No longer needed for manual creation
     ESXPlugin,
     ESXQuest,
+    ESXValidationError,
+    FormID,
     FormIDManager,
+    configure_logging,
+    extract_log_args,
+    extract_profile_args,
+    profiled,
+    profiling,
+    report_counters,
     validate_esl_compatibility,
     write_plugin_to_xml,
 )
+from esx_planner import CapacityPlan, Category, plan_capacity
+
+logger = logging.getLogger("esx.multi_quest")
 
 # --- Configuration Constants ---
 
@@ -48,45 +64,116 @@ REG_MULTI_OBJECTIVE_NAME_FORMAT = "Reg Multi Objective {objective_index}"
 REG_MULTI_ALIAS_NAME_FORMAT = "Obj{objective_index}_Ref{target_idx}"
 
 
+# Alias names are generator-specific; the planner only sizes the quests
+ALIAS_NAME_FORMATS = {
+    "Misc": MISC_ALIAS_NAME_FORMAT,
+    "Reg Single": REG_SINGLE_ALIAS_NAME_FORMAT,
+    "Reg Multi": REG_MULTI_ALIAS_NAME_FORMAT,
+}
+
+
+def quest_categories(fill: bool = False) -> List[Category]:
+    """The demand described by the configuration constants
+
+    With ``fill`` the alias counts are minimums and the planner grows them
+    into the spare FormIDs; otherwise they are used exactly.
+    """
+    categories = [
+        Category(
+            "Misc",
+            quests=MISC_QUEST_COUNT,
+            objectives=MISC_OBJECTIVES_PER_QUEST,
+            min_aliases=MISC_ALIASES_PER_OBJECTIVE,
+            quest_type=MISC_QUEST_TYPE,
+            editor_id_format=MISC_QUEST_EDITOR_ID_FORMAT,
+            full_name_format=MISC_QUEST_FULL_NAME_FORMAT,
+            objective_name_format=MISC_OBJECTIVE_NAME_FORMAT,
+        ),
+        Category(
+            "Reg Single",
+            quests=REG_SINGLE_QUEST_COUNT,
+            objectives=REG_SINGLE_OBJECTIVES_PER_QUEST,
+            min_aliases=REG_SINGLE_ALIASES_PER_OBJECTIVE,
+            quest_type=REG_SINGLE_QUEST_TYPE,
+            editor_id_format=REG_SINGLE_QUEST_EDITOR_ID_FORMAT,
+            full_name_format=REG_SINGLE_QUEST_FULL_NAME_FORMAT,
+            objective_name_format=REG_SINGLE_OBJECTIVE_NAME_FORMAT,
+        ),
+        Category(
+            "Reg Multi",
+            quests=REG_MULTI_QUEST_COUNT,
+            objectives=REG_MULTI_OBJECTIVES_PER_QUEST,
+            min_aliases=REG_MULTI_ALIASES_PER_OBJECTIVE,
+            quest_type=REG_MULTI_QUEST_TYPE,
+            editor_id_format=REG_MULTI_QUEST_EDITOR_ID_FORMAT,
+            full_name_format=REG_MULTI_QUEST_FULL_NAME_FORMAT,
+            objective_name_format=REG_MULTI_OBJECTIVE_NAME_FORMAT,
+        ),
+    ]
+    if fill:
+        return categories
+    return [replace(category, max_aliases=category.min_aliases) for category in categories]
+
+
+def plugin_output_file(output_file: str, plugin_index: int) -> str:
+    """Output path of one plugin of a plan: the first keeps the name, then _2, _3..."""
+    if plugin_index == 0:
+        return output_file
+    directory, name = os.path.split(output_file)
+    stem, dot, extensions = name.partition(".")
+    return os.path.join(directory, f"{stem}_{plugin_index + 1}{dot}{extensions}")
+
+
 def create_multi_quest_plugin(
     output_file: str,
     pretty_output: bool = False,  # Keep False for compatibility
+    strings_dir: Optional[str] = None,
+    fill: bool = False,
+    plugins: int = 1,
 ) -> bool:
     """
-    Create an ESX plugin file with multiple quests based on defined constants.
+    Create ESX plugin files with multiple quests based on defined constants.
 
     Args:
         output_file: Path to output ESX file
         pretty_output: Whether to format XML output with indentation (default: False)
+        strings_dir: If given, localize the plugin and write its string tables here
+        fill: Grow the aliases per objective to use the spare FormIDs
+        plugins: Number of ESL plugins to spread the quests over
 
     Returns:
         bool: Success status
     """
-    # Calculate total requirements for ESL check
-    total_quests = MISC_QUEST_COUNT + REG_SINGLE_QUEST_COUNT + REG_MULTI_QUEST_COUNT
-    total_misc_aliases = MISC_QUEST_COUNT * (
-        1 + MISC_OBJECTIVES_PER_QUEST * MISC_ALIASES_PER_OBJECTIVE
-    )  # +1 PlayerRef per quest
-    total_reg_single_aliases = REG_SINGLE_QUEST_COUNT * (
-        1 + REG_SINGLE_OBJECTIVES_PER_QUEST * REG_SINGLE_ALIASES_PER_OBJECTIVE
-    )
-    total_reg_multi_aliases = REG_MULTI_QUEST_COUNT * (
-        1 + REG_MULTI_OBJECTIVES_PER_QUEST * REG_MULTI_ALIASES_PER_OBJECTIVE
-    )
-    total_aliases = (
-        total_misc_aliases + total_reg_single_aliases + total_reg_multi_aliases
-    )
-    total_form_ids = total_quests + total_aliases
-
-    # Check if we'll exceed ESL limits
-    if total_form_ids > 2048:
-        print(
-            f"ERROR: Configuration would require {total_form_ids} form IDs, exceeding ESL limit of 2048"
-        )
+    # Check the ESL limits before building anything
+    try:
+        plan = plan_capacity(quest_categories(fill), plugins)
+    except ESXValidationError as e:
+        logger.error("%s", e)
         # Suggest reducing counts if over limit
-        print("Consider reducing counts in the configuration constants.")
+        logger.error("Consider reducing counts in the configuration constants or --plugins N.")
         return False
+    for line in plan.summary():
+        logger.info("Plan: %s", line)
+
+    for plugin_index in range(plan.plugins):
+        _create_planned_plugin(
+            plan,
+            plugin_index,
+            plugin_output_file(output_file, plugin_index),
+            pretty_output,
+            strings_dir,
+        )
+    return True
+
 
+def _create_planned_plugin(
+    plan: CapacityPlan,
+    plugin_index: int,
+    output_file: str,
+    pretty_output: bool,
+    strings_dir: Optional[str],
+) -> None:
+    """Build and write the quests a plan puts in one plugin"""
     # Create the plugin with version attribute
     plugin = ESXPlugin(tag="plugin", attrib={"version": "0.7.4"})
 
@@ -131,76 +218,34 @@ def create_multi_quest_plugin(
     total_alias_count = 0
     created_quests = []  # Store created quests to count later
     quest_global_index = 0  # To ensure unique quest indices for naming if needed
-
-    # --- Loop 1: Miscellaneous Quests ---
-    print("\n--- Creating Miscellaneous Quests ---")
-    for i in range(MISC_QUEST_COUNT):
+    quest_counts: Dict[str, int] = {}
+
+    # Quests come in category order: misc, regular single, regular multi
+    for planned in plan.quests_in(plugin_index):
+        category = planned.category
+        if category.name not in quest_counts:
+            logger.info("Creating %s quests", category.name)
+            quest_counts[category.name] = 0
         quest_global_index += 1
-        quest_idx = i + 1  # Index specific to this type
         quest, aliases_added = _create_quest_structure(
             form_manager,
-            quest_idx,
+            planned.index,
             quest_global_index,
-            MISC_QUEST_TYPE,
-            MISC_OBJECTIVES_PER_QUEST,
-            MISC_ALIASES_PER_OBJECTIVE,
-            MISC_QUEST_EDITOR_ID_FORMAT,
-            MISC_QUEST_FULL_NAME_FORMAT,
-            MISC_OBJECTIVE_NAME_FORMAT,
-            MISC_ALIAS_NAME_FORMAT,
+            category.quest_type or 0,
+            category.objectives,
+            planned.aliases_per_objective,
+            category.editor_id_format,
+            category.full_name_format,
+            category.objective_name_format,
+            ALIAS_NAME_FORMATS[category.name],
         )
         quest_group.add_record(quest)
         created_quests.append(quest)
+        quest_counts[category.name] += 1
         total_alias_count += aliases_added
 
-    # --- Loop 2: Regular Single-Objective Quests ---
-    print("\n--- Creating Regular Single-Objective Quests ---")
-    for i in range(REG_SINGLE_QUEST_COUNT):
-        quest_global_index += 1
-        quest_idx = i + 1  # Index specific to this type
-        quest, aliases_added = _create_quest_structure(
-            form_manager,
-            quest_idx,
-            quest_global_index,
-            REG_SINGLE_QUEST_TYPE,
-            REG_SINGLE_OBJECTIVES_PER_QUEST,
-            REG_SINGLE_ALIASES_PER_OBJECTIVE,
-            REG_SINGLE_QUEST_EDITOR_ID_FORMAT,
-            REG_SINGLE_QUEST_FULL_NAME_FORMAT,
-            REG_SINGLE_OBJECTIVE_NAME_FORMAT,
-            REG_SINGLE_ALIAS_NAME_FORMAT,
-        )
-        quest_group.add_record(quest)
-        created_quests.append(quest)
-        total_alias_count += aliases_added
-
-    # --- Loop 3: Regular Multi-Objective Quests ---
-    print("\n--- Creating Regular Multi-Objective Quests ---")
-    for i in range(REG_MULTI_QUEST_COUNT):  # This loops REG_MULTI_QUEST_COUNT (4) times
-        quest_global_index += 1
-        quest_idx = i + 1
-        # _create_quest_structure is called exactly ONCE per loop iteration
-        quest, aliases_added = _create_quest_structure(
-            form_manager,
-            quest_idx,
-            quest_global_index,
-            REG_MULTI_QUEST_TYPE,
-            REG_MULTI_OBJECTIVES_PER_QUEST,
-            REG_MULTI_ALIASES_PER_OBJECTIVE,
-            REG_MULTI_QUEST_EDITOR_ID_FORMAT,
-            REG_MULTI_QUEST_FULL_NAME_FORMAT,
-            REG_MULTI_OBJECTIVE_NAME_FORMAT,
-            REG_MULTI_ALIAS_NAME_FORMAT,
-        )
-        quest_group.add_record(quest)
-        created_quests.append(quest)
-        total_alias_count += aliases_added
-
-    # Calculate next available object ID AFTER all allocations
-    next_object_id_val = form_manager.allocate_next_id()
-    # We don't actually want to use this ID, just get its value, so remove it
-    form_manager.used_ids.remove(next_object_id_val)
-    next_object_id_hex = f"{next_object_id_val:08x}"
+    # Next object ID after all allocations (a filled plugin has none left to allocate)
+    next_object_id_hex = FormID(max(form_manager.used_ids, default=0x7FF) + 1).hex8
 
     # Create and insert HEDR element into TES4
     hedr = ESXElement("HEDR")
@@ -212,17 +257,22 @@ def create_multi_quest_plugin(
     hedr.append(ESXElement("struct", attrib=hedr_struct_attrib))
 
     # Insert HEDR as the first element within TES4
-    tes4.elements.insert(0, hedr)
-    hedr.parent = tes4  # Set parent manually
+    tes4.insert(0, hedr)
 
     # Validate the plugin
     is_compatible, form_count, esl_errors = validate_esl_compatibility(plugin)
 
-    print("\n=== Plugin Creation Summary ===")
+    if plan.plugins == 1:
+        print("\n=== Plugin Creation Summary ===")
+    else:
+        print(f"\n=== Plugin {plugin_index + 1}/{plan.plugins} Creation Summary ===")
     print(f"Total quests created: {len(created_quests)}")
-    print(f"  - Misc (Type {MISC_QUEST_TYPE}): {MISC_QUEST_COUNT}")
-    print(f"  - Reg Single (Type {REG_SINGLE_QUEST_TYPE}): {REG_SINGLE_QUEST_COUNT}")
-    print(f"  - Reg Multi (Type {REG_MULTI_QUEST_TYPE}): {REG_MULTI_QUEST_COUNT}")
+    for category in plan.categories:
+        print(
+            f"  - {category.name} (Type {category.quest_type}): "
+            f"{quest_counts.get(category.name, 0)}"
+            f" x {plan.aliases[category.name]} aliases per objective"
+        )
     print(f"Total aliases created: {total_alias_count}")
     print(f"Total form IDs used: {form_manager.get_used_count()}")
     print(f"ESL compatible: {is_compatible} (Used {form_count}/2048 FormIDs)")
@@ -232,13 +282,19 @@ def create_multi_quest_plugin(
         for error in esl_errors:
             print(f"  - {error}")
 
+    if strings_dir:
+        from esx_strings import localize_plugin, plugin_base_name
+
+        tables = localize_plugin(plugin)
+        tables.write(strings_dir, plugin_base_name(output_file))
+        print(f"Localized {len(tables)} unique strings into {os.path.abspath(strings_dir)}")
+
     # Write the plugin to file
     write_plugin_to_xml(plugin, output_file, pretty=pretty_output)
     print(f"\nWrote multi-quest plugin to {output_file}")
 
-    return True
-
 
+@profiled("build.quest")
 def _create_quest_structure(
     form_manager: FormIDManager,
     quest_idx: int,
@@ -256,15 +312,20 @@ def _create_quest_structure(
 
     # Allocate quest form ID
     quest_form_id = form_manager.allocate_next_id()
-    quest_form_id_hex = f"{quest_form_id:08x}"
+    quest_form_id_hex = quest_form_id.hex8
 
     # Create quest editor ID and name using formats
     quest_name = quest_full_name_format.format(quest_idx=quest_idx)
     quest_editor_id = quest_editor_id_format.format(quest_idx=quest_idx)
 
-    # These print statements are executed once at the start of the function call
-    print(f"  Creating quest {quest_idx}: {quest_name} (Global: {quest_global_index})")
-    print(f"    Form ID: 0x{quest_form_id:x}, Type: {quest_type}")
+    logger.debug(
+        "Creating quest %d: %s (Global: %d, Form ID: 0x%x, Type: %d)",
+        quest_idx,
+        quest_name,
+        quest_global_index,
+        quest_form_id,
+        quest_type,
+    )
 
     # Create quest record with attributes
     quest_attrib = {
@@ -298,7 +359,7 @@ def _create_quest_structure(
 
     # Add player reference alias manually
     player_ref_id = form_manager.allocate_next_id()
-    quest.append(ESXElement("ALST", text=str(player_ref_id)))
+    quest.append(ESXElement("ALST", text=player_ref_id.decimal))
     quest.append(ESXElement("ALID", text="PlayerRef"))
     quest.append(ESXElement("FNAM", text="0"))
     quest.append(ESXElement("ALFR", text="00000014"))  # Player reference FormID
@@ -334,7 +395,7 @@ def _create_quest_structure(
             )
 
             # Add alias elements
-            quest.append(ESXElement("ALST", text=str(target_id)))
+            quest.append(ESXElement("ALST", text=target_id.decimal))
             quest.append(ESXElement("ALID", text=alias_name))
             quest.append(ESXElement("FNAM", text="4242"))  # FNAM for ALST
             quest.append(ESXElement("VTCK", text="00000000"))
@@ -342,12 +403,12 @@ def _create_quest_structure(
 
             # Add QSTA (target data) element with nested struct
             qsta = ESXElement("QSTA")
-            qsta_struct_attrib = {"alias": str(target_id), "flags": "0x00000000"}
+            qsta_struct_attrib = {"alias": target_id.decimal, "flags": "0x00000000"}
             qsta.append(ESXElement("struct", attrib=qsta_struct_attrib))  # Nest struct
             quest.append(qsta)  # Append parent QSTA
 
             # Add CTDA (condition) element with nested elements
-            param1_hex = f"0x{target_id:08x}"  # Use correct alias FormID
+            param1_hex = target_id.prefixed  # Use correct alias FormID
             ctda = ESXElement("CTDA")
             ctda.append(ESXElement("operator", text="0x00"))
             ctda.append(ESXElement("unknown0", text="0x00,0x00,0x00"))
@@ -366,27 +427,58 @@ def _create_quest_structure(
     # Add alias count element (ANAM)
     quest.append(ESXElement("ANAM", text=str(total_quest_aliases_expected)))
 
+    COUNTERS.incr("build.quests")
+    COUNTERS.incr("build.objectives", objectives_per_quest)
+    COUNTERS.incr("build.aliases", aliases_created_count)
+
     return quest, aliases_created_count
 
 
 def main() -> None:
     """Main entry point"""
     output_file = "MultiQuestMarkers.esx"
+    args, profile_options = extract_profile_args(sys.argv[1:])
+    args, log_options = extract_log_args(args)
+    configure_logging(log_options)
 
     # Command line arguments are no longer used for counts, only output file
-    if len(sys.argv) > 1:
-        output_file = sys.argv[1]
+    # (plus -v/-vv/-q, --counters[=FILE], --profile, --profile-memory and
+    # --cprofile[=FILE]; --strings DIR writes a localized plugin; --fill grows
+    # the aliases into the spare FormIDs; --plugins N spreads the quests)
+    strings_dir = None
+    if "--strings" in args:
+        i = args.index("--strings")
+        strings_dir = args[i + 1]
+        del args[i : i + 2]
+    plugins = 1
+    if "--plugins" in args:
+        i = args.index("--plugins")
+        plugins = int(args[i + 1])
+        del args[i : i + 2]
+    fill = "--fill" in args
+    if fill:
+        args.remove("--fill")
+    if args:
+        output_file = args[0]
 
     try:
-        create_multi_quest_plugin(
-            output_file=output_file,
-            # Removed count arguments, using constants now
-        )
+        with profiling(profile_options):
+            succeeded = create_multi_quest_plugin(
+                output_file=output_file,
+                strings_dir=strings_dir,
+                fill=fill,
+                plugins=plugins,
+                # Removed count arguments, using constants now
+            )
+        report_counters(log_options)
+        if not succeeded:
+            sys.exit(1)
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
 
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,349 @@
+"""Batch parse/transform/validate/write over many ESX files on a process pool.
+
+Usage:
+    python esx_batch.py <dir|glob|file> [...] [--out DIR] [--transform NAME]
+                        [--pretty] [--workers N] [--report report.json]
+                        [--parser etree|expat] [--canonical]
+
+Each file is handled independently in a worker process; a file that fails
+is reported and does not stop the others. At most ``2 * workers`` files are
+in flight at once, so results are collected as the pool drains instead of
+queueing every job up front. Outputs under ``--out`` keep their paths
+relative to the inputs' common directory.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from esx_lib import (
+    ESXParser,
+    ESXPlugin,
+    ESXQuest,
+    PARSER_BACKENDS,
+    validate_esl_compatibility,
+    validate_quest_structure,
+    write_plugin_to_xml,
+)
+
+INPUT_EXTENSIONS = tuple(
+    base + suffix for base in (".esx", ".xml") for suffix in ("", ".gz", ".xz")
+)
+
+
+def _no_transform(plugin: ESXPlugin) -> None:
+    pass
+
+
+def _compact(plugin: ESXPlugin) -> None:
+    from esx_compact import compact_form_ids
+
+    compact_form_ids(plugin)
+
+
+TRANSFORMS: Dict[str, Callable[[ESXPlugin], None]] = {
+    "none": _no_transform,
+    "compact": _compact,
+}
+
+
+@dataclass
+class BatchJob:
+    """One file to process"""
+
+    input_file: str
+    output_file: Optional[str] = None
+    transform: str = "none"
+    pretty: bool = False
+    parser: str = "etree"
+    canonical: bool = False
+
+
+@dataclass
+class BatchResult:
+    """Outcome and timings for one file"""
+
+    input_file: str
+    output_file: Optional[str] = None
+    ok: bool = False
+    error: Optional[str] = None
+    quests: int = 0
+    aliases: int = 0
+    esl_compatible: bool = False
+    form_count: int = 0
+    validation_errors: List[str] = field(default_factory=list)
+    written: bool = False
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.timings.values())
+
+
+def process_file(job: BatchJob) -> BatchResult:
+    """Parse, transform, validate and (optionally) write one file
+
+    Runs in a worker process; errors are captured in the result.
+    """
+    result = BatchResult(input_file=job.input_file, output_file=job.output_file)
+    phase = "parse"
+    try:
+        start = time.perf_counter()
+        plugin = ESXParser().parse_file(job.input_file, backend=job.parser)
+        result.timings["parse"] = time.perf_counter() - start
+
+        phase = "transform"
+        start = time.perf_counter()
+        TRANSFORMS[job.transform](plugin)
+        result.timings["transform"] = time.perf_counter() - start
+
+        phase = "validate"
+        start = time.perf_counter()
+        for group in plugin.groups:
+            for record in group.records:
+                if isinstance(record, ESXQuest):
+                    result.quests += 1
+                    result.aliases += len(record.aliases)
+                    _, errors = validate_quest_structure(record)
+                    result.validation_errors.extend(
+                        f"{record.editor_id}: {error}" for error in errors
+                    )
+        is_compatible, form_count, esl_errors = validate_esl_compatibility(plugin)
+        result.esl_compatible = is_compatible
+        result.form_count = form_count
+        result.validation_errors.extend(esl_errors)
+        result.timings["validate"] = time.perf_counter() - start
+
+        if job.output_file:
+            phase = "write"
+            start = time.perf_counter()
+            os.makedirs(os.path.dirname(job.output_file) or ".", exist_ok=True)
+            result.written = write_plugin_to_xml(
+                plugin, job.output_file, pretty=job.pretty, canonical=job.canonical
+            )
+            result.timings["write"] = time.perf_counter() - start
+
+        result.ok = not result.validation_errors
+    except Exception as e:
+        result.error = f"{phase}: {type(e).__name__}: {e}"
+    return result
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """Resolve directories, globs and plain paths to a sorted list of files"""
+    files: Set[str] = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in os.listdir(pattern):
+                if name.lower().endswith(INPUT_EXTENSIONS):
+                    files.add(os.path.join(pattern, name))
+        elif glob.has_magic(pattern):
+            files.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        else:
+            files.add(pattern)
+    return sorted(files)
+
+
+def make_jobs(
+    input_files: List[str],
+    output_dir: Optional[str] = None,
+    transform: str = "none",
+    pretty: bool = False,
+    parser: str = "etree",
+    canonical: bool = False,
+) -> List[BatchJob]:
+    if transform not in TRANSFORMS:
+        raise ValueError(
+            f"Unknown transform {transform!r} (known: {', '.join(TRANSFORMS)})"
+        )
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(
+            f"Unknown parser {parser!r} (known: {', '.join(PARSER_BACKENDS)})"
+        )
+    output_files = _output_files(input_files, output_dir) if output_dir else {}
+    return [
+        BatchJob(
+            input_file, output_files.get(input_file), transform, pretty, parser, canonical
+        )
+        for input_file in input_files
+    ]
+
+
+def _output_files(input_files: List[str], output_dir: str) -> Dict[str, str]:
+    """Output path for each input, relative to the inputs' common directory
+
+    Same-named files from different directories (load-order variants) keep
+    their subdirectories apart instead of overwriting each other.
+    """
+    if not input_files:
+        return {}
+    inputs = {input_file: os.path.realpath(input_file) for input_file in input_files}
+    root = os.path.commonpath([os.path.dirname(path) for path in inputs.values()])
+    output_files: Dict[str, str] = {}
+    owners: Dict[str, str] = {}
+    sources = set(inputs.values())
+    for input_file, path in inputs.items():
+        output_file = os.path.join(output_dir, os.path.relpath(path, root))
+        resolved = os.path.realpath(output_file)
+        if resolved in sources:
+            raise ValueError(f"Output {output_file} would overwrite an input file")
+        if resolved in owners:
+            raise ValueError(
+                f"{input_file} and {owners[resolved]} would both be written to {output_file}"
+            )
+        owners[resolved] = input_file
+        output_files[input_file] = output_file
+    return output_files
+
+
+def run_batch(
+    jobs: List[BatchJob], workers: Optional[int] = None, max_pending: Optional[int] = None
+) -> Iterator[BatchResult]:
+    """Run jobs on a process pool, yielding results as they complete
+
+    No more than ``max_pending`` jobs (default ``2 * workers``) are
+    submitted ahead of the results being consumed.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    if workers == 1:
+        # No pool overhead for a single worker
+        for job in jobs:
+            yield process_file(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Dict[Future[BatchResult], BatchJob] = {}
+        queue = iter(jobs)
+        while True:
+            for job in queue:
+                pending[pool.submit(process_file, job)] = job
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # Worker crashed before it could report
+                    yield BatchResult(
+                        input_file=job.input_file,
+                        output_file=job.output_file,
+                        error=f"worker: {type(e).__name__}: {e}",
+                    )
+
+
+def summarize_results(results: List[BatchResult], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregate per-file results into a JSON-friendly report"""
+    phase_totals: Dict[str, float] = {}
+    for result in results:
+        for phase, seconds in result.timings.items():
+            phase_totals[phase] = phase_totals.get(phase, 0.0) + seconds
+    cpu_seconds = sum(result.seconds for result in results)
+    return {
+        "files": len(results),
+        "ok": sum(1 for r in results if r.ok),
+        "invalid": sum(1 for r in results if not r.ok and r.error is None),
+        "failed": sum(1 for r in results if r.error is not None),
+        "wall_seconds": wall_seconds,
+        "worker_seconds": cpu_seconds,
+        "parallelism": cpu_seconds / wall_seconds if wall_seconds else 0.0,
+        "phase_seconds": phase_totals,
+        "results": [asdict(r) for r in sorted(results, key=lambda r: r.input_file)],
+    }
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    patterns: List[str] = []
+    output_dir = None
+    transform = "none"
+    pretty = False
+    workers = None
+    report_file = None
+    parser = "etree"
+    canonical = False
+    i = 0
+    while i < len(args):
+        if args[i] == "--out":
+            output_dir = args[i + 1]
+            i += 2
+        elif args[i] == "--transform":
+            transform = args[i + 1]
+            i += 2
+        elif args[i] == "--workers":
+            workers = int(args[i + 1])
+            i += 2
+        elif args[i] == "--report":
+            report_file = args[i + 1]
+            i += 2
+        elif args[i] == "--parser":
+            parser = args[i + 1]
+            i += 2
+        elif args[i] == "--pretty":
+            pretty = True
+            i += 1
+        elif args[i] == "--canonical":
+            canonical = True
+            i += 1
+        else:
+            patterns.append(args[i])
+            i += 1
+
+    if not patterns:
+        print(__doc__)
+        sys.exit(2)
+
+    try:
+        input_files = expand_inputs(patterns)
+        if not input_files:
+            print("No input files found")
+            sys.exit(2)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        jobs = make_jobs(input_files, output_dir, transform, pretty, parser, canonical)
+
+        start = time.perf_counter()
+        results = []
+        for result in run_batch(jobs, workers):
+            results.append(result)
+            if result.error:
+                status = f"ERROR {result.error}"
+            elif result.validation_errors:
+                status = f"INVALID ({len(result.validation_errors)} errors)"
+            else:
+                status = "OK"
+                if result.output_file and not result.written:
+                    status += " (unchanged)"
+            print(f"{result.input_file}: {status} [{result.seconds * 1000:.1f} ms]")
+        report = summarize_results(results, time.perf_counter() - start)
+
+        print(
+            f"\n{report['files']} files: {report['ok']} ok, {report['invalid']} invalid,"
+            f" {report['failed']} failed in {report['wall_seconds']:.2f}s"
+            f" ({report['parallelism']:.1f}x parallelism)"
+        )
+        if report_file:
+            with open(report_file, "w", encoding="UTF-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Wrote report to {report_file}")
+        if report["ok"] != report["files"]:
+            sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
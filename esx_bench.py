@@ -0,0 +1,345 @@
+"""Benchmarks for parsing, building, validating and writing ESX plugins.
+
+Usage:
+    python esx_bench.py run [results.json] [--repeat N] [--scenario NAME ...]
+    python esx_bench.py compare <baseline.json> <results.json> [--threshold 0.25]
+
+``run`` generates synthetic plugins for each scenario and records the best
+wall time and the tracemalloc peak of every benchmark as JSON. ``compare``
+exits non-zero when a result is slower or larger than the baseline by more
+than the threshold.
+"""
+
+from __future__ import annotations
+
+import copyreg
+import io
+import json
+import os
+import pickle
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from esx_lib import (
+    ESXTES4,
+    ESXElement,
+    ESXParser,
+    ESXPlugin,
+    FormIDManager,
+    QuestBuilder,
+    summarize_plugin,
+    validate_esl_compatibility,
+    write_plugin_to_xml,
+)
+
+
+@dataclass
+class Scenario:
+    """Shape of a synthetic plugin"""
+
+    name: str
+    quests: int
+    objectives_per_quest: int
+    aliases_per_objective: int
+
+    @property
+    def alias_count(self) -> int:
+        return self.quests * (1 + self.objectives_per_quest * self.aliases_per_objective)
+
+    @property
+    def form_id_count(self) -> int:
+        return self.quests + self.alias_count
+
+    @property
+    def end_id(self) -> int:
+        # Scenarios that do not fit an ESL use the full plugin range
+        return 0xFFF if self.form_id_count <= 2048 else 0xFFFFFF
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s
+    for s in [
+        Scenario("tiny", 1, 1, 10),
+        Scenario("single_quest_esl_max", 1, 20, 100),
+        Scenario("multi_quest_esl", 28, 3, 20),
+        Scenario("multi_quest_large", 10, 10, 25),
+    ]
+}
+
+
+def build_plugin(scenario: Scenario) -> ESXPlugin:
+    """Build a synthetic plugin with QuestBuilder"""
+    plugin = ESXPlugin(tag="plugin")
+    tes4 = ESXTES4(tag="TES4")
+    tes4.add_master("Skyrim.esm")
+    plugin.add_tes4(tes4)
+
+    form_manager = FormIDManager(0x800, scenario.end_id)
+    for quest_idx in range(1, scenario.quests + 1):
+        builder = QuestBuilder(
+            plugin, f"BenchQuest{quest_idx:03d}", form_id_manager=form_manager
+        )
+        builder.set_quest_name(f"Bench Quest {quest_idx}")
+        builder.add_player_ref()
+        for obj_idx in range(1, scenario.objectives_per_quest + 1):
+            builder.add_objective_with_targets(
+                index=obj_idx,
+                name=f"Objective {obj_idx}",
+                target_count=scenario.aliases_per_objective,
+                target_base_name=f"Q{quest_idx}Obj{obj_idx}",
+            )
+        builder.update_alias_count()
+
+    return plugin
+
+
+def allocate_ids(scenario: Scenario) -> FormIDManager:
+    """Allocate the scenario's IDs the way the generators do"""
+    manager = FormIDManager(0x800, scenario.end_id)
+    for _ in range(scenario.quests):
+        manager.allocate_next_id()
+        manager.allocate_next_id()
+        for _ in range(scenario.objectives_per_quest):
+            manager.allocate_range(scenario.aliases_per_objective)
+    return manager
+
+
+class _DataclassPickler(pickle.Pickler):
+    """Pickles elements field by field, as they were before the wire format"""
+
+    def reducer_override(self, obj: Any) -> Any:
+        if isinstance(obj, ESXElement):
+            return copyreg.__newobj__, (type(obj),), obj.__dict__
+        return NotImplemented
+
+
+def pickle_dataclass(obj: Any) -> bytes:
+    buffer = io.BytesIO()
+    _DataclassPickler(buffer, pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buffer.getvalue()
+
+
+def measure(
+    fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None
+) -> Dict[str, Any]:
+    """Best and median wall time over ``repeat`` runs plus one traced peak"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    # tracemalloc slows allocation down, so memory is measured separately
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "peak_bytes": peak,
+    }
+
+
+def run_scenario(scenario: Scenario, repeat: int, workdir: str) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    compact_file = os.path.join(workdir, f"{scenario.name}.esx")
+    pretty_file = os.path.join(workdir, f"{scenario.name}.pretty.esx")
+
+    results["allocate"] = measure(lambda: allocate_ids(scenario), repeat)
+    results["build"] = measure(lambda: build_plugin(scenario), repeat)
+
+    plugin = build_plugin(scenario)
+    results["validate_esl"] = measure(
+        lambda: validate_esl_compatibility(plugin), repeat
+    )
+    results["write_compact"] = measure(
+        lambda: write_plugin_to_xml(plugin, compact_file, pretty=False), repeat
+    )
+    results["write_pretty"] = measure(
+        lambda: write_plugin_to_xml(plugin, pretty_file, pretty=True), repeat
+    )
+    results["parse"] = measure(lambda: ESXParser().parse_file(compact_file), repeat)
+    results["parse_expat"] = measure(
+        lambda: ESXParser().parse_file(compact_file, backend="expat"), repeat
+    )
+    gzip_file = compact_file + ".gz"
+    results["write_gzip"] = measure(
+        lambda: write_plugin_to_xml(plugin, gzip_file, pretty=False), repeat
+    )
+    results["parse_gzip"] = measure(
+        lambda: ESXParser().parse_file(gzip_file, backend="expat"), repeat
+    )
+
+    # Moving a plugin to a worker process: the flat wire format (what
+    # pickle now uses) against pickling the dataclasses field by field
+    dataclass_bytes = pickle_dataclass(plugin)
+    wire_bytes = pickle.dumps(plugin, pickle.HIGHEST_PROTOCOL)
+    results["pickle_encode"] = measure(lambda: pickle_dataclass(plugin), repeat)
+    results["pickle_decode"] = measure(lambda: pickle.loads(dataclass_bytes), repeat)
+    results["wire_encode"] = measure(
+        lambda: pickle.dumps(plugin, pickle.HIGHEST_PROTOCOL), repeat
+    )
+    results["wire_decode"] = measure(lambda: pickle.loads(wire_bytes), repeat)
+
+    # Summaries read every alias and target, which forces the lazy views,
+    # so each run gets a freshly parsed plugin
+    parsed: List[ESXPlugin] = []
+
+    def reparse() -> None:
+        parsed[:] = [ESXParser().parse_file(compact_file)]
+
+    results["summarize"] = measure(
+        lambda: summarize_plugin(parsed[0]), repeat, setup=reparse
+    )
+
+    results["_size"] = {
+        "aliases": scenario.alias_count,
+        "form_ids": scenario.form_id_count,
+        "compact_bytes": os.path.getsize(compact_file),
+        "gzip_bytes": os.path.getsize(gzip_file),
+        "pickle_bytes": len(dataclass_bytes),
+        "wire_bytes": len(wire_bytes),
+    }
+    return results
+
+
+def run(scenarios: List[Scenario], repeat: int = 3) -> Dict[str, Any]:
+    """Run every benchmark for each scenario"""
+    output: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scenario in scenarios:
+            print(f"Running {scenario.name} ({scenario.alias_count} aliases)...")
+            scenario_results = run_scenario(scenario, repeat, workdir)
+            for bench, result in scenario_results.items():
+                output["results"][f"{scenario.name}/{bench}"] = result
+    return output
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.25
+) -> Tuple[List[str], List[str]]:
+    """Compare two result sets
+
+    Returns:
+        Tuple of (report_lines, regressions)
+    """
+    lines = []
+    regressions = []
+    base_results = baseline.get("results", {})
+    for key, result in sorted(current.get("results", {}).items()):
+        base = base_results.get(key)
+        if base is None or key.endswith("/_size"):
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            old = base.get(metric)
+            new = result.get(metric)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{key} {metric}: {old:.6g} -> {new:.6g} ({ratio:.2f}x)")
+            lines.append(f"{key:<45} {metric:<11} {old:>12.6g} {new:>12.6g} {ratio:>6.2f}x{flag}")
+    return lines, regressions
+
+
+def _print_results(output: Dict[str, Any]) -> None:
+    for key, result in output["results"].items():
+        if key.endswith("/_size"):
+            continue
+        print(
+            f"{key:<45} {result['seconds'] * 1000:>10.2f} ms"
+            f" {result['peak_bytes'] / 1024 / 1024:>9.2f} MiB"
+        )
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ("run", "compare"):
+        print(__doc__)
+        sys.exit(2)
+
+    if args[0] == "compare":
+        rest = []
+        threshold = 0.25
+        i = 1
+        while i < len(args):
+            if args[i] == "--threshold":
+                threshold = float(args[i + 1])
+                i += 2
+            else:
+                rest.append(args[i])
+                i += 1
+        if len(rest) != 2:
+            print(__doc__)
+            sys.exit(2)
+        with open(rest[0], encoding="UTF-8") as f:
+            baseline = json.load(f)
+        with open(rest[1], encoding="UTF-8") as f:
+            current = json.load(f)
+        lines, regressions = compare(baseline, current, threshold)
+        for line in lines:
+            print(line)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {threshold:.0%}:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\nNo regressions")
+        return
+
+    repeat = 3
+    names: List[str] = []
+    output_file = None
+    i = 1
+    while i < len(args):
+        if args[i] == "--repeat":
+            repeat = int(args[i + 1])
+            i += 2
+        elif args[i] == "--scenario":
+            names.append(args[i + 1])
+            i += 2
+        else:
+            output_file = args[i]
+            i += 1
+
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (known: {', '.join(SCENARIOS)})")
+        sys.exit(2)
+    scenarios = [SCENARIOS[n] for n in names] if names else list(SCENARIOS.values())
+
+    output = run(scenarios, repeat)
+    _print_results(output)
+    if output_file:
+        with open(output_file, "w", encoding="UTF-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"\nWrote results to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
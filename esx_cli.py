@@ -0,0 +1,215 @@
+"""Unified ``esx`` command line for the ESX tools.
+
+Usage:
+    esx <command> [args...]
+    esx help
+
+Each command's module is imported only when that command runs, so quick
+commands such as ``validate`` do not pay for the generator, diff or
+benchmark code.
+"""
+
+import importlib
+import sys
+from typing import Dict, List, NoReturn, Tuple
+
+# name -> (module, function, description). An empty module means a command
+# defined here. Functions named "main" are the scripts' own entry points and
+# read sys.argv; the rest take the argument list.
+COMMANDS: Dict[str, Tuple[str, str, str]] = {
+    "summarize": ("", "summarize_command", "Print a Markdown summary or JSON stats"),
+    "validate": ("", "validate_command", "Check quest structure and ESL limits"),
+    "convert": ("", "convert_command", "Re-serialize a plugin, compact, pretty or canonical"),
+    "generate": ("create_multi_quest_esx", "main", "Generate the multi-quest plugin"),
+    "modify": ("modify_esx", "main", "Rebuild a plugin's quest with QuestBuilder"),
+    "batch": ("esx_batch", "main", "Parse/transform/validate/write many files in parallel"),
+    "watch": ("esx_watch", "main", "Rebuild incrementally when SmartMarkers.toml changes"),
+    "diff": ("esx_diff", "main", "Diff two plugins or apply a patch"),
+    "merge": ("esx_merge", "main", "Merge plugins with FormID remapping"),
+    "compact": ("esx_compact", "main", "Renumber FormIDs into a dense block"),
+    "loadorder": ("esx_loadorder", "main", "Resolve FormIDs across a load order"),
+    "strings": ("esx_strings", "main", "Move quest text into .STRINGS tables and back"),
+    "plan": ("esx_planner", "main", "Plan quest/alias layouts within the FormID budget"),
+    "bench": ("esx_bench", "main", "Run or compare benchmarks"),
+    "memcheck": ("esx_memcheck", "main", "Check peak-memory budgets"),
+    "examples": ("esx_examples", "main", "Run the library usage examples"),
+}
+
+
+def summarize_command(args: List[str]) -> int:
+    """esx summarize <input_file> [output_file] [--stats]
+
+    The Markdown summary is streamed to stdout; ``--stats`` prints JSON
+    counts instead, without building the summary text.
+    """
+    stats = "--stats" in args
+    files = [a for a in args if a != "--stats"]
+    if not files:
+        print("Usage: esx summarize <input_file> [output_file] [--stats]")
+        return 2
+
+    from esx_lib import ESXParser, plugin_stats, write_plugin_to_xml, write_summary
+
+    plugin = ESXParser().parse_file(files[0])
+    if stats:
+        import json
+
+        print(json.dumps(plugin_stats(plugin), indent=2))
+    else:
+        write_summary(plugin, sys.stdout)
+        print()
+    if len(files) > 1:
+        write_plugin_to_xml(plugin, files[1])
+        print(f"\nPlugin written to {files[1]}")
+    return 0
+
+
+def validate_command(args: List[str]) -> int:
+    """esx validate <input_file> [...]
+
+    Exits 1 if any file has quest structure or schema errors, or breaks
+    ESL limits.
+    """
+    if not args:
+        print("Usage: esx validate <input_file> [...]")
+        return 2
+
+    from esx_lib import (
+        ESXParser,
+        ESXQuest,
+        validate_esl_compatibility,
+        validate_quest_structure,
+        validate_schema,
+    )
+
+    failed = 0
+    for input_file in args:
+        plugin = ESXParser().parse_file(input_file)
+        errors: List[str] = validate_schema(plugin)
+        for group in plugin.groups:
+            for record in group.records:
+                if isinstance(record, ESXQuest):
+                    _, quest_errors = validate_quest_structure(record)
+                    errors.extend(f"{record.editor_id}: {e}" for e in quest_errors)
+        is_compatible, form_count, esl_errors = validate_esl_compatibility(plugin)
+        errors.extend(esl_errors)
+
+        status = "OK" if not errors else "FAILED"
+        print(f"{input_file}: {status} (ESL {is_compatible}, {form_count}/2048 FormIDs)")
+        for error in errors:
+            print(f"  - {error}")
+        failed += bool(errors)
+    return 1 if failed else 0
+
+
+def convert_command(args: List[str]) -> int:
+    """esx convert <input_file> <output_file> [--pretty | --canonical]
+                   [--compress gzip|xz|none] [--level N]
+
+    ``--canonical`` writes the canonical form and leaves the output file
+    untouched when its content would not change. Compressed input is read
+    transparently; the output is compressed per ``--compress`` or its
+    ``.gz``/``.xz`` suffix.
+    """
+    usage = (
+        "Usage: esx convert <input_file> <output_file> [--pretty | --canonical]"
+        " [--compress gzip|xz|none] [--level N]"
+    )
+    pretty = False
+    canonical = False
+    compression = None
+    level = None
+    files = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--pretty":
+            pretty = True
+            i += 1
+        elif args[i] == "--canonical":
+            canonical = True
+            i += 1
+        elif args[i] == "--compress" and i + 1 < len(args):
+            compression = args[i + 1]
+            i += 2
+        elif args[i] == "--level" and i + 1 < len(args):
+            level = int(args[i + 1])
+            i += 2
+        else:
+            files.append(args[i])
+            i += 1
+    if len(files) != 2:
+        print(usage)
+        return 2
+
+    from esx_lib import ESXParser, write_plugin_to_xml
+
+    plugin = ESXParser().parse_file(files[0])
+    written = write_plugin_to_xml(
+        plugin,
+        files[1],
+        pretty=pretty,
+        canonical=canonical,
+        compression=compression,
+        level=level,
+    )
+    if written:
+        print(f"Wrote {files[1]}")
+    else:
+        print(f"{files[1]} is up to date")
+    return 0
+
+
+def usage() -> str:
+    lines = [__doc__.strip(), "", "Commands:"]
+    lines.extend(f"    {name:<10} {entry[2]}" for name, entry in COMMANDS.items())
+    return "\n".join(lines)
+
+
+def run(command: str, args: List[str]) -> int:
+    """Run one subcommand and return its exit status"""
+    module_name, function_name, _ = COMMANDS[command]
+    if module_name:
+        function = getattr(importlib.import_module(module_name), function_name)
+    else:
+        function = globals()[function_name]
+
+    if function_name != "main":
+        try:
+            return function(args)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            import traceback
+
+            traceback.print_exc()
+            return 1
+
+    # Script entry points parse sys.argv themselves and sys.exit() non-zero on failure
+    saved_argv = sys.argv
+    sys.argv = [f"esx {command}", *args]
+    try:
+        function()
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.argv = saved_argv
+    return 0
+
+
+def main() -> NoReturn:
+    """Main entry point"""
+    args = sys.argv[1:]
+    if not args or args[0] in ("help", "-h", "--help"):
+        print(usage())
+        sys.exit(0 if args else 2)
+
+    command = args[0]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n")
+        print(usage())
+        sys.exit(2)
+
+    sys.exit(run(command, args[1:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""FormID compaction for ESX plugins.
+
+Renumbers every FormID a plugin defines into a dense block starting at
+0x800, keeping their relative order, so large ``allocate_range`` requests
+succeed again after many incremental edits.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Dict, List, Optional
+
+from esx_lib import (
+    ESXFormIDConflictError,
+    ESXParser,
+    ESXPlugin,
+    ESXQuest,
+    FormID,
+    FormIDManager,
+    write_plugin_to_xml,
+)
+from esx_merge import (
+    RemapTable,
+    defined_form_ids,
+    rewrite_form_ids,
+)
+
+
+def compact_form_ids(
+    plugin: ESXPlugin,
+    start_id: int = 0x800,
+    end_id: int = 0xFFF,
+    form_id_manager: Optional[FormIDManager] = None,
+) -> Dict[int, int]:
+    """Renumber the plugin's FormIDs into a dense block, in place
+
+    Only IDs inside ``start_id``-``end_id`` are renumbered; anything outside
+    (e.g. overrides of master records) is left alone. References in ALST,
+    QSTA aliases, VMAD alias scripts, CTDA param1 and HEDR ``nextObjectID``
+    are rewritten.
+
+    If ``form_id_manager`` is given, its used IDs and assignment map are
+    remapped through the same table so later allocations see the reclaimed
+    space and saved assignments match the plugin.
+
+    Returns:
+        Mapping of old FormID -> new FormID (unchanged IDs included)
+    """
+    records = [record for group in plugin.groups for record in group.records]
+
+    # Bucket the defined IDs over the range: linear in IDs + range size
+    present = bytearray(end_id - start_id + 1)
+    for record in records:
+        for form_id in defined_form_ids(record):
+            if start_id <= form_id <= end_id:
+                if present[form_id - start_id]:
+                    raise ESXFormIDConflictError(
+                        f"Form ID 0x{form_id:x} is defined more than once"
+                    )
+                present[form_id - start_id] = 1
+    # IDs the manager holds without a record (e.g. unclaimed assignments)
+    # move with the rest, so none can collide inside the new block
+    if form_id_manager is not None:
+        for form_id in form_id_manager.used_ids:
+            if start_id <= form_id <= end_id:
+                present[form_id - start_id] = 1
+
+    table = RemapTable()
+    next_id = start_id
+    for offset, used in enumerate(present):
+        if used:
+            table.add(start_id + offset, next_id)
+            next_id += 1
+
+    for record in records:
+        rewrite_form_ids(record, table)
+        if isinstance(record, ESXQuest):
+            record.invalidate()
+
+    if plugin.tes4 is not None:
+        hedr = plugin.tes4.find("HEDR")
+        struct = hedr.find("struct") if hedr else None
+        if struct is not None:
+            struct.touch()
+            struct.attrib["nextObjectID"] = FormID(next_id).hex8
+
+    if form_id_manager is not None:
+        form_id_manager.remap(table.ids)
+
+    return table.ids
+
+
+def largest_free_run(used_ids: List[int], start_id: int = 0x800, end_id: int = 0xFFF) -> int:
+    """Length of the longest run of consecutive unused IDs in the range"""
+    longest = 0
+    previous = start_id - 1
+    for form_id in sorted(i for i in used_ids if start_id <= i <= end_id):
+        longest = max(longest, form_id - previous - 1)
+        previous = form_id
+    return max(longest, end_id - previous)
+
+
+def _used_ids(plugin: ESXPlugin) -> List[int]:
+    return [
+        form_id
+        for group in plugin.groups
+        for record in group.records
+        for form_id in defined_form_ids(record)
+    ]
+
+
+def main() -> None:
+    """Main entry point"""
+    if len(sys.argv) < 3:
+        print("Usage: python esx_compact.py <input_file> <output_file>")
+        sys.exit(2)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2]
+
+    try:
+        plugin = ESXParser().parse_file(input_file)
+        before = largest_free_run(_used_ids(plugin))
+        mapping = compact_form_ids(plugin)
+        after = largest_free_run(_used_ids(plugin))
+
+        moved = sum(1 for old, new in mapping.items() if old != new)
+        print(f"Renumbered {moved} of {len(mapping)} form IDs")
+        print(f"Largest free block: {before} -> {after} IDs")
+
+        write_plugin_to_xml(plugin, output_file)
+        print(f"Wrote compacted plugin to {output_file}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
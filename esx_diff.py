@@ -0,0 +1,675 @@
+"""Structural diff and patch for ESX plugins.
+
+Records are aligned by FormID (falling back to editor ID), quest children are
+split into semantic units (aliases by ALST ID, objectives by QOBJ index,
+targets by objective/alias pair, plain fields by tag) and only units whose
+subtree hashes differ are reported.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from esx_lib import (
+    ESXTES4,
+    ESXElement,
+    ESXError,
+    ESXGroup,
+    ESXParser,
+    ESXPlugin,
+    ESXQuest,
+    ESXRecord,
+    write_plugin_to_xml,
+)
+
+# Unit key prefixes used inside record paths
+ALIAS_UNIT = "alias"
+OBJECTIVE_UNIT = "objective"
+TARGET_UNIT = "target"
+FIELD_UNIT = "field"
+
+
+@dataclass
+class ESXEdit:
+    """A single step of an edit script
+
+    ``path`` is one of:
+        ["TES4"] / ["TES4", unit]
+        [group_label] / [group_label, record_key] / [group_label, record_key, unit]
+    """
+
+    op: str  # "add", "remove" or "change"
+    path: List[str]
+    after: Optional[str] = None  # Sibling key to insert after (None = first)
+    elements: Optional[List[Any]] = None  # Encoded elements for add/change
+    attrib: Optional[Dict[str, str]] = None  # New attributes for record changes
+    changes: List[Tuple[str, Optional[str], Optional[str]]] = field(
+        default_factory=list
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"op": self.op, "path": self.path}
+        if self.after is not None:
+            data["after"] = self.after
+        if self.elements is not None:
+            data["elements"] = self.elements
+        if self.attrib is not None:
+            data["attrib"] = self.attrib
+        if self.changes:
+            data["changes"] = [list(c) for c in self.changes]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ESXEdit":
+        return cls(
+            op=data["op"],
+            path=list(data["path"]),
+            after=data.get("after"),
+            elements=data.get("elements"),
+            attrib=data.get("attrib"),
+            changes=[tuple(c) for c in data.get("changes", [])],
+        )
+
+    def describe(self) -> str:
+        """One-line human readable form of this edit"""
+        symbol = {"add": "+", "remove": "-", "change": "~"}.get(self.op, "?")
+        line = f"{symbol} {'/'.join(self.path)}"
+        if self.changes:
+            parts = [f"{name}: {old!r} -> {new!r}" for name, old, new in self.changes]
+            line += f" ({'; '.join(parts)})"
+        return line
+
+
+# --- Hashing and encoding ---
+
+
+def _norm_text(text: Optional[str]) -> Optional[str]:
+    """Whitespace-only text is formatting, not content"""
+    if text is None:
+        return None
+    stripped = text.strip()
+    return stripped or None
+
+
+def element_digest(element: ESXElement, memo: Dict[int, bytes]) -> bytes:
+    """Hash of an element subtree, memoized by object identity"""
+    cached = memo.get(id(element))
+    if cached is not None:
+        return cached
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(element.tag.encode())
+    for key in sorted(element.attrib):
+        h.update(b"\0@")
+        h.update(key.encode())
+        h.update(b"=")
+        h.update(element.attrib[key].encode())
+    text = _norm_text(element.text)
+    if text is not None:
+        h.update(b"\0#")
+        h.update(text.encode())
+    for child in element.elements:
+        h.update(b"\0/")
+        h.update(element_digest(child, memo))
+
+    digest = h.digest()
+    memo[id(element)] = digest
+    return digest
+
+
+def encode_element(element: ESXElement) -> List[Any]:
+    """Encode an element subtree as compact nested lists"""
+    return [
+        element.tag,
+        dict(element.attrib),
+        _norm_text(element.text),
+        [encode_element(child) for child in element.elements],
+    ]
+
+
+def decode_element(data: List[Any], cls: type = ESXElement) -> ESXElement:
+    """Rebuild an element subtree from its encoded form"""
+    tag, attrib, text, children = data
+    element = cls(tag=tag, attrib=dict(attrib), text=text)
+    for child in children:
+        element.append(decode_element(child))
+    return element
+
+
+def _flatten(elements: List[ESXElement]) -> Dict[str, Optional[str]]:
+    """Flatten a unit into leaf paths for field-level change reporting"""
+    leaves: Dict[str, Optional[str]] = {}
+
+    def walk(element: ESXElement, prefix: str) -> None:
+        for key, value in element.attrib.items():
+            leaves[f"{prefix}@{key}"] = value
+        text = _norm_text(element.text)
+        if text is not None or not element.elements:
+            leaves[prefix] = text
+        counts: Dict[str, int] = {}
+        for child in element.elements:
+            n = counts.get(child.tag, 0)
+            counts[child.tag] = n + 1
+            walk(child, f"{prefix}/{child.tag}" if n == 0 else f"{prefix}/{child.tag}[{n}]")
+
+    counts: Dict[str, int] = {}
+    for element in elements:
+        n = counts.get(element.tag, 0)
+        counts[element.tag] = n + 1
+        walk(element, element.tag if n == 0 else f"{element.tag}[{n}]")
+    return leaves
+
+
+def _field_changes(
+    old: List[ESXElement], new: List[ESXElement]
+) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    old_leaves = _flatten(old)
+    new_leaves = _flatten(new)
+    changes = []
+    for key in old_leaves.keys() | new_leaves.keys():
+        old_value = old_leaves.get(key)
+        new_value = new_leaves.get(key)
+        if old_value != new_value or (key in old_leaves) != (key in new_leaves):
+            changes.append((key, old_value, new_value))
+    changes.sort(key=lambda c: c[0])
+    return changes
+
+
+# --- Segmentation ---
+
+
+def segment_record(record: ESXElement) -> List[Tuple[str, List[ESXElement]]]:
+    """Split a record's children into keyed semantic units, in order"""
+    units: List[Tuple[str, List[ESXElement]]] = []
+    seen: Dict[str, int] = {}
+    field_counts: Dict[str, int] = {}
+    children = record.elements
+    current_objective = "-"
+    i = 0
+
+    def add_unit(key: str, elems: List[ESXElement]) -> None:
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        units.append((key if n == 0 else f"{key}#{n}", elems))
+
+    while i < len(children):
+        child = children[i]
+        tag = child.tag
+        if tag == "ALST":
+            j = i + 1
+            while j < len(children) and children[j].tag not in ("ALED", "ALST", "QOBJ"):
+                j += 1
+            if j < len(children) and children[j].tag == "ALED":
+                j += 1
+            add_unit(f"{ALIAS_UNIT}:{_norm_text(child.text)}", children[i:j])
+            i = j
+        elif tag == "QOBJ":
+            current_objective = _norm_text(child.text) or "0"
+            j = i + 1
+            while j < len(children) and children[j].tag in ("FNAM", "NNAM"):
+                j += 1
+            add_unit(f"{OBJECTIVE_UNIT}:{current_objective}", children[i:j])
+            i = j
+        elif tag == "QSTA":
+            struct = child.find("struct")
+            alias = struct.attrib.get("alias", "?") if struct else "?"
+            j = i + 1
+            while j < len(children) and children[j].tag == "CTDA":
+                j += 1
+            add_unit(f"{TARGET_UNIT}:{current_objective}:{alias}", children[i:j])
+            i = j
+        else:
+            n = field_counts.get(tag, 0)
+            field_counts[tag] = n + 1
+            add_unit(f"{FIELD_UNIT}:{tag}:{n}", [child])
+            i += 1
+
+    return units
+
+
+def record_key(record: ESXElement) -> str:
+    """Alignment key for a record: FormID if present, else editor ID"""
+    form_id = record.attrib.get("id")
+    if form_id:
+        return f"id:{form_id.lower()}"
+    edid = record.find("EDID")
+    if edid is not None and edid.text:
+        return f"edid:{edid.text}"
+    return f"tag:{record.tag}"
+
+
+def _kept_in_order(old_keys: List[str], new_keys: List[str]) -> Set[str]:
+    """Largest set of shared keys whose relative order is the same in both lists
+
+    Shared keys outside it have moved. This is a longest increasing
+    subsequence of old positions, taken in new order.
+    """
+    old_index = {key: i for i, key in enumerate(old_keys)}
+    shared = [key for key in new_keys if key in old_index]
+    tails: List[int] = []  # Position in shared ending the best run of each length
+    tail_values: List[int] = []  # Old index at each of those positions
+    parent: List[int] = [-1] * len(shared)
+    for i, key in enumerate(shared):
+        value = old_index[key]
+        position = bisect.bisect_left(tail_values, value)
+        if position > 0:
+            parent[i] = tails[position - 1]
+        if position == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[position] = i
+            tail_values[position] = value
+    kept: Set[str] = set()
+    i = tails[-1] if tails else -1
+    while i >= 0:
+        kept.add(shared[i])
+        i = parent[i]
+    return kept
+
+
+def _editor_id(record: ESXElement) -> Optional[str]:
+    edid = record.find("EDID")
+    return edid.text if edid is not None else None
+
+
+def _keyed(items: List[ESXElement], key_fn: Any) -> Dict[str, ESXElement]:
+    keyed: Dict[str, ESXElement] = {}
+    for item in items:
+        key = key_fn(item)
+        n = 0
+        unique = key
+        while unique in keyed:
+            n += 1
+            unique = f"{key}#{n}"
+        keyed[unique] = item
+    return keyed
+
+
+# --- Diff ---
+
+
+class ESXDiffer:
+    """Computes edit scripts between two parsed plugins"""
+
+    def __init__(self) -> None:
+        self._memo: Dict[int, bytes] = {}
+
+    def digest(self, element: ESXElement) -> bytes:
+        return element_digest(element, self._memo)
+
+    def diff(self, old: ESXPlugin, new: ESXPlugin) -> List[ESXEdit]:
+        edits: List[ESXEdit] = []
+
+        if old.tes4 is not None and new.tes4 is not None:
+            if self.digest(old.tes4) != self.digest(new.tes4):
+                edits.extend(self.diff_units(["TES4"], old.tes4, new.tes4))
+        elif new.tes4 is not None:
+            edits.append(ESXEdit("add", ["TES4"], elements=[encode_element(new.tes4)]))
+        elif old.tes4 is not None:
+            edits.append(ESXEdit("remove", ["TES4"]))
+
+        old_groups = _keyed(list(old.groups), lambda g: g.label)
+        new_groups = _keyed(list(new.groups), lambda g: g.label)
+        previous: Optional[str] = None
+        for label, new_group in new_groups.items():
+            old_group = old_groups.get(label)
+            if old_group is None:
+                edits.append(
+                    ESXEdit(
+                        "add",
+                        [label],
+                        after=previous,
+                        elements=[encode_element(new_group)],
+                    )
+                )
+            elif self.digest(old_group) != self.digest(new_group):
+                edits.extend(self.diff_group(label, old_group, new_group))
+            previous = label
+        for label in old_groups:
+            if label not in new_groups:
+                edits.append(ESXEdit("remove", [label]))
+
+        return edits
+
+    def diff_group(
+        self, label: str, old: ESXGroup, new: ESXGroup
+    ) -> List[ESXEdit]:
+        edits: List[ESXEdit] = []
+        old_records = _keyed(list(old.records), record_key)
+        new_records = _keyed(list(new.records), record_key)
+
+        # Records renumbered between runs are matched by editor ID instead
+        unmatched_old = {
+            _editor_id(r): k
+            for k, r in old_records.items()
+            if k not in new_records and _editor_id(r)
+        }
+        renamed: Dict[str, str] = {}
+        for key, record in new_records.items():
+            if key not in old_records:
+                old_key = unmatched_old.get(_editor_id(record))
+                if old_key is not None:
+                    renamed[key] = old_key
+
+        previous: Optional[str] = None
+        for key, new_record in new_records.items():
+            old_key = renamed.get(key, key)
+            old_record = old_records.get(old_key)
+            if old_record is None:
+                edits.append(
+                    ESXEdit(
+                        "add",
+                        [label, key],
+                        after=previous,
+                        elements=[encode_element(new_record)],
+                    )
+                )
+            elif self.digest(old_record) != self.digest(new_record):
+                edits.extend(self.diff_units([label, old_key], old_record, new_record))
+            previous = key
+        matched_old = set(renamed.values())
+        for key in old_records:
+            if key not in new_records and key not in matched_old:
+                edits.append(ESXEdit("remove", [label, key]))
+
+        return edits
+
+    def diff_units(
+        self, path: List[str], old: ESXElement, new: ESXElement
+    ) -> List[ESXEdit]:
+        edits: List[ESXEdit] = []
+
+        if old.attrib != new.attrib:
+            changes = [
+                (f"@{k}", old.attrib.get(k), new.attrib.get(k))
+                for k in sorted(old.attrib.keys() | new.attrib.keys())
+                if old.attrib.get(k) != new.attrib.get(k)
+            ]
+            edits.append(
+                ESXEdit("change", list(path), attrib=dict(new.attrib), changes=changes)
+            )
+
+        old_segments = segment_record(old)
+        old_units = dict(old_segments)
+        new_units = segment_record(new)
+        new_keys = {key for key, _ in new_units}
+        kept = _kept_in_order(
+            [key for key, _ in old_segments], [key for key, _ in new_units]
+        )
+        previous: Optional[str] = None
+        for key, new_elems in new_units:
+            old_elems = old_units.get(key)
+            if old_elems is not None and key not in kept:
+                # Moved, e.g. an alias now under another objective
+                edits.append(ESXEdit("remove", path + [key]))
+                old_elems = None
+            if old_elems is None:
+                edits.append(
+                    ESXEdit(
+                        "add",
+                        path + [key],
+                        after=previous,
+                        elements=[encode_element(e) for e in new_elems],
+                    )
+                )
+            elif [self.digest(e) for e in old_elems] != [
+                self.digest(e) for e in new_elems
+            ]:
+                edits.append(
+                    ESXEdit(
+                        "change",
+                        path + [key],
+                        elements=[encode_element(e) for e in new_elems],
+                        changes=_field_changes(old_elems, new_elems),
+                    )
+                )
+            previous = key
+        for key in old_units:
+            if key not in new_keys:
+                edits.append(ESXEdit("remove", path + [key]))
+
+        return edits
+
+
+def diff_plugins(old: ESXPlugin, new: ESXPlugin) -> List[ESXEdit]:
+    """Compute a compact edit script turning ``old`` into ``new``"""
+    return ESXDiffer().diff(old, new)
+
+
+# --- Patch ---
+
+
+def _insert_index(keys: List[str], after: Optional[str]) -> int:
+    """Index to insert at so that the new item follows the ``after`` key
+
+    An ``after`` key missing from ``keys`` (a drifted base) appends at the end.
+    """
+    if after is None:
+        return 0
+    if after in keys:
+        return keys.index(after) + 1
+    return len(keys)
+
+
+def _reparse_record(record: ESXRecord) -> ESXRecord:
+    """Rebuild semantic fields of a record after its children were patched"""
+    if isinstance(record, ESXQuest):
+        record.invalidate()
+    elif isinstance(record, ESXTES4):
+        record.masters = [e.text or "" for e in record.find_all("MAST")]
+    return record
+
+
+def _new_record(data: List[Any]) -> ESXRecord:
+    cls = ESXQuest if data[0] == "QUST" else ESXRecord
+    return _reparse_record(decode_element(data, cls))  # type: ignore[arg-type]
+
+
+def _new_group(data: List[Any]) -> ESXGroup:
+    tag, attrib, _, children = data
+    group = ESXGroup(
+        tag=tag,
+        label=attrib.get("label", ""),
+        group_type=attrib.get("groupType", ""),
+        attrib=dict(attrib),
+    )
+    for child in children:
+        group.add_record(_new_record(child))
+    return group
+
+
+def _apply_unit_edits(record: ESXElement, edits: List[ESXEdit]) -> None:
+    units = segment_record(record)
+    keys = [key for key, _ in units]
+    blocks: Dict[str, List[ESXElement]] = dict(units)
+
+    for edit in edits:
+        key = edit.path[-1]
+        if edit.op == "remove":
+            if key not in blocks:
+                raise ESXError(f"Cannot remove missing unit {'/'.join(edit.path)}")
+            keys.remove(key)
+            del blocks[key]
+        elif edit.op == "change":
+            if key not in blocks:
+                raise ESXError(f"Cannot change missing unit {'/'.join(edit.path)}")
+            blocks[key] = [decode_element(e) for e in edit.elements or []]
+        elif edit.op == "add":
+            keys.insert(_insert_index(keys, edit.after), key)
+            blocks[key] = [decode_element(e) for e in edit.elements or []]
+
+    record.elements = []
+    for key in keys:
+        for element in blocks[key]:
+            record.append(element)
+
+
+def apply_patch(plugin: ESXPlugin, edits: List[ESXEdit]) -> ESXPlugin:
+    """Apply an edit script produced by ``diff_plugins`` in place"""
+    # Records are named by their key in the base plugin, even when the script
+    # renumbers them, so look them all up before anything changes
+    targets: Dict[Tuple[str, ...], ESXRecord] = {}
+    for edit in edits:
+        path = edit.path
+        if path[0] == "TES4" or len(path) < 2 or (len(path) == 2 and edit.op == "add"):
+            continue
+        owner = tuple(path[:2])
+        if owner not in targets:
+            group, index = _find_record(plugin, owner[0], owner[1])
+            targets[owner] = group.records[index]
+
+    # Group unit-level edits per record so each record is rebuilt once
+    unit_edits: Dict[Tuple[str, ...], List[ESXEdit]] = {}
+    order: List[Tuple[str, ...]] = []
+
+    for edit in edits:
+        path = edit.path
+        if path[0] == "TES4":
+            if len(path) == 1:
+                _apply_tes4_edit(plugin, edit)
+            else:
+                owner = ("TES4",)
+                if owner not in unit_edits:
+                    order.append(owner)
+                unit_edits.setdefault(owner, []).append(edit)
+        elif len(path) == 1:
+            _apply_group_edit(plugin, edit)
+        elif len(path) == 2:
+            _apply_record_edit(plugin, edit, targets.get(tuple(path)))
+        else:
+            owner = tuple(path[:2])
+            if owner not in unit_edits:
+                order.append(owner)
+            unit_edits.setdefault(owner, []).append(edit)
+
+    for owner in order:
+        if owner == ("TES4",):
+            if plugin.tes4 is None:
+                raise ESXError("Patch targets a missing TES4 header")
+            _apply_unit_edits(plugin.tes4, unit_edits[owner])
+            _reparse_record(plugin.tes4)
+            continue
+        record = targets[owner]
+        _apply_unit_edits(record, unit_edits[owner])
+        _reparse_record(record)
+
+    return plugin
+
+
+def _apply_tes4_edit(plugin: ESXPlugin, edit: ESXEdit) -> None:
+    if edit.op == "remove":
+        if plugin.tes4 is not None:
+            plugin.remove(plugin.tes4)
+            plugin.tes4 = None
+    elif edit.op == "add" and edit.elements:
+        tes4 = decode_element(edit.elements[0], ESXTES4)
+        _reparse_record(tes4)  # type: ignore[arg-type]
+        plugin.tes4 = tes4  # type: ignore[assignment]
+        plugin.insert(0, tes4)
+    elif edit.op == "change" and edit.attrib is not None and plugin.tes4 is not None:
+        plugin.tes4.attrib = dict(edit.attrib)
+
+
+def _find_group(plugin: ESXPlugin, label: str) -> ESXGroup:
+    for group in plugin.groups:
+        if group.label == label:
+            return group
+    raise ESXError(f"Patch targets missing group {label}")
+
+
+def _find_record(plugin: ESXPlugin, label: str, key: str) -> Tuple[ESXGroup, int]:
+    group = _find_group(plugin, label)
+    keys = list(_keyed(list(group.records), record_key))
+    if key not in keys:
+        raise ESXError(f"Patch targets missing record {label}/{key}")
+    return group, keys.index(key)
+
+
+def _apply_group_edit(plugin: ESXPlugin, edit: ESXEdit) -> None:
+    label = edit.path[0]
+    if edit.op == "remove":
+        plugin.remove_group(_find_group(plugin, label))
+    elif edit.op == "add" and edit.elements:
+        group = _new_group(edit.elements[0])
+        labels = [g.label for g in plugin.groups]
+        index = _insert_index(labels, edit.after)
+        anchor = plugin.groups[index - 1] if index > 0 else plugin.tes4
+        plugin.groups.insert(index, group)
+        position = plugin.index_of(anchor) + 1 if anchor is not None else 0
+        plugin.insert(position, group)
+
+
+def _apply_record_edit(
+    plugin: ESXPlugin, edit: ESXEdit, record: Optional[ESXRecord]
+) -> None:
+    label = edit.path[0]
+    if edit.op == "add" and edit.elements:
+        group = (
+            _find_group(plugin, label)
+            if any(g.label == label for g in plugin.groups)
+            else plugin.get_or_create_group(label)
+        )
+        record = _new_record(edit.elements[0])
+        keys = list(_keyed(list(group.records), record_key))
+        group.insert_record(_insert_index(keys, edit.after), record)
+        return
+
+    if record is None:
+        return
+    if edit.op == "remove":
+        _find_group(plugin, label).remove_record(record)
+    elif edit.op == "change" and edit.attrib is not None:
+        record.attrib = dict(edit.attrib)
+
+
+def edits_to_json(edits: List[ESXEdit]) -> str:
+    return json.dumps([e.to_dict() for e in edits], separators=(",", ":"))
+
+
+def edits_from_json(data: str) -> List[ESXEdit]:
+    return [ESXEdit.from_dict(d) for d in json.loads(data)]
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    if len(args) == 4 and args[0] == "--apply":
+        patch_file, input_file, output_file = args[1:]
+        with open(patch_file, encoding="UTF-8") as f:
+            edits = edits_from_json(f.read())
+        plugin = ESXParser().parse_file(input_file)
+        apply_patch(plugin, edits)
+        write_plugin_to_xml(plugin, output_file)
+        print(f"Applied {len(edits)} edits to {input_file}, wrote {output_file}")
+        return
+
+    if len(args) not in (2, 3):
+        print("Usage: python esx_diff.py <old_file> <new_file> [patch_file]")
+        print("       python esx_diff.py --apply <patch_file> <input_file> <output_file>")
+        sys.exit(2)
+
+    parser = ESXParser()
+    old = parser.parse_file(args[0])
+    new = parser.parse_file(args[1])
+    edits = diff_plugins(old, new)
+
+    for edit in edits:
+        print(edit.describe())
+    print(f"{len(edits)} edits")
+
+    if len(args) == 3:
+        with open(args[2], "w", encoding="UTF-8") as f:
+            f.write(edits_to_json(edits))
+
+    # Non-zero exit status when the plugins differ, like diff(1)
+    sys.exit(1 if edits else 0)
+
+
+if __name__ == "__main__":
+    main()
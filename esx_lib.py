@@ -1,10 +1,41 @@
 from __future__ import annotations
 
-import copy
+import bisect
+import contextlib
+import functools
+import re
 import sys
+import time
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Set, Tuple, TypeVar, Union, cast
+from array import array
+from dataclasses import MISSING, dataclass, field
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+    overload,
+)
+
+if TYPE_CHECKING:
+    import logging
+
+    from esx_strings import StringTables
 
 
 class ESXError(Exception):
@@ -31,6 +62,436 @@ class ESXValidationError(ESXError):
     pass
 
 
+class _LazyLogger:
+    """The ``esx`` logger, created when a message could actually be shown
+
+    Importing logging is a good part of a quick command's startup. Until
+    something imports it nobody can have configured it, so debug and info
+    messages would be dropped at the default WARNING level anyway.
+    """
+
+    @functools.cached_property
+    def _logger(self) -> logging.Logger:
+        import logging
+
+        return logging.getLogger("esx")
+
+    def debug(self, msg: str, *args: Any) -> None:
+        if "logging" in sys.modules:
+            self._logger.debug(msg, *args)
+
+    def info(self, msg: str, *args: Any) -> None:
+        if "logging" in sys.modules:
+            self._logger.info(msg, *args)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._logger, name)
+
+
+logger = _LazyLogger()
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class SpanStats:
+    """Aggregated timings for one named span at one position in the tree"""
+
+    name: str
+    count: int = 0
+    total: float = 0.0
+    peak_bytes: int = 0
+    children: Dict[str, "SpanStats"] = field(default_factory=dict)
+
+    @property
+    def self_time(self) -> float:
+        return self.total - sum(child.total for child in self.children.values())
+
+
+class _NullSpan:
+    """Shared no-op context manager returned while profiling is disabled"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """Collects nested named spans: call count, cumulative time, memory peak
+
+    Disabled by default; ``span()`` then returns a shared no-op object, so
+    instrumented code pays one attribute check per span.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.trace_memory = False
+        self.root = SpanStats("total")
+        self._stack: List[SpanStats] = [self.root]
+        # Absolute tracemalloc peak seen so far by each active span
+        self._peaks: List[int] = [0]
+
+    def enable(self, trace_memory: bool = False) -> None:
+        self.reset()
+        self.enabled = True
+        self.trace_memory = trace_memory
+        import tracemalloc
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        # trace_memory is kept so report() still shows the peaks
+        self.enabled = False
+        import tracemalloc
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self) -> None:
+        self.root = SpanStats("total")
+        self._stack = [self.root]
+        self._peaks = [0]
+
+    def span(self, name: str) -> Any:
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextlib.contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        import tracemalloc
+
+        parent = self._stack[-1]
+        stats = parent.children.get(name)
+        if stats is None:
+            stats = parent.children[name] = SpanStats(name)
+        self._stack.append(stats)
+
+        start_memory = 0
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            start_memory = current
+            self._peaks.append(current)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.total += time.perf_counter() - start
+            stats.count += 1
+            self._stack.pop()
+            if self.trace_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                stats.peak_bytes = max(stats.peak_bytes, peak - start_memory)
+                self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+
+    def report(self) -> str:
+        """Render the span tree as an indented table"""
+        lines = [
+            f"{'Span':<40} {'Count':>7} {'Total ms':>10} {'Self ms':>10}"
+            + (f" {'Peak KiB':>10}" if self.trace_memory else "")
+        ]
+
+        def walk(stats: SpanStats, depth: int) -> None:
+            for child in sorted(stats.children.values(), key=lambda s: -s.total):
+                line = (
+                    f"{'  ' * depth + child.name:<40} {child.count:>7}"
+                    f" {child.total * 1000:>10.2f} {child.self_time * 1000:>10.2f}"
+                )
+                if self.trace_memory:
+                    line += f" {child.peak_bytes / 1024:>10.1f}"
+                lines.append(line)
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+
+
+def span(name: str) -> Any:
+    """Time a block under ``name`` when profiling is enabled"""
+    return PROFILER.span(name)
+
+
+def profiled(name: str) -> Callable[[F], F]:
+    """Decorator form of span() for whole functions"""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            with PROFILER._span(name):
+                return fn(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorate
+
+
+@dataclass
+class ProfileOptions:
+    """Profiling switches parsed from a script's command line"""
+
+    enabled: bool = False
+    trace_memory: bool = False
+    cprofile_output: Optional[str] = None
+
+
+def extract_profile_args(args: List[str]) -> Tuple[List[str], ProfileOptions]:
+    """Strip --profile, --profile-memory and --cprofile[=FILE] from args"""
+    options = ProfileOptions()
+    remaining = []
+    for arg in args:
+        if arg == "--profile":
+            options.enabled = True
+        elif arg == "--profile-memory":
+            options.enabled = options.trace_memory = True
+        elif arg == "--cprofile" or arg.startswith("--cprofile="):
+            options.enabled = True
+            options.cprofile_output = arg.partition("=")[2] or "esx.pstats"
+        else:
+            remaining.append(arg)
+    return remaining, options
+
+
+@contextlib.contextmanager
+def profiling(options: ProfileOptions) -> Iterator[None]:
+    """Enable the span profiler (and cProfile) for a run, then print reports"""
+    if not options.enabled:
+        yield
+        return
+
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile() if options.cprofile_output else None
+    PROFILER.enable(trace_memory=options.trace_memory)
+    if profile:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile:
+            profile.disable()
+        PROFILER.disable()
+        print("\n=== Profile ===")
+        print(PROFILER.report())
+        if profile and options.cprofile_output:
+            profile.dump_stats(options.cprofile_output)
+            print(f"\ncProfile stats written to {options.cprofile_output}")
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(15)
+
+
+class Counters:
+    """Named event counters, collected instead of printed per event"""
+
+    def __init__(self) -> None:
+        self.values: Dict[str, int] = {}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self.values[name] = self.values.get(name, 0) + amount
+
+    def reset(self) -> None:
+        self.values.clear()
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(sorted(self.values.items()))
+
+    def summary(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.as_dict().items())
+
+
+COUNTERS = Counters()
+
+
+@dataclass
+class LogOptions:
+    """Logging switches parsed from a script's command line"""
+
+    level: int = 30  # logging.WARNING
+    counters: bool = False
+    counters_output: Optional[str] = None
+
+
+def extract_log_args(args: List[str]) -> Tuple[List[str], LogOptions]:
+    """Strip -v/-vv/--debug, -q and --counters[=FILE] from args"""
+    import logging
+
+    options = LogOptions()
+    remaining = []
+    for arg in args:
+        if arg in ("-v", "--verbose"):
+            options.level = min(options.level, logging.INFO)
+        elif arg in ("-vv", "--debug"):
+            options.level = logging.DEBUG
+        elif arg in ("-q", "--quiet"):
+            options.level = logging.ERROR
+        elif arg == "--counters" or arg.startswith("--counters="):
+            options.counters = True
+            options.counters_output = arg.partition("=")[2] or None
+        else:
+            remaining.append(arg)
+    return remaining, options
+
+
+def configure_logging(options: LogOptions) -> None:
+    """Send the ``esx`` logger tree to stderr at the requested level"""
+    import logging
+
+    if not any(getattr(h, "_esx_handler", False) for h in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        handler._esx_handler = True  # type: ignore[attr-defined]
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(options.level)
+
+
+def report_counters(options: LogOptions) -> None:
+    """Write the collected counters as JSON if --counters was given"""
+    if not options.counters:
+        return
+    import json
+
+    if options.counters_output:
+        with open(options.counters_output, "w", encoding="UTF-8") as f:
+            json.dump(COUNTERS.as_dict(), f, indent=2)
+    else:
+        print(json.dumps(COUNTERS.as_dict()))
+
+
+class FormID(int):
+    """A form ID, parsed once and interned, with cached text renderings
+
+    FormIDs are ints, so arithmetic, set/dict membership and ``:x``
+    formatting behave as before. There is one instance per value, and the
+    model's three renderings are computed when it is first created:
+
+    - ``hex8``: record ``id`` attributes, e.g. ``"00000800"``
+    - ``decimal``: ALST text and QSTA ``alias`` attributes, ``"2048"``
+    - ``prefixed``: CTDA ``param1``, ``"0x00000800"``
+
+    The top byte is the plugin index: ``0xFE`` marks a light (ESL) plugin,
+    whose index then sits in bits 12-23 above a 12-bit object ID.
+
+    ``parse`` and ``from_decimal`` also remember the text they were given.
+    Any spelling of an ID may come in (``"800"``, ``"0x800"``, ``"00000800"``),
+    so those caches are emptied once they hold ``PARSE_CACHE_SIZE`` texts.
+    """
+
+    __slots__ = ()
+
+    PARSE_CACHE_SIZE = 1 << 16
+
+    _interned: Dict[int, "FormID"] = {}
+    _renderings: Dict[int, Tuple[str, str, str]] = {}
+    _from_hex: Dict[str, "FormID"] = {}
+    _from_decimal: Dict[str, "FormID"] = {}
+
+    def __new__(cls, value: int) -> "FormID":
+        form_id = cls._interned.get(value)
+        if form_id is not None:
+            return form_id
+        if not 0 <= value <= 0xFFFFFFFF:
+            raise ValueError(f"Form ID {value!r} is outside 0x00000000-0xFFFFFFFF")
+        form_id = int.__new__(cls, value)
+        cls._interned[value] = form_id
+        cls._renderings[value] = (f"{value:08x}", str(value), f"0x{value:08x}")
+        return form_id
+
+    @classmethod
+    def parse(cls, text: Union[int, str]) -> "FormID":
+        """FormID from hex text, with or without ``0x`` (``"00000800"``, ``"0x800"``)"""
+        if isinstance(text, int):
+            return cls(text)
+        form_id = cls._from_hex.get(text)
+        if form_id is None:
+            form_id = cls(int(text, 16))
+            if len(cls._from_hex) >= cls.PARSE_CACHE_SIZE:
+                cls._from_hex.clear()
+            cls._from_hex[text] = form_id
+        return form_id
+
+    @classmethod
+    def from_decimal(cls, text: Union[int, str]) -> "FormID":
+        """FormID from decimal text as in ALST and QSTA (``"2048"``)"""
+        if isinstance(text, int):
+            return cls(text)
+        form_id = cls._from_decimal.get(text)
+        if form_id is None:
+            form_id = cls(int(text))
+            if len(cls._from_decimal) >= cls.PARSE_CACHE_SIZE:
+                cls._from_decimal.clear()
+            cls._from_decimal[text] = form_id
+        return form_id
+
+    @property
+    def hex8(self) -> str:
+        return self._renderings[self][0]
+
+    @property
+    def decimal(self) -> str:
+        return self._renderings[self][1]
+
+    @property
+    def prefixed(self) -> str:
+        return self._renderings[self][2]
+
+    @property
+    def plugin_index(self) -> int:
+        """Load order index of the owning plugin (0xFE for any light plugin)"""
+        return self >> 24
+
+    @property
+    def is_light(self) -> bool:
+        return self >> 24 == 0xFE
+
+    @property
+    def light_index(self) -> Optional[int]:
+        """Index among light plugins, or None for a full plugin's FormID"""
+        return (self >> 12) & 0xFFF if self.is_light else None
+
+    @property
+    def object_id(self) -> int:
+        """The ID within its plugin: 12 bits for light plugins, else 24"""
+        return self & 0xFFF if self.is_light else self & 0xFFFFFF
+
+    @property
+    def in_esl_range(self) -> bool:
+        """A plugin-local ID that an ESL-flagged plugin may define"""
+        return 0x800 <= self <= 0xFFF
+
+    def in_plugin(self, index: int, light: bool = False) -> "FormID":
+        """This ID's object ID placed under a load order index
+
+        Light plugins use ``0xFE000000 | index << 12``; others ``index << 24``.
+        """
+        if light:
+            return FormID(0xFE000000 | (index & 0xFFF) << 12 | self & 0xFFF)
+        return FormID((index & 0xFF) << 24 | self & 0xFFFFFF)
+
+    def __repr__(self) -> str:
+        return f"FormID(0x{self.hex8})"
+
+    def __str__(self) -> str:
+        return self.decimal
+
+    def __reduce__(self) -> Tuple[Any, Tuple[int]]:
+        return (FormID, (int(self),))
+
+
 T = TypeVar("T", bound="ESXElement")
 
 
@@ -46,8 +507,108 @@ class ESXElement:
 
     def append(self, element: "ESXElement") -> None:
         element.parent = self
+        self._children_changed(len(self.elements))
         self.elements.append(element)
 
+    def extend(self, elements: Iterable["ESXElement"]) -> None:
+        """Append several children at once"""
+        elements = list(elements)
+        for element in elements:
+            element.parent = self
+        self._children_changed(len(self.elements))
+        self.elements.extend(elements)
+
+    def insert(self, index: int, element: "ESXElement") -> None:
+        """Insert a child at the given position"""
+        element.parent = self
+        self._children_changed(index)
+        self.elements.insert(index, element)
+
+    def insert_many(self, index: int, elements: Iterable["ESXElement"]) -> None:
+        """Insert a block of children with a single list shift"""
+        elements = list(elements)
+        for element in elements:
+            element.parent = self
+        self._children_changed(index)
+        self.elements[index:index] = elements
+
+    def insert_blocks(self, blocks: Dict[int, List["ESXElement"]]) -> None:
+        """Insert blocks at several positions of the current list in one pass
+
+        Positions refer to the list before any of the insertions.
+        """
+        if not blocks:
+            return
+        rebuilt: List[ESXElement] = []
+        previous = 0
+        for index in sorted(blocks):
+            rebuilt.extend(self.elements[previous:index])
+            for element in blocks[index]:
+                element.parent = self
+            rebuilt.extend(blocks[index])
+            previous = index
+        rebuilt.extend(self.elements[previous:])
+        self._children_changed(min(blocks))
+        self.elements[:] = rebuilt
+
+    def index_of(self, element: "ESXElement") -> int:
+        """Position of a child, compared by identity
+
+        Dataclass equality compares whole subtrees, so list.index/list.remove
+        would be both slow and wrong for structurally identical siblings.
+        """
+        for i, child in enumerate(self.elements):
+            if child is element:
+                return i
+        raise ESXInvalidElementError(f"{element.tag} is not a child of {self.tag}")
+
+    def remove(self, element: "ESXElement") -> None:
+        """Remove a single child"""
+        index = self.index_of(element)
+        self._children_changed(index)
+        del self.elements[index]
+        element.parent = None
+
+    def remove_many(self, elements: Iterable["ESXElement"]) -> int:
+        """Remove several children in one pass, returns how many were removed"""
+        doomed = {id(e) for e in elements}
+        if not doomed:
+            return 0
+        return self._remove_where(lambda child: id(child) in doomed)
+
+    def _remove_where(self, predicate: Any) -> int:
+        kept = []
+        first_removed = None
+        for i, child in enumerate(self.elements):
+            if predicate(child):
+                child.parent = None
+                if first_removed is None:
+                    first_removed = i
+            else:
+                kept.append(child)
+        if first_removed is None:
+            return 0
+        removed = len(self.elements) - len(kept)
+        self._children_changed(first_removed)
+        self.elements[:] = kept
+        return removed
+
+    def _children_changed(self, index: int) -> None:
+        """Hook called before children at or after ``index`` are modified"""
+        transaction = _TRANSACTION
+        if transaction is not None:
+            transaction.children_changed(self, index)
+
+    def touch(self) -> None:
+        """Call before editing ``attrib``, ``text`` or other fields in place
+
+        Lets an active Transaction restore them on rollback. Child list
+        edits made through append/insert/remove... are journaled already.
+        """
+        transaction = _TRANSACTION
+        if transaction is not None:
+            transaction.touch(self)
+
     def to_xml(self) -> ET.Element:
         """Convert to XML element"""
         element = ET.Element(self.tag, self.attrib)
@@ -67,11 +628,19 @@ class ESXElement:
         """Find all child elements with matching tag"""
         return [e for e in self.elements if e.tag == tag]
 
+    def __reduce__(self) -> Tuple[Any, Tuple[Any, ...]]:
+        """Pickle the subtree in the flat wire format (see element_to_wire)
+
+        The unpickled copy is detached: its ``parent`` is None.
+        """
+        return (element_from_wire, (element_to_wire(self),))
+
     def clone(self: T) -> T:
         """Create a deep copy of this element and its children"""
         # Create a new instance with same basic properties
+        # Attribute values are strings, so a shallow dict copy is a deep copy
         new_element = self.__class__(
-            tag=self.tag, attrib=copy.deepcopy(self.attrib), text=self.text
+            tag=self.tag, attrib=dict(self.attrib), text=self.text
         )
 
         # Copy all child elements recursively
@@ -98,13 +667,48 @@ class ESXElement:
         ctda.append(cls("comparisonValueFloat", text=str(comparison_value)))
         ctda.append(cls("functionIndex", text=str(function_index)))
         ctda.append(cls("padding", text="0x00,0x00"))
-        ctda.append(cls("param1", text=f"0x{alias_id:08x}"))
+        ctda.append(cls("param1", text=FormID(alias_id).prefixed))
         ctda.append(cls("param2", text=param2))
         ctda.append(cls("runOnType", text=run_on_type))
         ctda.append(cls("reference", text="00000000"))
         ctda.append(cls("unknown1", text="0xffffffff"))
         return ctda
 
+    @classmethod
+    def create_target_elements(
+        cls,
+        alias_id: int,
+        flags: int = 0,
+        conditions: Optional[List["ESXCondition"]] = None,
+    ) -> List["ESXElement"]:
+        """Create a QSTA target element followed by its CTDA conditions"""
+        qsta = cls("QSTA")
+        qsta.append(
+            cls(
+                "struct",
+                {"alias": FormID.from_decimal(alias_id).decimal, "flags": f"0x{flags:08x}"},
+            )
+        )
+        elements = [qsta]
+        for cond in conditions or []:
+            elements.append(
+                cls.create_condition_element(
+                    alias_id=FormID.parse(cond.param1)
+                    if cond.param1 is not None
+                    else 0,
+                    function_index=cond.function_index
+                    if cond.function_index is not None
+                    else 0,
+                    comparison_value=cond.comparison_value
+                    if cond.comparison_value is not None
+                    else 1.0,
+                    operator=cond.operator or "0x00",
+                    param2=cond.param2 or "0x00000000",
+                    run_on_type=cond.run_on_type or "0",
+                )
+            )
+        return elements
+
     @classmethod
     def create_objective_elements(
         cls, index: int, name: str, flags: int = 0
@@ -121,7 +725,7 @@ class ESXElement:
     ) -> List["ESXElement"]:
         """Create a set of elements for a quest alias"""
         elements = []
-        alst = cls("ALST", text=str(alias_id))
+        alst = cls("ALST", text=FormID.from_decimal(alias_id).decimal)
         alid = cls("ALID", text=name)
         fnam = cls("FNAM", text=flags)
         elements.extend([alst, alid, fnam])
@@ -146,13 +750,21 @@ class ESXPlugin(ESXElement):
     groups: List["ESXGroup"] = field(default_factory=list)
 
     def add_tes4(self, tes4: "ESXTES4") -> None:
+        self.touch()
         self.tes4 = tes4
         self.append(tes4)
 
     def add_group(self, group: "ESXGroup") -> None:
+        self.touch()
         self.groups.append(group)
         self.append(group)
 
+    def remove_group(self, group: "ESXGroup") -> None:
+        """Remove a group and its records"""
+        self.touch()
+        self.groups = [g for g in self.groups if g is not group]
+        self.remove(group)
+
     def get_or_create_group(self, label: str, group_type: str = "0") -> "ESXGroup":
         """Get an existing group by label or create a new one"""
         for group in self.groups:
@@ -195,6 +807,7 @@ class ESXPlugin(ESXElement):
         quest_group.add_record(quest)
         return quest
 
+    @profiled("validate.esl")
     def is_esl_compatible(self) -> Tuple[bool, int, List[str]]:
         """Check if the plugin is compatible with ESL format
 
@@ -210,16 +823,9 @@ class ESXPlugin(ESXElement):
                 if "id" in record.attrib:
                     form_id = record.attrib["id"]
 
-                    # Convert to int for comparison
                     try:
-                        form_id_int = (
-                            int(form_id, 16)
-                            if form_id.startswith("0x")
-                            else int(form_id, 16)
-                        )
-
                         # Check if in ESL range (0x800-0xFFF)
-                        if not (0x800 <= form_id_int <= 0xFFF):
+                        if not FormID.parse(form_id).in_esl_range:
                             errors.append(
                                 f"Form ID {form_id} for {record.tag} is outside ESL range 0x800-0xFFF"
                             )
@@ -243,6 +849,12 @@ class ESXRecord(ESXElement):
 
     editor_id: Optional[str] = None
 
+    @property
+    def form_id(self) -> Optional[FormID]:
+        """The record's ``id`` attribute as a FormID, if it has one"""
+        record_id = self.attrib.get("id")
+        return FormID.parse(record_id) if record_id else None
+
     def get_editor_id(self) -> Optional[str]:
         """Get the editor ID if present"""
         edid = self.find("EDID")
@@ -250,8 +862,10 @@ class ESXRecord(ESXElement):
 
     def set_editor_id(self, editor_id: str) -> None:
         """Set the editor ID"""
+        self.touch()
         edid = self.find("EDID")
         if edid:
+            edid.touch()
             edid.text = editor_id
         else:
             edid = ESXElement("EDID", text=editor_id)
@@ -266,6 +880,7 @@ class ESXTES4(ESXRecord):
     masters: List[str] = field(default_factory=list)
 
     def add_master(self, master_name: str) -> None:
+        self.touch()
         mast = ESXElement("MAST", text=master_name)
         data = ESXElement("DATA", text="0")
         self.append(mast)
@@ -287,9 +902,39 @@ class ESXGroup(ESXElement):
         super().__init__("GRUP", self.attrib)
 
     def add_record(self, record: ESXRecord) -> None:
+        self.touch()
         self.records.append(record)
         self.append(record)
 
+    def insert_record(self, index: int, record: ESXRecord) -> None:
+        """Insert a record at the given position among the group's records"""
+        self.touch()
+        if index < len(self.records):
+            position = self.index_of(self.records[index])
+        else:
+            position = len(self.elements)
+        self.records.insert(index, record)
+        self.insert(position, record)
+
+    def remove_record(self, record: ESXRecord) -> None:
+        """Remove a record from the group"""
+        self.touch()
+        self.records = [r for r in self.records if r is not record]
+        self.remove(record)
+
+    def replace_record(self, old: ESXRecord, new: ESXRecord) -> None:
+        """Swap a record for another in the same position"""
+        if old is new:
+            return
+        self.touch()
+        index = next(i for i, r in enumerate(self.records) if r is old)
+        self.records[index] = new
+        position = self.index_of(old)
+        self._children_changed(position)
+        self.elements[position] = new
+        old.parent = None
+        new.parent = self
+
     def get_record(self, editor_id: str) -> Optional[ESXRecord]:
         """Find a record by editor ID"""
         for record in self.records:
@@ -300,25 +945,117 @@ class ESXGroup(ESXElement):
 
 @dataclass
 class ESXQuest(ESXRecord):
-    """QUST record"""
+    """QUST record
+
+    ``aliases`` and ``objectives`` are views computed lazily from the raw
+    child elements and cached. Edits made through the element API
+    (append/insert/remove...) invalidate the cache from the first touched
+    position, and the next access rescans only from the start of the
+    objective containing it. Call ``invalidate()`` after editing grandchildren
+    (e.g. an ALID's text) directly.
+
+    Aliases and targets are stored column-wise (AliasTable, TargetTable) and
+    read through lightweight row views, so a 2000-alias quest costs a few
+    arrays rather than thousands of dataclasses and dicts.
+    """
 
-    objectives: List["ESXObjective"] = field(default_factory=list)
-    aliases: List["ESXAlias"] = field(default_factory=list)
     stages: List["ESXElement"] = field(default_factory=list)
     full_name: Optional[str] = None
     script: Optional[str] = None
     priority: Optional[int] = None
     quest_flags: Optional[str] = None
+    _scan: Optional["_QuestScan"] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def aliases(self) -> "AliasTable":
+        """Aliases defined by ALST...ALED blocks (read-only view)"""
+        return self._semantics().aliases
+
+    @property
+    def targets(self) -> "TargetTable":
+        """Every objective's QSTA targets, in objective order (read-only view)"""
+        return self._semantics().targets
+
+    @property
+    def objectives(self) -> List["ESXObjective"]:
+        """Objectives defined by QOBJ blocks with their QSTA targets (read-only view)"""
+        return self._semantics().objectives
+
+    def _semantics(self) -> "_QuestScan":
+        scan = self._scan
+        if (
+            scan is None
+            or scan.elements_ref is not self.elements
+            or scan.valid_upto > len(self.elements)
+        ):
+            # First access, or the child list was replaced/shrunk behind our back
+            scan = self._scan = _QuestScan(self.elements)
+        if scan.valid_upto < len(self.elements):
+            with span("quest.extract"):
+                scan.scan(self.elements)
+        return scan
+
+    def _children_changed(self, index: int) -> None:
+        super()._children_changed(index)
+        if self._scan is not None and index < self._scan.valid_upto:
+            self._scan.rewind(index)
+
+    def invalidate(self) -> None:
+        """Drop cached views and re-read header fields from the children"""
+        self.touch()
+        self._scan = None
+        self.editor_id = self.get_editor_id()
+        full = self.find("FULL")
+        self.full_name = full.text if full else None
+        for child in self.elements:
+            if child.tag == "DNAM":
+                struct = child.find("struct")
+                if struct:
+                    self.quest_flags = struct.attrib.get("flags", "")
+                    self.priority = int(struct.attrib.get("priority", 0))
+            elif child.tag == "VMAD":
+                for script in child.find_all("script"):
+                    self.script = script.attrib.get("name", "")
 
     def add_objective(self, objective: "ESXObjective") -> None:
-        self.objectives.append(objective)
+        """Append the element blocks for an objective and its targets"""
+        self.extend(
+            ESXElement.create_objective_elements(
+                objective.index, objective.name, objective.flags or 0
+            )
+        )
+        for target in objective.targets:
+            self.extend(
+                ESXElement.create_target_elements(
+                    int(target["alias"]),  # type: ignore[arg-type]
+                    int(target["flags"]),  # type: ignore[arg-type]
+                    target["conditions"],  # type: ignore[arg-type]
+                )
+            )
 
     def add_alias(self, alias: "ESXAlias") -> None:
-        self.aliases.append(alias)
+        """Append the ALST...ALED block for an alias"""
+        elements = [
+            ESXElement("ALST", text=FormID.from_decimal(alias.index).decimal),
+            ESXElement("ALID", text=alias.name),
+            ESXElement("FNAM", text=alias.flags or "0"),
+        ]
+        if alias.ref_id:
+            elements.append(ESXElement("ALFR", text=alias.ref_id))
+        elements.append(ESXElement("VTCK", text="00000000"))
+        elements.append(ESXElement("ALED"))
+        self.extend(elements)
 
     def add_stage(self, stage: ESXElement) -> None:
+        self.touch()
         self.stages.append(stage)
 
+    def get_alias(self, alias_id: Union[int, str]) -> Optional["AliasRow"]:
+        """Get an alias by ID"""
+        return self.aliases.find(alias_id)
+
     def get_objective(self, index: int) -> Optional["ESXObjective"]:
         """Get an objective by index"""
         for obj in self.objectives:
@@ -326,27 +1063,55 @@ class ESXQuest(ESXRecord):
                 return obj
         return None
 
+    def objective_ends(self) -> Dict[int, int]:
+        """Child position just past each objective's block, by index
+
+        The last block ends before an ANAM following it, so ANAM stays last.
+        """
+        ends: Dict[int, int] = {}
+        current = None
+        anam = None
+        for i, child in enumerate(self.elements):
+            if child.tag == "QOBJ":
+                if current is not None:
+                    ends[current] = i
+                current = int((child.text or "0").strip())
+                anam = None
+            elif child.tag == "ANAM" and anam is None:
+                anam = i
+        end = anam if anam is not None else len(self.elements)
+        if current is not None:
+            ends[current] = end
+        return ends
+
+    def objective_end(self, index: Optional[int] = None) -> int:
+        """Child position just past an objective's block, or the last one's"""
+        ends = self.objective_ends()
+        if index is None:
+            if ends:
+                return max(ends.values())
+            anam = self.find("ANAM")
+            return self.index_of(anam) if anam else len(self.elements)
+        if index not in ends:
+            raise ESXInvalidElementError(f"Objective {index} not found")
+        return ends[index]
+
     def get_or_create_objective(self, index: int, name: str) -> "ESXObjective":
         """Get an objective by index or create a new one"""
         obj = self.get_objective(index)
         if obj:
             return obj
 
-        # Create new objective
-        obj = ESXObjective(index=index, name=name)
-        self.add_objective(obj)
-
         # Add element structure for this objective
-        obj_elements = ESXElement.create_objective_elements(index, name)
-        for elem in obj_elements:
-            self.append(elem)
-
-        return obj
+        self.extend(ESXElement.create_objective_elements(index, name))
+        return cast(ESXObjective, self.get_objective(index))
 
     def set_full_name(self, full_name: str) -> None:
         """Set the quest's full name"""
+        self.touch()
         full_elem = self.find("FULL")
         if full_elem:
+            full_elem.touch()
             full_elem.text = full_name
         else:
             full_elem = ESXElement("FULL", text=full_name)
@@ -356,32 +1121,213 @@ class ESXQuest(ESXRecord):
     def add_condition_to_objective(
         self, obj_index: int, condition: "ESXCondition"
     ) -> None:
-        """Add a condition to an objective"""
-        obj = self.get_objective(obj_index)
-        if not obj:
+        """Add a condition to every target of an objective
+
+        A CTDA is inserted after each of the objective's QSTA targets (and
+        the conditions already following it), in one pass over the children.
+        """
+        if not self.get_objective(obj_index):
             raise ESXInvalidElementError(f"Objective {obj_index} not found")
 
-        # Add the CTDA element to the quest structure
-        ctda = ESXElement.create_condition_element(
-            alias_id=int(condition.param1) if condition.param1 is not None else 0,
-            function_index=condition.function_index
-            if condition.function_index is not None
-            else 0,
-            comparison_value=condition.comparison_value or 1.0,
-            operator=condition.operator or "0x00",
-            param2=condition.param2 or "0x00000000",
-            run_on_type=condition.run_on_type or "0",
+        alias_id = (
+            FormID.parse(condition.param1) if condition.param1 is not None else 0
+        )
+
+        def make_ctda() -> ESXElement:
+            return ESXElement.create_condition_element(
+                alias_id=alias_id,
+                function_index=condition.function_index
+                if condition.function_index is not None
+                else 0,
+                comparison_value=condition.comparison_value or 1.0,
+                operator=condition.operator or "0x00",
+                param2=condition.param2 or "0x00000000",
+                run_on_type=condition.run_on_type or "0",
+            )
+
+        key = str(obj_index)
+        children = self.elements
+        rebuilt: List[ESXElement] = []
+        first_changed = None
+        in_objective = False
+        in_target = False
+        for i, child in enumerate(children):
+            if in_target and child.tag != "CTDA":
+                if first_changed is None:
+                    first_changed = i
+                rebuilt.append(make_ctda())
+                in_target = False
+            if child.tag == "QOBJ":
+                in_objective = (child.text or "").strip() == key
+            elif child.tag == "QSTA":
+                in_target = in_objective
+            rebuilt.append(child)
+        if in_target:
+            if first_changed is None:
+                first_changed = len(children)
+            rebuilt.append(make_ctda())
+
+        if first_changed is not None:
+            self._children_changed(first_changed)
+            for element in rebuilt:
+                element.parent = self
+            children[:] = rebuilt
+
+    def insert_alias(
+        self,
+        alias_id: int,
+        name: str,
+        flags: str = "0",
+        is_player_ref: bool = False,
+        before: Optional[Union[int, str]] = None,
+    ) -> "AliasRow":
+        """Insert an ALST...ALED block, before another alias or at the end"""
+        elements = ESXElement.create_alias_elements(
+            alias_id=alias_id, name=name, flags=flags, is_player_ref=is_player_ref
         )
-        self.append(ctda)
 
-        # Update objective's conditions
-        for target in obj.targets:
-            target["conditions"].append(condition)
+        if before is None:
+            self.extend(elements)
+        else:
+            key = str(before)
+            position = next(
+                (
+                    i
+                    for i, e in enumerate(self.elements)
+                    if e.tag == "ALST" and (e.text or "").strip() == key
+                ),
+                None,
+            )
+            if position is None:
+                raise ESXInvalidElementError(f"Alias {before} not found")
+            self.insert_many(position, elements)
+
+        return cast(AliasRow, self.get_alias(alias_id))
+
+    def insert_objective(
+        self,
+        index: int,
+        name: str,
+        flags: int = 0,
+        before: Optional[int] = None,
+    ) -> "ESXObjective":
+        """Insert a QOBJ block, before another objective or at the end"""
+        elements = ESXElement.create_objective_elements(index, name, flags)
+
+        if before is None:
+            self.extend(elements)
+        else:
+            key = str(before)
+            position = next(
+                (
+                    i
+                    for i, e in enumerate(self.elements)
+                    if e.tag == "QOBJ" and (e.text or "").strip() == key
+                ),
+                None,
+            )
+            if position is None:
+                raise ESXInvalidElementError(f"Objective {before} not found")
+            self.insert_many(position, elements)
+
+        return cast(ESXObjective, self.get_objective(index))
+
+    def remove_alias(self, alias_id: Union[int, str]) -> int:
+        """Remove an alias block and any objective targets pointing at it"""
+        return self.remove_aliases([alias_id])
+
+    def remove_aliases(self, alias_ids: Iterable[Union[int, str]]) -> int:
+        """Remove many aliases in a single pass over the quest's children
+
+        Each ALST...ALED block is dropped together with the QSTA targets that
+        reference it and the CTDA conditions following those targets.
+
+        Returns:
+            Number of child elements removed
+        """
+        keys = {str(alias_id) for alias_id in alias_ids}
+        if not keys:
+            return 0
+        return self._remove_blocks(alias_keys=keys, objective_keys=set())
+
+    def remove_objective(self, index: int, remove_aliases: bool = True) -> int:
+        """Remove an objective, its targets and optionally their aliases"""
+        return self.remove_objectives([index], remove_aliases)
+
+    def remove_objectives(
+        self, indices: Iterable[int], remove_aliases: bool = True
+    ) -> int:
+        """Remove many objectives in a single pass over the quest's children
+
+        Returns:
+            Number of child elements removed
+        """
+        objective_keys = {str(index) for index in indices}
+        if not objective_keys:
+            return 0
+
+        alias_keys: Set[str] = set()
+        if remove_aliases:
+            current = None
+            for child in self.elements:
+                if child.tag == "QOBJ":
+                    current = (child.text or "").strip()
+                elif child.tag == "QSTA" and current in objective_keys:
+                    struct = child.find("struct")
+                    if struct is not None and "alias" in struct.attrib:
+                        alias_keys.add(struct.attrib["alias"])
+
+        return self._remove_blocks(alias_keys, objective_keys)
+
+    def _remove_blocks(self, alias_keys: Set[str], objective_keys: Set[str]) -> int:
+        """Filter out alias blocks, objective headers and their targets"""
+        in_alias = False  # Inside an ALST...ALED block being removed
+        in_objective = False  # Between a removed QOBJ and the next QOBJ
+        in_objective_header = False  # QOBJ followed by its FNAM/NNAM
+        in_target = False  # A removed QSTA followed by its CTDAs
+
+        def doomed(child: ESXElement) -> bool:
+            nonlocal in_alias, in_objective, in_objective_header, in_target
+            tag = child.tag
+            if tag == "ALST":
+                in_alias = (child.text or "").strip() in alias_keys
+                in_target = in_objective_header = False
+                return in_alias
+            if in_alias:
+                if tag == "ALED":
+                    in_alias = False
+                    return True
+                if tag != "QOBJ":
+                    return True
+                in_alias = False
+            if tag == "QOBJ":
+                in_objective = (child.text or "").strip() in objective_keys
+                in_objective_header = in_objective
+                in_target = False
+                return in_objective
+            if in_objective_header and tag in ("FNAM", "NNAM"):
+                return True
+            in_objective_header = False
+            if tag == "QSTA":
+                struct = child.find("struct")
+                alias = struct.attrib.get("alias") if struct is not None else None
+                in_target = in_objective or alias in alias_keys
+                return in_target
+            if tag == "CTDA" and in_target:
+                return True
+            in_target = False
+            return False
+
+        return self._remove_where(doomed)
 
 
 @dataclass
 class ESXObjective:
-    """Quest objective representation"""
+    """Quest objective representation
+
+    Objectives read from a quest hold a TargetView of TargetRow mappings in
+    ``targets`` rather than a list of dicts; both read the same way.
+    """
 
     index: int
     name: str
@@ -425,18 +1371,1174 @@ class ESXCondition:
     run_on_type: Optional[str] = None
     reference: Optional[str] = None
 
+    @classmethod
+    def from_element(cls, element: ESXElement) -> "ESXCondition":
+        """Read a condition from a CTDA element"""
+        cond = cls()
+        for child in element.elements:
+            tag = child.tag
+            if tag == "operator":
+                cond.operator = child.text
+            elif tag == "comparisonValueFloat":
+                cond.comparison_value = float(child.text) if child.text else None
+            elif tag == "functionIndex":
+                cond.function_index = int(child.text) if child.text else None
+            elif tag == "param1":
+                cond.param1 = child.text
+            elif tag == "param2":
+                cond.param2 = child.text
+            elif tag == "runOnType":
+                cond.run_on_type = child.text
+            elif tag == "reference":
+                cond.reference = child.text
+        return cond
+
+
+_NO_TEXT = 0xFFFFFFFF  # StringTable index of a missing element text
+
+
+class StringTable:
+    """Interned strings addressed by a dense index"""
+
+    __slots__ = ("strings", "_index")
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, text: Optional[str]) -> int:
+        if text is None:
+            return _NO_TEXT
+        index = self._index.get(text)
+        if index is None:
+            index = self._index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def lookup(self, text: Optional[str]) -> Optional[int]:
+        """Index of text if it was interned, without adding it"""
+        return _NO_TEXT if text is None else self._index.get(text)
+
+    def get(self, index: int) -> Optional[str]:
+        return None if index == _NO_TEXT else self.strings[index]
+
+
+def _column_id(text: Optional[str]) -> Optional[int]:
+    """An alias ID as stored in an ``array('I')`` column, or None if not decimal"""
+    try:
+        value = int(text)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    return value if 0 <= value <= 0xFFFFFFFF else None
+
+
+def _column_set(column: "array[int]", raw: Dict[int, Optional[str]]) -> Set[Any]:
+    if not raw:
+        return set(column)
+    values: Set[Any] = {value for row, value in enumerate(column) if row not in raw}
+    values.update(raw.values())
+    return values
+
+
+class AliasTable:
+    """A quest's aliases as parallel columns, one row per ALST...ALED block
+
+    IDs and child positions are ``array('I')`` columns; FNAM and ALFR texts
+    are indexes into a per-quest string table (they take few distinct
+    values). Names are kept as references to the ALID texts themselves.
+    Each row's conditions are the CTDA elements of its block, stored like
+    TargetTable's. Alias scripts come from the quest's VMAD, keyed by the
+    alias ID they are attached to. Indexing yields ``AliasRow`` views with
+    ESXAlias's attributes.
+    """
+
+    __slots__ = (
+        "ids",
+        "names",
+        "flags",
+        "ref_ids",
+        "starts",
+        "texts",
+        "raw_ids",
+        "condition_starts",
+        "conditions",
+        "scripts",
+        "scripts_at",
+    )
+
+    def __init__(self) -> None:
+        self.ids = array("I")
+        self.names: List[str] = []
+        self.flags = array("I")
+        self.ref_ids = array("I")
+        self.starts = array("I")  # Child position of each ALST
+        self.texts = StringTable()
+        # ALST texts that are not decimal IDs, by row (kept verbatim)
+        self.raw_ids: Dict[int, Optional[str]] = {}
+        self.condition_starts = array("I")
+        self.conditions: List[ESXElement] = []
+        # Alias ID (or its text) -> script names, from the VMAD at child scripts_at
+        self.scripts: Dict[Any, List[str]] = {}
+        self.scripts_at = -1
+
+    def append(
+        self,
+        id_text: Optional[str],
+        name: str,
+        flags: Optional[str],
+        ref_id: Optional[str],
+        start: int,
+        conditions: Sequence[ESXElement] = (),
+    ) -> None:
+        form_id = _column_id(id_text)
+        if form_id is None:
+            self.raw_ids[len(self.ids)] = id_text
+        self.ids.append(form_id or 0)
+        self.names.append(name)
+        self.flags.append(self.texts.intern(flags))
+        self.ref_ids.append(self.texts.intern(ref_id))
+        self.starts.append(start)
+        self.condition_starts.append(len(self.conditions))
+        self.conditions.extend(conditions)
+
+    def truncate(self, rows: int) -> None:
+        """Drop every row from ``rows`` on, with their conditions"""
+        if rows < len(self.ids):
+            del self.conditions[self.condition_starts[rows] :]
+        del self.condition_starts[rows:]
+        del self.ids[rows:]
+        del self.names[rows:]
+        del self.flags[rows:]
+        del self.ref_ids[rows:]
+        del self.starts[rows:]
+        for row in [row for row in self.raw_ids if row >= rows]:
+            del self.raw_ids[row]
+
+    def form_id(self, row: int) -> Any:
+        if row in self.raw_ids:
+            return self.raw_ids[row]
+        return FormID(self.ids[row])
+
+    def find(self, alias_id: Union[int, str]) -> Optional["AliasRow"]:
+        """The first row whose alias ID reads as alias_id"""
+        key = str(alias_id)
+        rows = [row for row, raw in self.raw_ids.items() if raw == key]
+        form_id = _column_id(key)
+        if form_id is not None and str(form_id) == key:
+            start = 0
+            while True:
+                try:
+                    row = self.ids.index(form_id, start)
+                except ValueError:
+                    break
+                if row not in self.raw_ids:
+                    rows.append(row)
+                    break
+                start = row + 1
+        return AliasRow(self, min(rows)) if rows else None
+
+    def id_set(self) -> Set[Any]:
+        """Every alias ID in the table (non-decimal ones as their text)"""
+        return _column_set(self.ids, self.raw_ids)
+
+    def ids_with_flags(self, flags: str) -> List[FormID]:
+        """IDs of the aliases whose FNAM text is ``flags``"""
+        code = self.texts.lookup(flags)
+        if code is None:
+            return []
+        return [
+            FormID(form_id)
+            for row, (form_id, row_flags) in enumerate(zip(self.ids, self.flags))
+            if row_flags == code and row not in self.raw_ids
+        ]
+
+    def count_with_flags(self, flags: str) -> int:
+        code = self.texts.lookup(flags)
+        return 0 if code is None else self.flags.count(code)
+
+    def condition_elements(self, row: int) -> List[ESXElement]:
+        start = self.condition_starts[row]
+        if row + 1 < len(self.condition_starts):
+            return self.conditions[start : self.condition_starts[row + 1]]
+        return self.conditions[start:]
+
+    def set_scripts(self, vmad: ESXElement, position: int) -> None:
+        """Read the alias scripts of a quest's VMAD, found at child ``position``"""
+        self.scripts = {}
+        self.scripts_at = position
+        stack = [vmad]
+        while stack:
+            element = stack.pop()
+            if element.tag == "alias" and "object" in element.attrib:
+                text = element.attrib["object"]
+                form_id = _column_id(text)
+                key = form_id if form_id is not None and str(form_id) == text else text
+                self.scripts.setdefault(key, []).extend(
+                    child.attrib.get("name", "")
+                    for child in element.elements
+                    if child.tag == "script"
+                )
+            else:
+                stack.extend(reversed(element.elements))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    @overload
+    def __getitem__(self, row: int) -> "AliasRow": ...
+
+    @overload
+    def __getitem__(self, row: slice) -> List["AliasRow"]: ...
+
+    def __getitem__(self, row: Union[int, slice]) -> Any:
+        if isinstance(row, slice):
+            return [AliasRow(self, i) for i in range(*row.indices(len(self.ids)))]
+        if row < 0:
+            row += len(self.ids)
+        if not 0 <= row < len(self.ids):
+            raise IndexError("alias row out of range")
+        return AliasRow(self, row)
+
+    def __iter__(self) -> Iterator["AliasRow"]:
+        return (AliasRow(self, row) for row in range(len(self.ids)))
+
+
+class AliasRow:
+    """Read-only view of one AliasTable row, with ESXAlias's attributes"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: AliasTable, row: int):
+        self._table = table
+        self._row = row
+
+    @property
+    def index(self) -> Any:
+        return self._table.form_id(self._row)
+
+    @property
+    def name(self) -> str:
+        return self._table.names[self._row]
+
+    @property
+    def flags(self) -> Optional[str]:
+        return self._table.texts.get(self._table.flags[self._row])
+
+    @property
+    def ref_id(self) -> Optional[str]:
+        return self._table.texts.get(self._table.ref_ids[self._row])
+
+    @property
+    def conditions(self) -> List[ESXCondition]:
+        return [
+            ESXCondition.from_element(element)
+            for element in self._table.condition_elements(self._row)
+        ]
+
+    @property
+    def scripts(self) -> List[str]:
+        table = self._table
+        key = table.raw_ids.get(self._row, table.ids[self._row])
+        return list(table.scripts.get(key, ()))
+
+    def to_alias(self) -> ESXAlias:
+        """A standalone ESXAlias with this row's values"""
+        return ESXAlias(
+            index=self.index,
+            name=self.name,
+            flags=self.flags,
+            ref_id=self.ref_id,
+            conditions=self.conditions,
+            scripts=self.scripts,
+        )
+
+    def __repr__(self) -> str:
+        return f"AliasRow(index={self.index!r}, name={self.name!r})"
+
+
+class TargetTable:
+    """Objective targets as parallel columns, one row per QSTA
+
+    Alias IDs and flags are ``array('I')`` columns. Each row's conditions
+    are the CTDA elements ``conditions[condition_starts[row]:...]``, read into
+    ESXCondition only when a row's ``conditions`` are asked for.
+    """
+
+    __slots__ = ("aliases", "flags", "condition_starts", "conditions", "raw_aliases")
+
+    def __init__(self) -> None:
+        self.aliases = array("I")
+        self.flags = array("I")
+        self.condition_starts = array("I")
+        self.conditions: List[ESXElement] = []
+        self.raw_aliases: Dict[int, Optional[str]] = {}
+
+    def append(self, alias_text: Optional[str], flags: int) -> None:
+        form_id = _column_id(alias_text)
+        if form_id is None:
+            self.raw_aliases[len(self.aliases)] = alias_text
+        self.aliases.append(form_id or 0)
+        self.flags.append(flags)
+        self.condition_starts.append(len(self.conditions))
+
+    def truncate(self, rows: int) -> None:
+        """Drop every row from ``rows`` on, with their conditions"""
+        if rows < len(self.aliases):
+            del self.conditions[self.condition_starts[rows] :]
+        del self.aliases[rows:]
+        del self.flags[rows:]
+        del self.condition_starts[rows:]
+        for row in [row for row in self.raw_aliases if row >= rows]:
+            del self.raw_aliases[row]
+
+    def alias(self, row: int) -> Any:
+        if row in self.raw_aliases:
+            return self.raw_aliases[row]
+        return FormID(self.aliases[row])
+
+    def condition_elements(self, row: int) -> List[ESXElement]:
+        start = self.condition_starts[row]
+        if row + 1 < len(self.condition_starts):
+            return self.conditions[start : self.condition_starts[row + 1]]
+        return self.conditions[start:]
+
+    def alias_set(self) -> Set[Any]:
+        """Every referenced alias ID (non-decimal ones as their text)"""
+        return _column_set(self.aliases, self.raw_aliases)
+
+    def rows_with_flags(self, mask: int) -> List[int]:
+        """Rows whose flags share a bit with mask"""
+        return [row for row, flags in enumerate(self.flags) if flags & mask]
+
+    def __len__(self) -> int:
+        return len(self.aliases)
+
+
+class TargetRow(Mapping[str, Any]):
+    """Read-only view of one TargetTable row
+
+    Reads like the ``{"alias", "flags", "conditions"}`` dicts that
+    ESXObjective.add_target creates, and as attributes.
+    """
+
+    __slots__ = ("_table", "_row")
+    _KEYS = ("alias", "flags", "conditions")
+
+    def __init__(self, table: TargetTable, row: int):
+        self._table = table
+        self._row = row
+
+    @property
+    def alias(self) -> Any:
+        return self._table.alias(self._row)
+
+    @property
+    def flags(self) -> int:
+        return self._table.flags[self._row]
+
+    @property
+    def conditions(self) -> List[ESXCondition]:
+        return [
+            ESXCondition.from_element(element)
+            for element in self._table.condition_elements(self._row)
+        ]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return f"TargetRow(alias={self.alias!r}, flags={self.flags!r})"
+
+
+class TargetView(Sequence[TargetRow]):
+    """One objective's targets: the contiguous rows ``[start, stop)`` of a TargetTable"""
+
+    __slots__ = ("table", "start", "stop")
+
+    def __init__(self, table: TargetTable, start: int):
+        self.table = table
+        self.start = start
+        self.stop = start
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @overload
+    def __getitem__(self, i: int) -> TargetRow: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[TargetRow]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Any:
+        if isinstance(i, slice):
+            return [
+                TargetRow(self.table, self.start + row)
+                for row in range(*i.indices(len(self)))
+            ]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("target index out of range")
+        return TargetRow(self.table, self.start + i)
+
+    def __iter__(self) -> Iterator[TargetRow]:
+        return (TargetRow(self.table, row) for row in range(self.start, self.stop))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+@dataclass
+class _QuestScan:
+    """Incremental scan state behind ESXQuest's semantic views
+
+    Children ``[0, valid_upto)`` have been scanned. The fields below
+    ``valid_upto`` hold the in-progress state at that point so appends
+    continue where the last scan stopped. Every QOBJ is a checkpoint with
+    clean state, which is where ``rewind`` restarts from.
+
+    Aliases and targets are stored column-wise in ``aliases`` and
+    ``targets``; each objective's ``targets`` is a TargetView over the
+    latter.
+    """
+
+    elements_ref: List[ESXElement]
+    valid_upto: int = 0
+    aliases: AliasTable = field(default_factory=AliasTable)
+    targets: TargetTable = field(default_factory=TargetTable)
+    objectives: List[ESXObjective] = field(default_factory=list)
+    objective_starts: List[int] = field(default_factory=list)
+    checkpoints: List[int] = field(default_factory=list)
+    # ALST awaiting its ALED: [id text, name, flags, ref_id, position, CTDAs]
+    open_alias: Optional[List[Any]] = None
+    header: Optional[Dict[str, Any]] = None  # QOBJ awaiting its NNAM
+    current_targets: Optional[TargetView] = None
+    in_target: bool = False  # CTDAs now belong to the last target row
+
+    def rewind(self, index: int) -> None:
+        """Forget everything scanned from the checkpoint before ``index``"""
+        # Strictly before: an edit right at a QOBJ may continue the previous
+        # objective (e.g. a CTDA appended to its last target)
+        restart = bisect.bisect_left(self.checkpoints, index) - 1
+        position = self.checkpoints[restart] if restart >= 0 else 0
+        del self.checkpoints[max(restart, 0) :]
+
+        self.aliases.truncate(bisect.bisect_left(self.aliases.starts, position))
+        if self.aliases.scripts_at >= position:
+            self.aliases.scripts = {}
+            self.aliases.scripts_at = -1
+        cut = bisect.bisect_left(self.objective_starts, position)
+        if cut < len(self.objectives):
+            dropped = cast(TargetView, self.objectives[cut].targets)
+            self.targets.truncate(dropped.start)
+        del self.objectives[cut:]
+        del self.objective_starts[cut:]
+
+        self.valid_upto = position
+        self.open_alias = None
+        self.header = None
+        self.current_targets = None
+        self.in_target = False
+
+    def scan(self, elements: List[ESXElement]) -> None:
+        """Extend the views over children ``[valid_upto, len(elements))``"""
+        targets = self.targets
+        for i in range(self.valid_upto, len(elements)):
+            child = elements[i]
+            tag = child.tag
+
+            if tag == "ALST":
+                self._close_alias()
+                self.open_alias = [child.text, "", None, None, i, []]
+                self.in_target = False
+                continue
+
+            alias = self.open_alias
+            if alias is not None:
+                if tag == "ALID":
+                    alias[1] = child.text
+                    continue
+                if tag == "FNAM":
+                    alias[2] = child.text
+                    continue
+                if tag == "ALFR":
+                    alias[3] = child.text
+                    continue
+                if tag == "ALED":
+                    self._close_alias()
+                    continue
+                if tag == "CTDA":
+                    alias[5].append(child)
+                    continue
+                if tag != "QOBJ":
+                    continue
+                self._close_alias()
+
+            if tag == "VMAD":
+                self.aliases.set_scripts(child, i)
+            elif tag == "QOBJ":
+                self.checkpoints.append(i)
+                self.header = {
+                    "index": int(child.text) if child.text else 0,
+                    "flags": None,
+                    "start": i,
+                }
+                self.current_targets = None
+                self.in_target = False
+            elif tag == "FNAM" and self.header is not None:
+                self.header["flags"] = int(child.text) if child.text else 0
+            elif tag == "NNAM" and self.header is not None:
+                view = TargetView(targets, len(targets))
+                obj = ESXObjective(
+                    index=self.header["index"],
+                    name=child.text,  # type: ignore[arg-type]
+                    flags=self.header["flags"],
+                    targets=view,  # type: ignore[arg-type]
+                )
+                self.objectives.append(obj)
+                self.objective_starts.append(self.header["start"])
+                self.current_targets = view
+                self.header = None
+            elif tag == "QSTA":
+                self.in_target = False
+                view = self.current_targets
+                if view is not None:
+                    struct = child.find("struct")
+                    if struct is not None:
+                        targets.append(
+                            struct.attrib.get("alias", "0"),
+                            int(struct.attrib.get("flags", "0x00000000"), 16),
+                        )
+                        view.stop = len(targets)
+                        self.in_target = True
+            elif tag == "CTDA" and self.in_target:
+                targets.conditions.append(child)
+
+        self.valid_upto = len(elements)
+
+    def _close_alias(self) -> None:
+        alias = self.open_alias
+        if alias is not None:
+            if alias[1]:  # Only keep aliases that have a name
+                self.aliases.append(*alias)
+            self.open_alias = None
+
+
+WIRE_VERSION = 1
+
+# Fields every element carries in the node array itself
+_BASE_FIELDS = frozenset(("tag", "attrib", "text", "elements", "parent"))
+_WIRE_VALUE, _WIRE_REF, _WIRE_REFS = 0, 1, 2
+_WIRE_FIELDS: Dict[type, Tuple[Tuple[str, ...], Tuple[Tuple[str, Any, Any], ...]]] = {}
+
+
+def _wire_fields(
+    cls: type,
+) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, Any, Any], ...]]:
+    """(fields shipped per node, (name, default, factory) of every extra field)"""
+    cached = _WIRE_FIELDS.get(cls)
+    if cached is None:
+        import dataclasses
+
+        extra = [f for f in dataclasses.fields(cls) if f.name not in _BASE_FIELDS]
+        cached = _WIRE_FIELDS[cls] = (
+            tuple(f.name for f in extra if f.init),
+            tuple((f.name, f.default, f.default_factory) for f in extra),
+        )
+    return cached
+
+
+def _encode_field(value: Any, index: Dict[int, int]) -> Tuple[int, Any]:
+    if isinstance(value, ESXElement):
+        position = index.get(id(value))
+        if position is not None:
+            return (_WIRE_REF, position)
+    elif isinstance(value, list) and value and isinstance(value[0], ESXElement):
+        positions = [index.get(id(element)) for element in value]
+        if None not in positions:
+            return (_WIRE_REFS, positions)
+    if isinstance(value, list):
+        value = list(value)
+    # Anything else (including elements outside the subtree) is shipped as is
+    return (_WIRE_VALUE, value)
+
+
+def element_to_wire(root: ESXElement) -> Tuple[Any, ...]:
+    """Flatten a subtree for pickling or IPC
+
+    The result is ``(WIRE_VERSION, classes, strings, shape, refs, extras)``,
+    with every element of the subtree in pre-order:
+
+    - ``shape`` is an ``array('I')`` of ``class, attribute count, child
+      count`` per element, classes being indexes into ``classes``
+    - ``refs`` is an ``array('I')`` of ``tag, text, key, value, ...`` per
+      element, as indexes into ``strings`` (index 0 is None, for no text)
+    - ``extras`` lists ``(position, fields)`` for subclass fields such as
+      ``ESXQuest.editor_id`` or ``ESXGroup.records``; elements they point to
+      inside the subtree are stored as positions
+
+    Parent links and cached views are not stored; element_from_wire
+    rebuilds the former and the latter are recomputed on demand.
+    """
+    classes: List[type] = []
+    class_codes: Dict[type, int] = {}
+    shape: List[int] = []
+    refs: List[Optional[str]] = []
+    order: List[ESXElement] = []
+    stack = [root]
+    with span("wire.encode"):
+        while stack:
+            element = stack.pop()
+            cls = type(element)
+            code = class_codes.get(cls)
+            if code is None:
+                code = class_codes[cls] = len(classes)
+                classes.append(cls)
+            order.append(element)
+            attrib = element.attrib
+            children = element.elements
+            shape += (code, len(attrib), len(children))
+            refs += (element.tag, element.text)
+            for item in attrib.items():
+                refs += item
+            stack.extend(reversed(children))
+
+        # Intern in one pass; a new string gets the next free index
+        table: Dict[Optional[str], int] = {None: 0}
+        setdefault = table.setdefault
+        ids = [setdefault(text, len(table)) for text in refs]
+
+        extras = []
+        index: Optional[Dict[int, int]] = None
+        for position, element in enumerate(order):
+            if type(element) is ESXElement:
+                continue
+            names = _wire_fields(type(element))[0]
+            if names:
+                if index is None:
+                    index = {id(e): i for i, e in enumerate(order)}
+                extras.append(
+                    (
+                        position,
+                        tuple(_encode_field(getattr(element, n), index) for n in names),
+                    )
+                )
+    return (
+        WIRE_VERSION,
+        classes,
+        list(table),
+        array("I", shape),
+        array("I", ids),
+        extras,
+    )
+
+
+@contextlib.contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Suspend cyclic GC while building many linked objects at once
+
+    Every element is a tracked container and parent links make cycles, so
+    bulk construction otherwise triggers repeated full collections.
+    """
+    import gc
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def element_from_wire(wire: Tuple[Any, ...]) -> ESXElement:
+    """Rebuild a subtree flattened by element_to_wire
+
+    Elements are created without running their ``__init__``, so this is
+    also cheaper than ``clone()`` for large subtrees.
+    """
+    version = wire[0]
+    if version != WIRE_VERSION:
+        raise ESXError(f"Unsupported ESX wire format version {version}")
+    _, classes, strings, shape, ids, extras = wire
+
+    with span("wire.decode"), _gc_paused():
+        plain = [cls is ESXElement for cls in classes]
+        defaults = [_wire_fields(cls)[1] for cls in classes]
+        resolved = list(map(strings.__getitem__, ids))
+        sizes = shape.tolist()
+        order: List[ESXElement] = []
+        # Open ancestors and how many of their children are still to come
+        parents: List[ESXElement] = []
+        pending: List[int] = []
+        r = 0
+        for i in range(0, len(sizes), 3):
+            code, count, children = sizes[i : i + 3]
+            tag = resolved[r]
+            text = resolved[r + 1]
+            r += 2
+            if count:
+                stop = r + 2 * count
+                attrib = dict(zip(resolved[r:stop:2], resolved[r + 1 : stop : 2]))
+                r = stop
+            else:
+                attrib = {}
+
+            while pending and not pending[-1]:
+                parents.pop()
+                pending.pop()
+            parent = parents[-1] if parents else None
+            cls = classes[code]
+            element = cls.__new__(cls)
+            state = {
+                "tag": tag,
+                "attrib": attrib,
+                "text": text,
+                "elements": [],
+                "parent": parent,
+            }
+            if not plain[code]:
+                for name, default, factory in defaults[code]:
+                    if factory is not MISSING:
+                        state[name] = factory()
+                    elif default is not MISSING:
+                        state[name] = default
+            element.__dict__ = state
+            if parent is not None:
+                parent.elements.append(element)
+                pending[-1] -= 1
+            order.append(element)
+            if children:
+                parents.append(element)
+                pending.append(children)
+
+        for position, fields in extras:
+            state = order[position].__dict__
+            names = _wire_fields(type(order[position]))[0]
+            for name, (kind, payload) in zip(names, fields):
+                if kind == _WIRE_REF:
+                    state[name] = order[payload]
+                elif kind == _WIRE_REFS:
+                    state[name] = [order[i] for i in payload]
+                elif isinstance(payload, list):
+                    state[name] = list(payload)
+                else:
+                    state[name] = payload
+    return order[0]
+
+
+# The innermost active Transaction; like the profiler, one per process
+_TRANSACTION: Optional["Transaction"] = None
+
+
+def _will_replace(obj: Any, name: str) -> None:
+    """Journal an attribute of obj before it is reassigned"""
+    transaction = _TRANSACTION
+    if transaction is not None:
+        transaction._undo.append((setattr, obj, name, getattr(obj, name)))
+
+
+class _JournaledSet(set):
+    """A set whose edits an active Transaction can undo"""
+
+    __slots__ = ()
+
+    def _journal(self, values: Iterable[Any], present: bool) -> None:
+        transaction = _TRANSACTION
+        if transaction is not None:
+            undo = set.add if present else set.discard
+            transaction._undo.extend(
+                (undo, self, value) for value in values if (value in self) is present
+            )
+
+    def add(self, value: Any) -> None:
+        self._journal((value,), False)
+        set.add(self, value)
+
+    def discard(self, value: Any) -> None:
+        self._journal((value,), True)
+        set.discard(self, value)
+
+    def remove(self, value: Any) -> None:
+        self._journal((value,), True)
+        set.remove(self, value)
+
+    def update(self, *others: Iterable[Any]) -> None:
+        for values in others:
+            values = list(values)
+            self._journal(values, False)
+            set.update(self, values)
+
+    def difference_update(self, *others: Iterable[Any]) -> None:
+        for values in others:
+            values = list(values)
+            self._journal(values, True)
+            set.difference_update(self, values)
+
+    def __ior__(self, other: Any) -> "_JournaledSet":
+        self.update(other)
+        return self
+
+    def __isub__(self, other: Any) -> "_JournaledSet":
+        self.difference_update(other)
+        return self
+
+    def clear(self) -> None:
+        self._journal(list(self), True)
+        set.clear(self)
+
+
+class _JournaledDict(dict):
+    """A dict whose edits an active Transaction can undo"""
+
+    __slots__ = ()
+
+    def _journal(self, key: Any) -> None:
+        transaction = _TRANSACTION
+        if transaction is not None:
+            if key in self:
+                transaction._undo.append((dict.__setitem__, self, key, self[key]))
+            else:
+                transaction._undo.append((dict.pop, self, key, None))
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._journal(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        self._journal(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        self._journal(key)
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self) -> None:
+        for key in list(self):
+            self._journal(key)
+        dict.clear(self)
+
+
+class Transaction:
+    """Undo journal for edits to elements, FormIDManagers and QuestBuilders
+
+    While a transaction is active, every element records its child list the
+    first time it changes (or just its length, while the edits are appends)
+    and its own fields when ``touch()``ed; FormIDManager and QuestBuilder
+    record each ID and alias they change. ``rollback()`` puts all of it
+    back, so its cost follows the edits made, not the size of the plugin::
+
+        with Transaction():
+            builder.add_objective_with_targets(5, "Objective 5", 300)
+        # on ESXFormIDConflictError, the quest and the manager are unchanged
+
+    Leaving the ``with`` block by an exception rolls back, otherwise it
+    commits. Transactions nest: committing an inner one hands its journal
+    to the outer one. Only the innermost transaction can end, and like the
+    profiler there is one stack per process.
+    """
+
+    def __init__(self) -> None:
+        self.active = False
+        self._outer: Optional[Transaction] = None
+        # id -> (element, {field: (value, copy of a list/dict value)})
+        self._states: Dict[int, Tuple[ESXElement, Dict[str, Tuple[Any, Any]]]] = {}
+        # id -> (element, original children, or their count while only appended to)
+        self._children: Dict[int, Tuple[ESXElement, Union[int, List[ESXElement]]]] = {}
+        # (function, *args) calls that undo container and attribute edits
+        self._undo: List[Tuple[Any, ...]] = []
+
+    def __enter__(self) -> "Transaction":
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self.active:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+
+    @property
+    def size(self) -> int:
+        """Number of journal entries"""
+        return len(self._states) + len(self._children) + len(self._undo)
+
+    def begin(self) -> None:
+        global _TRANSACTION
+        if self.active:
+            raise ESXError("Transaction is already active")
+        self._outer = _TRANSACTION
+        _TRANSACTION = self
+        self.active = True
+
+    def touch(self, element: ESXElement) -> None:
+        """Remember an element's fields (not its children) before an edit"""
+        key = id(element)
+        if key in self._states:
+            return
+        state = {}
+        for name, value in element.__dict__.items():
+            if name in ("elements", "parent", "_scan"):
+                continue
+            kind = type(value)
+            state[name] = (value, value.copy() if kind is list or kind is dict else None)
+        self._states[key] = (element, state)
+
+    def children_changed(self, element: ESXElement, index: int) -> None:
+        """Remember an element's children before those from ``index`` change"""
+        key = id(element)
+        saved = self._children.get(key)
+        if saved is None:
+            elements = element.elements
+            if index >= len(elements):
+                self._children[key] = (element, len(elements))
+            else:
+                self._children[key] = (element, elements.copy())
+        elif isinstance(saved[1], int) and index < saved[1]:
+            # No longer append-only; the first saved[1] children are original
+            self._children[key] = (element, element.elements[: saved[1]])
+
+    def commit(self) -> None:
+        """Keep the edits (an outer transaction can still undo them)"""
+        self._end()
+        outer = self._outer
+        if outer is not None:
+            for key, entry in self._states.items():
+                outer._states.setdefault(key, entry)
+            for key, (element, saved) in self._children.items():
+                prior = outer._children.get(key)
+                if prior is None:
+                    outer._children[key] = (element, saved)
+                elif isinstance(prior[1], int) and not isinstance(saved, int):
+                    outer._children[key] = (element, saved[: prior[1]])
+            outer._undo.extend(self._undo)
+        self._reset()
+
+    def rollback(self) -> None:
+        """Undo every edit made since begin()"""
+        global _TRANSACTION
+        self._end()
+        outer = _TRANSACTION
+        _TRANSACTION = None  # Restoring must not be journaled
+        try:
+            with span("transaction.rollback"):
+                for function, *args in reversed(self._undo):
+                    function(*args)
+
+                for element, state in self._states.values():
+                    fields = element.__dict__
+                    for name, (value, copy) in state.items():
+                        if copy is not None:
+                            if type(value) is list:
+                                value[:] = copy
+                            else:
+                                value.clear()
+                                value.update(copy)
+                        fields[name] = value
+
+                # Detach children added since, then reattach the originals;
+                # in that order, so a child moved between parents ends up home
+                for element, saved in self._children.values():
+                    if isinstance(saved, int):
+                        added = element.elements[saved:]
+                    else:
+                        original = {id(child) for child in saved}
+                        added = [c for c in element.elements if id(c) not in original]
+                    for child in added:
+                        if child.parent is element:
+                            child.parent = None
+                for element, saved in self._children.values():
+                    if isinstance(saved, int):
+                        del element.elements[saved:]
+                    else:
+                        element.elements[:] = saved
+                        for child in saved:
+                            child.parent = element
+                    element._children_changed(0)
+        finally:
+            _TRANSACTION = outer
+        self._reset()
+
+    def _end(self) -> None:
+        global _TRANSACTION
+        if not self.active:
+            raise ESXError("Transaction is not active")
+        if _TRANSACTION is not self:
+            raise ESXError("Only the innermost transaction can end")
+        _TRANSACTION = self._outer
+        self.active = False
+
+    def _reset(self) -> None:
+        self._states = {}
+        self._children = {}
+        self._undo = []
+
 
 class FormIDManager:
-    """Manager for allocating and tracking form IDs"""
+    """Manager for allocating and tracking form IDs
+
+    With an assignment map (``use_assignments``/``load_assignments``), IDs are
+    handed out by logical identity through ``assign``/``assign_many``: a key
+    seen in a previous run gets its old ID back, and new keys only take IDs
+    no key in the map owns. IDs still unclaimed at the end of a run are
+    freed by ``release_unclaimed`` for later runs to recycle.
+    """
 
-    def __init__(self, start_id: int = 0x800, end_id: int = 0xFFF):
+    def __init__(
+        self,
+        start_id: int = 0x800,
+        end_id: int = 0xFFF,
+        assignments: Optional[Dict[str, int]] = None,
+    ):
         self.start_id = start_id
         self.end_id = end_id
-        self.used_ids: Set[int] = set()
+        # Journaled containers, so a Transaction can undo allocations
+        self.used_ids: Set[int] = _JournaledSet()
+        # Logical key -> form ID, or None when allocating by order only
+        self.assignments: Optional[Dict[str, int]] = None
+        # IDs from the loaded map not yet claimed in this run (held in used_ids)
+        self._unclaimed: Dict[int, str] = _JournaledDict()
+        if assignments is not None:
+            self.use_assignments(assignments)
+
+    def use_assignments(self, assignments: Dict[str, int]) -> None:
+        """Hold every ID in the map for its key until claimed or released"""
+        _will_replace(self, "assignments")
+        self.assignments = _JournaledDict()
+        for key, form_id in assignments.items():
+            form_id = FormID(form_id)
+            if self.start_id <= form_id <= self.end_id and form_id not in self.used_ids:
+                self.used_ids.add(form_id)
+                self._unclaimed[form_id] = key
+                self.assignments[key] = form_id
+
+    def load_assignments(self, filename: str) -> None:
+        """Load an assignment map saved by save_assignments (missing file: empty map)"""
+        import json
+        import os
+
+        assignments: Dict[str, int] = {}
+        if os.path.exists(filename):
+            with open(filename, encoding="UTF-8") as f:
+                data = json.load(f)
+            assignments = {
+                key: FormID.parse(form_id) for key, form_id in data["assignments"].items()
+            }
+        self.use_assignments(assignments)
+
+    def save_assignments(self, filename: str) -> None:
+        """Write the assignment map as sorted JSON"""
+        import json
+
+        data = {
+            "start_id": FormID(self.start_id).hex8,
+            "end_id": FormID(self.end_id).hex8,
+            "assignments": {
+                key: FormID(form_id).hex8
+                for key, form_id in sorted((self.assignments or {}).items())
+            },
+        }
+        with open(filename, "w", encoding="UTF-8") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+
+    def assign(self, key: str, form_id: Optional[Union[int, str]] = None) -> FormID:
+        """Form ID for a logical identity, stable across runs with a map
+
+        Without a map this is reserve_id(form_id) or allocate_next_id().
+        """
+        if self.assignments is None:
+            return self.reserve_id(form_id) if form_id is not None else self.allocate_next_id()
+
+        if form_id is not None:
+            wanted = self._to_int(form_id)
+            owner = self._unclaimed.pop(wanted, None)
+            if owner is not None:
+                # Held for a key (maybe this one); hand it over
+                self.used_ids.discard(wanted)
+                del self.assignments[owner]
+            self._release_held(key)
+            self.reserve_id(wanted)
+            self.assignments[key] = wanted
+            return wanted
+
+        existing = self.assignments.get(key)
+        if existing is not None:
+            if self._unclaimed.get(existing) != key:
+                raise ESXFormIDConflictError(f"{key} was already assigned in this run")
+            del self._unclaimed[existing]
+            return existing
+        new_id = self.allocate_next_id()
+        self.assignments[key] = new_id
+        return new_id
+
+    def assign_many(self, keys: List[str]) -> List[int]:
+        """Form IDs for several keys; new keys get a consecutive run if one is free"""
+        if self.assignments is None:
+            return self._allocate_block(len(keys))
+
+        form_ids: List[int] = [0] * len(keys)
+        fresh = []
+        for i, key in enumerate(keys):
+            existing = self.assignments.get(key)
+            if existing is None:
+                fresh.append(i)
+            elif self._unclaimed.get(existing) == key:
+                del self._unclaimed[existing]
+                form_ids[i] = existing
+            else:
+                raise ESXFormIDConflictError(f"{key} was already assigned in this run")
+        for i, new_id in zip(fresh, self._allocate_block(len(fresh))):
+            form_ids[i] = new_id
+            self.assignments[keys[i]] = new_id
+        return form_ids
+
+    def release_unclaimed(self) -> List[str]:
+        """Free the IDs of keys not claimed in this run and forget the keys"""
+        keys = list(self._unclaimed.values())
+        for key in keys:
+            self._release_held(key)
+        return keys
+
+    def _release_held(self, key: str) -> None:
+        form_id = (self.assignments or {}).get(key)
+        if form_id is not None and self._unclaimed.get(form_id) == key:
+            del self._unclaimed[form_id]
+            del self.assignments[key]  # type: ignore[union-attr]
+            self.used_ids.discard(form_id)
+
+    def _allocate_block(self, count: int) -> List[int]:
+        # A consecutive run if possible, else fill holes
+        if not count:
+            return []
+        try:
+            return self.allocate_range(count)
+        except ESXFormIDConflictError:
+            return self.allocate_ids(count)
 
-    def reserve_id(self, form_id: Union[int, str]) -> int:
+    def reserve_id(self, form_id: Union[int, str]) -> FormID:
         """Reserve a specific form ID"""
-        # Convert string to int if needed
         form_id_int = self._to_int(form_id)
 
         if form_id_int < self.start_id or form_id_int > self.end_id:
@@ -450,17 +2552,68 @@ class FormIDManager:
         self.used_ids.add(form_id_int)
         return form_id_int
 
-    def allocate_next_id(self) -> int:
+    def allocate_next_id(self) -> FormID:
         """Allocate the next available ID"""
         next_id = self.start_id
         while next_id <= self.end_id:
             if next_id not in self.used_ids:
                 self.used_ids.add(next_id)
-                return next_id
+                COUNTERS.incr("formid.allocated")
+                return FormID(next_id)
             next_id += 1
 
         raise ESXFormIDConflictError("No more form IDs available in range")
 
+    def allocate_ids(self, count: int) -> List[int]:
+        """Allocate the lowest free form IDs, not necessarily consecutive
+
+        All or nothing: nothing is allocated if fewer than count are free.
+        """
+        allocated: List[int] = []
+        next_id = self.start_id
+        while len(allocated) < count and next_id <= self.end_id:
+            if next_id not in self.used_ids:
+                allocated.append(FormID(next_id))
+            next_id += 1
+        if len(allocated) < count:
+            raise ESXFormIDConflictError(f"Could not allocate {count} form IDs")
+        self.used_ids.update(allocated)
+        COUNTERS.incr("formid.allocated", count)
+        return allocated
+
+    def release_ids(self, form_ids: Iterable[Union[int, str]]) -> None:
+        """Return form IDs to the pool so later allocations can reuse them
+
+        Their keys, if any, are dropped from the assignment map.
+        """
+        released = {self._to_int(form_id) for form_id in form_ids}
+        self.used_ids -= released
+        if self.assignments:
+            for form_id in released:
+                self._unclaimed.pop(form_id, None)
+            for key in [k for k, v in self.assignments.items() if v in released]:
+                del self.assignments[key]
+
+    def remap(self, mapping: Dict[int, int]) -> None:
+        """Renumber the used and assigned IDs through an old -> new mapping
+
+        IDs the mapping does not list stay as they are. The containers are
+        edited in place, so a Transaction can undo it.
+        """
+        used = [FormID(mapping.get(form_id, form_id)) for form_id in self.used_ids]
+        self.used_ids.clear()
+        self.used_ids.update(used)
+        if self.assignments:
+            for key, form_id in list(self.assignments.items()):
+                new_id = mapping.get(form_id)
+                if new_id is not None and new_id != form_id:
+                    self.assignments[key] = FormID(new_id)
+            unclaimed = list(self._unclaimed.items())
+            self._unclaimed.clear()
+            for form_id, key in unclaimed:
+                self._unclaimed[FormID(mapping.get(form_id, form_id))] = key
+
+    @profiled("formid.allocate_range")
     def allocate_range(self, count: int) -> List[int]:
         """Allocate a range of consecutive form IDs"""
         # Find a range of 'count' consecutive free IDs
@@ -478,10 +2631,9 @@ class FormIDManager:
 
             if range_free:
                 # Found a free range, allocate it
-                allocated_ids = []
-                for i in range(count):
-                    self.used_ids.add(start_id + i)
-                    allocated_ids.append(start_id + i)
+                allocated_ids = [FormID(start_id + i) for i in range(count)]
+                self.used_ids.update(allocated_ids)
+                COUNTERS.incr("formid.allocated", count)
                 return allocated_ids
 
         raise ESXFormIDConflictError(f"Could not allocate {count} consecutive form IDs")
@@ -497,71 +2649,73 @@ class FormIDManager:
 
     def is_in_esl_range(self, form_id: Union[int, str]) -> bool:
         """Check if form ID is in ESL range (0x800-0xFFF)"""
-        form_id_int = self._to_int(form_id)
-        return 0x800 <= form_id_int <= 0xFFF
-
-    def _to_int(self, form_id: Union[int, str]) -> int:
-        """Convert form ID to integer"""
-        if isinstance(form_id, int):
-            return form_id
+        return self._to_int(form_id).in_esl_range
 
-        # Handle hex strings (with or without 0x prefix)
-        form_id_str = str(form_id).lower()
-        if form_id_str.startswith("0x"):
-            return int(form_id_str, 16)
-        else:
-            try:
-                return int(form_id_str, 16)
-            except ValueError:
-                return int(form_id_str)
+    def _to_int(self, form_id: Union[int, str]) -> FormID:
+        """Convert form ID to a FormID (strings are hex, with or without 0x)"""
+        return FormID.parse(form_id)
 
 
 class QuestBuilder:
     """Helper class for constructing quests programmatically"""
 
     def __init__(
-        self, plugin: ESXPlugin, editor_id: str, form_id: Optional[str] = None
+        self,
+        plugin: ESXPlugin,
+        editor_id: str,
+        form_id: Optional[str] = None,
+        form_id_manager: Optional[FormIDManager] = None,
+        strings: Optional[StringTables] = None,
     ):
         self.plugin = plugin
-        self.form_id_manager = FormIDManager()
+        self.editor_id = editor_id
+        # With string tables, FULL and NNAM hold string IDs and the plugin
+        # is flagged as localized
+        self.strings = strings
+        if strings is not None:
+            from esx_strings import set_localized
+
+            set_localized(plugin, True)
+        # Pass a shared manager when building several quests into one plugin;
+        # with an assignment map, IDs are keyed by editor ID and alias name
+        self.form_id_manager = form_id_manager or FormIDManager()
 
         # Reserve the quest form ID
-        if form_id:
-            self.quest_form_id = self.form_id_manager.reserve_id(form_id)
-            form_id_str = f"{self.quest_form_id:08x}"
-        else:
-            self.quest_form_id = self.form_id_manager.allocate_next_id()
-            form_id_str = f"{self.quest_form_id:08x}"
+        self.quest_form_id = self.form_id_manager.assign(editor_id, form_id or None)
+        form_id_str = self.quest_form_id.hex8
 
         # Create the quest or get existing one
         self.quest = plugin.get_or_create_quest(editor_id, form_id_str)
 
         # Track aliases and objectives
-        self.aliases: Dict[int, ESXAlias] = {}
+        self.aliases: Dict[int, ESXAlias] = _JournaledDict()
         self.player_ref_id = None
 
     def set_quest_name(self, name: str) -> "QuestBuilder":
         """Set the quest's full name"""
-        self.quest.set_full_name(name)
+        self.quest.set_full_name(self._text(name))
         return self
 
+    def _text(self, text: str) -> str:
+        """Text as stored in a FULL or NNAM field: itself, or its string ID"""
+        return text if self.strings is None else str(self.strings.add(text))
+
+    def _plain_text(self, text: Optional[str]) -> Optional[str]:
+        """Inverse of _text: the string an ID stands for"""
+        if self.strings is None or not text or not text.isdigit():
+            return text
+        return self.strings.get(int(text)) or text
+
+    @profiled("build.player_ref")
     def add_player_ref(self) -> int:
         """Add player reference alias"""
         if self.player_ref_id is not None:
             return self.player_ref_id
 
         # Allocate ID after quest
-        player_ref_id = self.form_id_manager.allocate_next_id()
+        player_ref_id = self.form_id_manager.assign(self._alias_key("PlayerRef"))
 
         # Add player ref elements
-        player_alias_elements = ESXElement.create_alias_elements(
-            alias_id=player_ref_id, name="PlayerRef", flags="0", is_player_ref=True
-        )
-
-        for elem in player_alias_elements:
-            self.quest.append(elem)
-
-        # Add to quest aliases
         player_alias = ESXAlias(
             index=player_ref_id,
             name="PlayerRef",
@@ -571,71 +2725,120 @@ class QuestBuilder:
         self.quest.add_alias(player_alias)
 
         # Track player ref ID
+        _will_replace(self, "player_ref_id")
         self.player_ref_id = player_ref_id
         self.aliases[player_ref_id] = player_alias
+        COUNTERS.incr("build.aliases")
+        logger.debug("Added PlayerRef alias 0x%x", player_ref_id)
 
         return player_ref_id
 
+    @profiled("build.objective")
     def add_objective_with_targets(
         self, index: int, name: str, target_count: int = 1, target_base_name: str = None
     ) -> Dict[str, Any]:
-        """Add an objective with multiple targets (reference aliases)"""
-        # Create the objective
-        objective = self.quest.get_or_create_objective(index, name)
-
-        # Add objective elements to quest if not already present
-        obj_elements = self.quest.find_all("QOBJ")
-        obj_exists = any(e for e in obj_elements if e.text == str(index))
-
-        if not obj_exists:
-            for elem in ESXElement.create_objective_elements(index, name):
-                self.quest.append(elem)
-
-        # Allocate form IDs for targets
-        target_ids = self.form_id_manager.allocate_range(target_count)
-        target_aliases = []
-
-        # Create reference aliases for each target
-        for i, target_id in enumerate(target_ids):
-            alias_name = f"{target_base_name or name.replace(' ', '')}_Target{i + 1}"
-
-            # Add alias elements
-            alias_elements = ESXElement.create_alias_elements(
-                alias_id=target_id,
-                name=alias_name,
-                flags="4242",  # Common flag for reference aliases
+        """Add an objective with multiple targets (reference aliases)
+
+        If the objective already exists, the targets are added at the end of
+        its block and numbered after the ones it already has.
+        """
+        if self.quest.get_objective(index) is None:
+            # Create the objective after the last one (before a trailing ANAM)
+            self.quest.insert_many(
+                self.quest.objective_end(),
+                ESXElement.create_objective_elements(index, self._text(name)),
             )
 
-            for elem in alias_elements:
-                self.quest.append(elem)
+        target_ids = self.add_targets(
+            {index: target_count},
+            {index: target_base_name or name.replace(" ", "")},
+        )[index]
 
-            # Add target to objective
-            objective.add_target(target_id)
+        COUNTERS.incr("build.objectives")
+        logger.debug(
+            "Added objective %d (%s) with %d targets", index, name, len(target_ids)
+        )
 
-            # Add QSTA (target data) element
-            qsta = ESXElement("QSTA")
-            struct = ESXElement(
-                "struct", {"alias": str(target_id), "flags": "0x00000000"}
+        return {
+            "objective": self.quest.get_objective(index),
+            "target_ids": target_ids,
+            "target_aliases": [self.aliases[target_id] for target_id in target_ids],
+        }
+
+    @profiled("build.targets")
+    def add_targets(
+        self,
+        counts: Dict[int, int],
+        target_base_names: Optional[Dict[int, str]] = None,
+    ) -> Dict[int, List[int]]:
+        """Add targets (reference aliases) to several existing objectives
+
+        Each objective's new targets go at the end of its block, numbered
+        after its existing ones; all blocks are inserted in a single pass.
+
+        Returns:
+            New alias form IDs by objective index
+        """
+        objectives = {objective.index: objective for objective in self.quest.objectives}
+        ends = self.quest.objective_ends()
+        blocks: Dict[int, List[ESXElement]] = {}
+        added: Dict[int, List[int]] = {}
+
+        for index, count in counts.items():
+            objective = objectives.get(index)
+            if objective is None:
+                raise ESXInvalidElementError(f"Objective {index} not found")
+            base_name = (target_base_names or {}).get(index) or (
+                self._plain_text(objective.name) or ""
+            ).replace(" ", "")
+
+            first_number = len(objective.targets) + 1
+            names = [
+                f"{base_name}_Target{number}"
+                for number in range(first_number, first_number + count)
+            ]
+
+            # Allocate form IDs for targets, filling holes if no run is free
+            target_ids = self.form_id_manager.assign_many(
+                [self._alias_key(name) for name in names]
             )
-            qsta.append(struct)
-            self.quest.append(qsta)
+            elements: List[ESXElement] = []
+
+            # Create reference aliases for each target
+            for alias_name, target_id in zip(names, target_ids):
+                alias = ESXAlias(
+                    index=target_id,
+                    name=alias_name,
+                    flags="4242",  # Common flag for reference aliases
+                )
+                elements.extend(
+                    ESXElement.create_alias_elements(target_id, alias.name, alias.flags)
+                )
 
-            # Add condition for this target
-            ctda = ESXElement.create_condition_element(alias_id=target_id)
-            self.quest.append(ctda)
+                # Add QSTA (target data) element and the condition for this target
+                elements.extend(
+                    ESXElement.create_target_elements(
+                        target_id,
+                        conditions=[
+                            ESXCondition(
+                                function_index=566,  # GetIsAliasRef
+                                comparison_value=1.0,
+                                param1=target_id,
+                            )
+                        ],
+                    )
+                )
+                self.aliases[target_id] = alias
 
-            # Create alias object
-            alias = ESXAlias(index=target_id, name=alias_name, flags="4242")
+            blocks.setdefault(ends[index], []).extend(elements)
+            added[index] = target_ids
+            COUNTERS.incr("build.aliases", len(target_ids))
 
-            self.quest.add_alias(alias)
-            self.aliases[target_id] = alias
-            target_aliases.append(alias)
+        self.quest.insert_blocks(blocks)
+        return added
 
-        return {
-            "objective": objective,
-            "target_ids": target_ids,
-            "target_aliases": target_aliases,
-        }
+    def _alias_key(self, alias_name: str) -> str:
+        return f"{self.editor_id}/{alias_name}"
 
     def update_alias_count(self) -> None:
         """Update the ANAM element with the correct alias count"""
@@ -644,6 +2847,7 @@ class QuestBuilder:
         # Find existing ANAM or create new one
         anam = self.quest.find("ANAM")
         if anam:
+            anam.touch()
             anam.text = str(total_aliases)
         else:
             self.quest.append(ESXElement("ANAM", text=str(total_aliases)))
@@ -659,6 +2863,490 @@ class QuestBuilder:
         }
 
 
+# Record schemas: the layout of each record type, declared once. The
+# parsers dispatch on tables compiled from these (tag -> handler) instead
+# of chains of tag comparisons, and validate_schema() checks values
+# against the same declarations. A new record type needs a RecordSchema
+# in SCHEMAS and nothing else.
+
+
+@dataclass(frozen=True)
+class Codec:
+    """How a text or attribute value is read, written and checked"""
+
+    name: str
+    parse: Callable[[str], Any]
+    render: Callable[[Any], str]
+    pattern: Optional["re.Pattern[str]"] = None
+
+    def check(self, text: str) -> bool:
+        return self.pattern is None or self.pattern.fullmatch(text) is not None
+
+
+def _hex_codec(digits: int) -> Codec:
+    return Codec(
+        f"hex{digits}",
+        lambda text: int(text, 16),
+        lambda value: f"0x{value:0{digits}x}",
+        re.compile(f"0x[0-9a-fA-F]{{{digits}}}"),
+    )
+
+
+CODECS: Dict[str, Codec] = {
+    codec.name: codec
+    for codec in (
+        Codec("text", str, str),
+        Codec("int", int, str, re.compile(r"-?\d+")),
+        Codec("float", float, str, re.compile(r"-?\d+(\.\d*)?([eE][-+]?\d+)?")),
+        Codec(
+            "formid",
+            FormID.parse,
+            lambda value: FormID(value).hex8,
+            re.compile(r"[0-9a-fA-F]{8}"),
+        ),
+        Codec(
+            "alias",
+            FormID.from_decimal,
+            lambda value: FormID(value).decimal,
+            re.compile(r"\d+"),
+        ),
+        _hex_codec(2),
+        _hex_codec(4),
+        _hex_codec(8),
+    )
+}
+
+
+@dataclass(frozen=True)
+class StructSpec:
+    """The attributes of a subrecord's ``<struct>``, in document order"""
+
+    attributes: Tuple[Tuple[str, str], ...]
+
+    def decode(self, struct: ESXElement) -> Dict[str, Any]:
+        """Attribute values parsed with their codecs"""
+        return {
+            name: CODECS[codec].parse(struct.attrib[name])
+            for name, codec in self.attributes
+            if name in struct.attrib
+        }
+
+    def encode(self, values: Mapping[str, Any]) -> ESXElement:
+        """A ``<struct>`` with the given values rendered in schema order"""
+        return ESXElement(
+            "struct",
+            attrib={
+                name: CODECS[codec].render(values[name])
+                for name, codec in self.attributes
+                if name in values
+            },
+        )
+
+    def validate(self, struct: ESXElement, where: str) -> List[str]:
+        errors = []
+        for name, codec in self.attributes:
+            value = struct.attrib.get(name)
+            if value is None:
+                errors.append(f"{where} struct has no {name}")
+            elif not CODECS[codec].check(value):
+                errors.append(f"{where} struct {name}={value!r} is not {codec}")
+        return errors
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """One subrecord of a record type
+
+    ``model`` names the record attribute that takes the field's text,
+    ``read`` updates the record from the field in other ways, and
+    ``count`` names a per-record counter bumped for each occurrence.
+    """
+
+    tag: str
+    text: Optional[str] = None
+    struct: Optional[StructSpec] = None
+    required: bool = False
+    repeats: bool = False
+    model: Optional[str] = None
+    read: Optional[Callable[[Any, ESXElement], None]] = None
+    count: Optional[str] = None
+
+
+FieldHandler = Callable[[Any, ESXElement, Dict[str, int]], None]
+
+
+def _compile_field(spec: FieldSpec) -> Optional[FieldHandler]:
+    """The parse-time handler for one field, specialized to what it does"""
+    steps: List[FieldHandler] = []
+    if spec.model is not None:
+        attribute = spec.model
+        steps.append(lambda record, child, counts: setattr(record, attribute, child.text))
+    if spec.read is not None:
+        read = spec.read
+        steps.append(lambda record, child, counts: read(record, child))
+    if spec.count is not None:
+        key = spec.count
+
+        def count(record: Any, child: ESXElement, counts: Dict[str, int]) -> None:
+            counts[key] = counts.get(key, 0) + 1
+
+        steps.append(count)
+    if not steps:
+        return None
+    if len(steps) == 1:
+        return steps[0]
+
+    def run(record: Any, child: ESXElement, counts: Dict[str, int]) -> None:
+        for step in steps:
+            step(record, child, counts)
+
+    return run
+
+
+@dataclass
+class RecordSchema:
+    """Attributes and subrecords of a record type
+
+    ``children`` is how field elements are copied when parsing: ``"tree"``
+    keeps everything, ``"flat"`` keeps text and, for fields with a struct
+    spec, the ``<struct>`` children only. ``finish`` runs once the record's
+    fields are all read, with the counters the fields bumped.
+    """
+
+    tag: str
+    cls: type
+    attributes: Tuple[Tuple[str, str], ...] = ()
+    fields: Tuple[FieldSpec, ...] = ()
+    children: str = "tree"
+    finish: Optional[Callable[[Any, Dict[str, int]], None]] = None
+    # Compiled from the declarations above
+    by_tag: Dict[str, FieldSpec] = field(init=False, repr=False)
+    handlers: Dict[str, FieldHandler] = field(init=False, repr=False)
+    struct_tags: FrozenSet[str] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.by_tag = {spec.tag: spec for spec in self.fields}
+        self.handlers = {}
+        for spec in self.fields:
+            handler = _compile_field(spec)
+            if handler is not None:
+                self.handlers[spec.tag] = handler
+        self.struct_tags = frozenset(spec.tag for spec in self.fields if spec.struct)
+
+    def validate(self, element: ESXElement, where: str) -> List[str]:
+        """Attribute and field values that do not match the schema"""
+        errors = []
+        for name, codec in self.attributes:
+            value = element.attrib.get(name)
+            if value is not None and not CODECS[codec].check(value):
+                errors.append(f"{where}: {self.tag} {name}={value!r} is not {codec}")
+
+        seen: Dict[str, int] = {}
+        by_tag = self.by_tag
+        for child in element.elements:
+            spec = by_tag.get(child.tag)
+            if spec is None:
+                continue
+            seen[child.tag] = seen.get(child.tag, 0) + 1
+            if spec.text and child.text is not None and not CODECS[spec.text].check(child.text):
+                errors.append(f"{where}: {child.tag} {child.text!r} is not {spec.text}")
+            if spec.struct is not None:
+                struct = child.find("struct")
+                if struct is None:
+                    errors.append(f"{where}: {child.tag} has no struct")
+                else:
+                    errors.extend(spec.struct.validate(struct, f"{where}: {child.tag}"))
+
+        for spec in self.fields:
+            count = seen.get(spec.tag, 0)
+            if spec.required and not count:
+                errors.append(f"{where}: missing {spec.tag}")
+            elif count > 1 and not spec.repeats:
+                errors.append(f"{where}: {spec.tag} appears {count} times")
+        return errors
+
+
+def _read_master(tes4: ESXTES4, child: ESXElement) -> None:
+    tes4.masters.append(child.text)  # type: ignore[arg-type]
+
+
+def _read_vmad(quest: ESXQuest, child: ESXElement) -> None:
+    for script in child.elements:
+        if script.tag == "script":
+            quest.script = script.attrib.get("name", "")
+
+
+def _read_dnam(quest: ESXQuest, child: ESXElement) -> None:
+    for struct in child.elements:
+        if struct.tag == "struct":
+            quest.quest_flags = struct.attrib.get("flags", "")
+            quest.priority = int(struct.attrib.get("priority", 0))
+
+
+def _finish_quest(quest: ESXQuest, counts: Dict[str, int]) -> None:
+    aliases = counts.get("aliases", 0)
+    objectives = counts.get("objectives", 0)
+    COUNTERS.incr("parse.quests")
+    COUNTERS.incr("parse.aliases", aliases)
+    COUNTERS.incr("parse.objectives", objectives)
+    logger.debug(
+        "Parsed quest %s: %d aliases, %d objectives", quest.editor_id, aliases, objectives
+    )
+
+
+_RECORD_HEADER = (
+    ("id", "formid"),
+    ("flags", "hex8"),
+    ("version", "int"),
+    ("unknown", "hex4"),
+)
+
+HEDR_STRUCT = StructSpec(
+    (("version", "float"), ("numRecords", "int"), ("nextObjectID", "formid"))
+)
+DNAM_STRUCT = StructSpec(
+    (
+        ("flags", "hex4"),
+        ("priority", "int"),
+        ("unknown0", "hex2"),
+        ("unknown1", "hex8"),
+        ("type", "int"),
+    )
+)
+QSTA_STRUCT = StructSpec((("alias", "alias"), ("flags", "hex8")))
+
+SCHEMAS: Dict[str, RecordSchema] = {
+    schema.tag: schema
+    for schema in (
+        RecordSchema(
+            "TES4",
+            ESXTES4,
+            attributes=_RECORD_HEADER,
+            fields=(
+                FieldSpec("HEDR", struct=HEDR_STRUCT),
+                FieldSpec("CNAM", text="text"),
+                FieldSpec("MAST", text="text", repeats=True, read=_read_master),
+                FieldSpec("DATA", text="int", repeats=True),
+                FieldSpec("INTV", text="int"),
+            ),
+            children="flat",
+        ),
+        RecordSchema(
+            "GRUP",
+            ESXGroup,
+            attributes=(("groupType", "int"), ("unknown", "hex8")),
+        ),
+        RecordSchema(
+            "QUST",
+            ESXQuest,
+            attributes=_RECORD_HEADER,
+            fields=(
+                FieldSpec("EDID", text="text", required=True, model="editor_id"),
+                FieldSpec("VMAD", read=_read_vmad),
+                FieldSpec("FULL", text="text", model="full_name"),
+                FieldSpec("DNAM", struct=DNAM_STRUCT, read=_read_dnam),
+                FieldSpec("ANAM", text="int"),
+                FieldSpec("ALST", text="alias", repeats=True, count="aliases"),
+                FieldSpec("ALID", text="text", repeats=True),
+                FieldSpec("ALFR", text="formid", repeats=True),
+                FieldSpec("VTCK", text="formid", repeats=True),
+                FieldSpec("QOBJ", text="int", repeats=True, count="objectives"),
+                FieldSpec("NNAM", text="text", repeats=True),
+                FieldSpec("FNAM", text="int", repeats=True),
+                FieldSpec("QSTA", struct=QSTA_STRUCT, repeats=True),
+                FieldSpec("CTDA", repeats=True),
+            ),
+            finish=_finish_quest,
+        ),
+    )
+}
+
+# Any record type without a schema: copied as is, no model fields
+GENERIC_RECORD = RecordSchema("", ESXRecord)
+
+
+def record_schema(tag: str) -> RecordSchema:
+    """Schema for a record inside a GRUP"""
+    schema = SCHEMAS.get(tag)
+    return schema if schema is not None and schema.tag not in ("TES4", "GRUP") else GENERIC_RECORD
+
+
+def validate_schema(plugin: ESXPlugin) -> List[str]:
+    """Check the TES4 header, groups and records against their schemas"""
+    errors = []
+    if plugin.tes4 is not None:
+        errors.extend(SCHEMAS["TES4"].validate(plugin.tes4, "TES4"))
+    for group in plugin.groups:
+        errors.extend(SCHEMAS["GRUP"].validate(group, f"GRUP {group.label}"))
+        for record in group.records:
+            schema = record_schema(record.tag)
+            if schema is not GENERIC_RECORD:
+                where = record.editor_id or record.attrib.get("id", record.tag)
+                errors.extend(schema.validate(record, where))
+    return errors
+
+
+PARSER_BACKENDS = ("etree", "expat")
+
+
+# Node kinds for _ExpatBuilder: what a start tag becomes and what its
+# children may be, mirroring what ESXParser's ElementTree path keeps
+_DOCUMENT, _PLUGIN, _TES4, _STRUCT, _GROUP, _RECORD, _SKIP = range(7)
+_FIELD, _STRUCT_FIELD, _TES4_FIELD = range(7, 10)  # Kinds from _FIELD on keep text
+
+
+class _ExpatBuilder:
+    """Build the ESX model straight from expat events
+
+    The result matches ``ESXParser.parse_plugin`` over an ElementTree of the
+    same document, without building that tree first. expat interns the names
+    and builds the attribute dicts itself, and the handlers do as little as
+    they can for the common case, an element nested inside a record field:
+    it is attached to its parent on start and its text is set directly.
+    """
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, owner: "ESXParser"):
+        self.owner = owner
+        self.plugin: Optional[ESXPlugin] = None
+        self.nodes: List[Any] = [None]
+        self.kinds: List[int] = [_DOCUMENT]
+        # Node whose text is being read: the innermost open one that keeps
+        # text, until its first child starts
+        self.current: Optional[ESXElement] = None
+        # Schema and field counters of the open record
+        self.schema = SCHEMAS["TES4"]
+        self.counts: Dict[str, int] = {}
+
+    def parse(self, source: BinaryIO) -> ESXPlugin:
+        from xml.parsers import expat
+
+        # Same namespace handling as ElementTree's parser
+        parser = expat.ParserCreate(None, "}")
+        parser.buffer_text = True
+        parser.buffer_size = self.CHUNK_SIZE
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        try:
+            while True:
+                chunk = source.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                parser.Parse(chunk, False)
+            parser.Parse(b"", True)
+        except expat.ExpatError as e:
+            error = ET.ParseError(
+                f"{expat.ErrorString(e.code)}: line {e.lineno}, column {e.offset}"
+            )
+            error.code = e.code
+            error.position = (e.lineno, e.offset)
+            raise error from None
+        return cast(ESXPlugin, self.plugin)
+
+    def start(self, tag: str, attrib: Dict[str, str]) -> None:
+        if "}" in tag:
+            tag = "{" + tag
+        if attrib:
+            for key in attrib:
+                if "}" in key:
+                    attrib = {"{" + k if "}" in k else k: v for k, v in attrib.items()}
+                    break
+
+        kinds = self.kinds
+        parent = kinds[-1]
+        if parent == _FIELD:
+            # Nearly every element lands here. Both elements are new, so
+            # there is nothing for append() to journal
+            nodes = self.nodes
+            node = ESXElement(tag, attrib)
+            owner = nodes[-1]
+            node.parent = owner
+            owner.elements.append(node)
+            nodes.append(node)
+            kinds.append(_FIELD)
+            self.current = node
+            return
+
+        node = None
+        if parent == _RECORD:
+            kind = _FIELD
+            node = ESXElement(tag, attrib)
+        elif parent == _DOCUMENT:
+            kind = _PLUGIN
+            node = self.plugin = ESXPlugin(
+                tag=tag, attrib=attrib, version=attrib.get("version", "0.7.4")
+            )
+        elif parent == _PLUGIN:
+            kind = _TES4 if tag == "TES4" else _GROUP if tag == "GRUP" else _SKIP
+            if kind == _TES4:
+                node = ESXTES4(tag=tag, attrib=attrib)
+                self.schema = SCHEMAS["TES4"]
+                self.counts = {}
+            elif kind == _GROUP:
+                node = ESXGroup(
+                    tag=tag,
+                    label=attrib.get("label", ""),
+                    group_type=attrib.get("groupType", ""),
+                    attrib=attrib,
+                )
+        elif parent == _GROUP:
+            kind = _RECORD
+            self.schema = record_schema(tag)
+            self.counts = {}
+            node = self.schema.cls(tag=tag, attrib=attrib)
+            if self.schema.cls is ESXQuest:
+                self.owner.current_quest = node
+        elif parent == _TES4:
+            kind = _STRUCT_FIELD if tag in self.schema.struct_tags else _TES4_FIELD
+            node = ESXElement(tag=tag, attrib=attrib)
+        elif parent == _STRUCT_FIELD and tag == "struct":
+            kind = _STRUCT
+            node = ESXElement(tag="struct", attrib=attrib)
+        else:
+            # Children the ElementTree path does not copy
+            kind = _SKIP
+
+        self.nodes.append(node)
+        kinds.append(kind)
+        self.current = node if kind >= _FIELD else None
+
+    def data(self, text: str) -> None:
+        node = self.current
+        if node is not None:
+            node.text = text if node.text is None else node.text + text
+
+    def end(self, tag: str) -> None:
+        self.current = None  # Anything after this is the parent's tail
+        node = self.nodes.pop()
+        kind = self.kinds.pop()
+        parent_kind = self.kinds[-1]
+        if parent_kind == _FIELD or kind == _SKIP or parent_kind == _DOCUMENT:
+            return
+        parent = self.nodes[-1]
+        if parent_kind == _RECORD or parent_kind == _TES4:
+            parent.append(node)
+            handler = self.schema.handlers.get(node.tag)
+            if handler is not None:
+                handler(parent, node, self.counts)
+        elif parent_kind == _PLUGIN:
+            if kind == _TES4:
+                self._finish_record(node)
+                parent.add_tes4(node)
+            else:
+                parent.add_group(node)
+        elif parent_kind == _GROUP:
+            parent.add_record(node)
+            self._finish_record(node)
+        else:
+            parent.append(node)
+
+    def _finish_record(self, record: ESXRecord) -> None:
+        if self.schema.finish is not None:
+            self.schema.finish(record, self.counts)
+
+
 class ESXParser:
     """Parser to convert XML to ESX objects"""
 
@@ -666,19 +3354,41 @@ class ESXParser:
         self.current_quest: Optional[ESXQuest] = None
         self.current_objective: Optional[ESXObjective] = None
 
-    def parse_file(self, filename: str) -> ESXPlugin:
-        """Parse an ESX file and return a structured representation"""
+    def parse_file(
+        self, filename: Union[str, BinaryIO], backend: str = "etree"
+    ) -> ESXPlugin:
+        """Parse an ESX file and return a structured representation
+
+        ``filename`` may also be a binary file object. gzip and xz input is
+        recognized by its magic bytes and decompressed while it streams in.
+
+        ``backend`` is ``"etree"`` (parse to an ElementTree, then convert) or
+        ``"expat"`` (build the same model directly from parser events, which
+        skips the intermediate tree).
+        """
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(
+                f"Unknown parser backend {backend!r} (known: {', '.join(PARSER_BACKENDS)})"
+            )
         try:
-            tree = ET.parse(filename)
-            root = tree.getroot()
-            return self.parse_plugin(root)
+            with span("parse"), open_esx(filename, "rb") as f:
+                if backend == "expat":
+                    with span("parse.expat"):
+                        return _ExpatBuilder(self).parse(f)
+                with span("parse.xml"):
+                    tree = ET.parse(f)
+                root = tree.getroot()
+                with span("parse.build"):
+                    return self.parse_plugin(root)
         except Exception as e:
-            print(f"Error parsing {filename}: {str(e)}")
+            logger.error("Error parsing %s: %s", getattr(filename, "name", filename), e)
             raise
 
     def parse_plugin(self, root: ET.Element) -> ESXPlugin:
         """Parse the plugin root element"""
-        plugin = ESXPlugin(tag=root.tag, version=root.get("version", "0.7.4"))
+        plugin = ESXPlugin(
+            tag=root.tag, attrib=root.attrib, version=root.get("version", "0.7.4")
+        )
 
         # Parse each direct child
         for child in root:
@@ -691,27 +3401,7 @@ class ESXParser:
 
     def parse_tes4(self, element: ET.Element) -> ESXTES4:
         """Parse TES4 header"""
-        tes4 = ESXTES4(tag=element.tag, attrib=element.attrib)
-
-        for child in element:
-            child_elem = ESXElement(tag=child.tag, attrib=child.attrib, text=child.text)
-
-            # Parse struct elements
-            if child.tag == "HEDR" and len(child) > 0:
-                for struct_child in child:
-                    if struct_child.tag == "struct":
-                        struct_elem = ESXElement(
-                            tag="struct", attrib=struct_child.attrib
-                        )
-                        child_elem.append(struct_elem)
-
-            tes4.append(child_elem)
-
-            # Track masters
-            if child.tag == "MAST":
-                tes4.masters.append(child.text)
-
-        return tes4
+        return cast(ESXTES4, self.parse_record(element, SCHEMAS["TES4"]))
 
     def parse_grup(self, element: ET.Element) -> ESXGroup:
         """Parse a GRUP element"""
@@ -722,191 +3412,59 @@ class ESXParser:
             attrib=element.attrib,
         )
 
-        # Parse records in this group
+        # Parse records in this group, by their record type's schema
         for child in element:
-            if child.tag == "QUST":
-                quest = self.parse_quest(child)
-                group.add_record(quest)
+            schema = record_schema(child.tag)
+            if schema.cls is ESXQuest:
+                group.add_record(self.parse_quest(child))
             else:
-                # Handle other record types if needed
-                record = ESXRecord(tag=child.tag, attrib=child.attrib)
-                self.parse_generic_elements(child, record)
-                group.add_record(record)
+                group.add_record(self.parse_record(child, schema))
 
         return group
 
+    @profiled("parse.quest")
     def parse_quest(self, element: ET.Element) -> ESXQuest:
-        """Parse a QUST record"""
+        """Parse a QUST record
+
+        Only the child elements and header fields are read here; aliases and
+        objectives are extracted lazily when first accessed.
+        """
         quest = ESXQuest(tag=element.tag, attrib=element.attrib)
         self.current_quest = quest
+        return cast(ESXQuest, self.parse_record(element, SCHEMAS["QUST"], quest))
 
-        # Track the current objective and alias for relationship building
-        current_objective = None
-        current_alias = None
-        conditions = []
+    def parse_record(
+        self,
+        element: ET.Element,
+        schema: RecordSchema,
+        record: Optional[ESXRecord] = None,
+    ) -> ESXRecord:
+        """Parse a record's fields, updating the model as its schema says"""
+        if record is None:
+            record = schema.cls(tag=element.tag, attrib=element.attrib)
+        handlers = schema.handlers
+        flat = schema.children == "flat"
+        counts: Dict[str, int] = {}
 
-        # First pass - create the basic structure
         for child in element:
             child_elem = ESXElement(tag=child.tag, attrib=child.attrib, text=child.text)
-            self.parse_generic_elements(child, child_elem)
-            quest.append(child_elem)
-
-            # Extract quest metadata
-            if child.tag == "EDID":
-                quest.editor_id = child.text
-            elif child.tag == "FULL":
-                quest.full_name = child.text
-            elif child.tag == "VMAD":
-                self.parse_vmad(child, quest)
-            elif child.tag == "DNAM":
-                self.parse_dnam(child, quest)
-
-        # Second pass - handle aliases explicitly
-        alias_data = {}  # To store alias information keyed by index
-        current_alias_id = None
-
-        # Find all aliases in the XML
-        for child in element:
-            if child.tag == "ALST":
-                current_alias_id = child.text
-                if current_alias_id not in alias_data:
-                    alias_data[current_alias_id] = {"index": current_alias_id}
-            elif child.tag == "ALID" and current_alias_id:
-                if current_alias_id in alias_data:
-                    alias_data[current_alias_id]["name"] = child.text
-            elif child.tag == "FNAM" and current_alias_id:
-                if current_alias_id in alias_data:
-                    alias_data[current_alias_id]["flags"] = child.text
-            elif child.tag == "ALFR" and current_alias_id:
-                if current_alias_id in alias_data:
-                    alias_data[current_alias_id]["ref_id"] = child.text
-            elif child.tag == "ALED":
-                current_alias_id = None
-
-        # Create aliases from the collected data
-        print(f"Found {len(alias_data)} aliases in XML")
-        for alias_id, data in alias_data.items():
-            if "name" in data:  # Only create if we have a name
-                alias = ESXAlias(
-                    index=data["index"],
-                    name=data["name"],
-                    flags=data.get("flags"),
-                    ref_id=data.get("ref_id"),
-                )
-                quest.add_alias(alias)
-
-        # Third pass - handle quest objectives
-        # Reset tracking variables
-        current_objective = None
-        conditions = []
-
-        for child in element:
-            if child.tag == "QOBJ":
-                # Start tracking a new objective
-                index = int(child.text) if child.text else 0
-                current_objective = {
-                    "index": index,
-                    "flags": None,
-                    "name": None,
-                    "targets": [],
-                }
-                conditions = []  # Reset conditions for new objective
-            elif child.tag == "FNAM" and current_objective:
-                current_objective["flags"] = int(child.text) if child.text else 0
-            elif child.tag == "NNAM" and current_objective:
-                current_objective["name"] = child.text
-                # At this point, we have enough to create an objective
-                obj = ESXObjective(
-                    index=current_objective["index"],
-                    name=current_objective["name"],
-                    flags=current_objective["flags"],
-                )
-                quest.add_objective(obj)
-                self.current_objective = obj
-            elif child.tag == "QSTA":
-                # This is a target for the current objective
-                if len(child) > 0 and self.current_objective:
-                    for struct_elem in child:
-                        if struct_elem.tag == "struct":
-                            alias_id = struct_elem.get("alias", "0")
-                            flags = int(struct_elem.get("flags", "0x00000000"), 16)
-                            self.current_objective.add_target(
-                                alias_id, flags, conditions.copy()
-                            )
-                # Reset conditions after adding to objective
-                conditions = []
-            elif child.tag == "CTDA":
-                # Parse condition and add to the current list
-                cond = self.parse_condition(child)
-                conditions.append(cond)
-
-        # Debug output
-        print(
-            f"Quest {quest.editor_id} has {len(quest.aliases)} aliases and {len(quest.objectives)} objectives"
-        )
-        for alias in quest.aliases:
-            print(f"  - Alias: {alias.index} = {alias.name}")
-
-        return quest
-
-    def parse_vmad(
-        self, element: ET.Element, parent: ESXQuest
-    ) -> List[dict[str, Union[str, int]]]:
-        """Parse script info from VMAD"""
-        scripts = []
-
-        for child in element:
-            if child.tag == "script":
-                script_name = child.get("name", "")
-                status = child.get("status", "")
-                scripts.append({"name": script_name, "status": status})
-                parent.script = script_name
-
-            elif child.tag == "fragments":
-                for frag_child in child:
-                    if frag_child.tag == "alias":
-                        for alias_child in frag_child:
-                            if alias_child.tag == "script":
-                                script_name = alias_child.get("name", "")
-                                status = alias_child.get("status", "")
-                                obj_id = frag_child.get("object", "")
-                                alias_scripts = {
-                                    "name": script_name,
-                                    "status": status,
-                                    "object": obj_id,
-                                }
-                                scripts.append(alias_scripts)
-
-        return scripts
-
-    def parse_dnam(self, element: ET.Element, quest: ESXQuest) -> None:
-        """Parse quest flags and priority"""
-        for child in element:
-            if child.tag == "struct":
-                quest.quest_flags = child.get("flags", "")
-                quest.priority = int(child.get("priority", 0))
-
-    def parse_condition(self, element: ET.Element) -> ESXCondition:
-        """Parse a CTDA condition"""
-        cond = ESXCondition()
+            if not flat:
+                self.parse_generic_elements(child, child_elem)
+            elif child.tag in schema.struct_tags:
+                for struct_child in child:
+                    if struct_child.tag == "struct":
+                        child_elem.append(
+                            ESXElement(tag="struct", attrib=struct_child.attrib)
+                        )
+            record.append(child_elem)
 
-        for child in element:
-            if child.tag == "operator":
-                cond.operator = child.text
-            elif child.tag == "comparisonValueFloat":
-                cond.comparison_value = float(child.text) if child.text else None
-            elif child.tag == "functionIndex":
-                cond.function_index = int(child.text) if child.text else None
-            elif child.tag == "param1":
-                cond.param1 = child.text
-            elif child.tag == "param2":
-                cond.param2 = child.text
-            elif child.tag == "runOnType":
-                cond.run_on_type = child.text
-            elif child.tag == "reference":
-                cond.reference = child.text
+            handler = handlers.get(child.tag)
+            if handler is not None:
+                handler(record, child_elem, counts)
 
-        return cond
+        if schema.finish is not None:
+            schema.finish(record, counts)
+        return record
 
     def parse_generic_elements(
         self, xml_element: ET.Element, esx_element: ESXElement
@@ -918,109 +3476,204 @@ class ESXParser:
             esx_element.append(child_elem)
 
 
+@profiled("summarize")
 def summarize_plugin(plugin: ESXPlugin) -> str:
     """Generate a summary of the plugin's contents"""
-    summary = []
-    summary.append("# Skyrim ESP Plugin Summary\n")
+    import io
+
+    buffer = io.StringIO()
+    write_summary(plugin, buffer)
+    return buffer.getvalue()
+
+
+class _Lines:
+    """Writes pieces to a stream separated by newlines, like "\\n".join(pieces)"""
+
+    __slots__ = ("out", "started")
+
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.started = False
+
+    def __call__(self, piece: str) -> None:
+        if self.started:
+            self.out.write("\n")
+        self.started = True
+        self.out.write(piece)
+
+
+def write_summary(plugin: ESXPlugin, out: TextIO) -> None:
+    """Write the Markdown summary to a text stream, one section at a time
+
+    Produces exactly the text of summarize_plugin, but nothing larger than
+    a single target's entry is held in memory.
+    """
+    line = _Lines(out)
+    line("# Skyrim ESP Plugin Summary\n")
 
     # TES4 Header
     if plugin.tes4:
-        summary.append("## Plugin Header (TES4)\n")
-        header_info = [f"- Version: {plugin.attrib.get('version', 'N/A')}"]
+        line("## Plugin Header (TES4)\n")
+        line(f"- Version: {plugin.attrib.get('version', 'N/A')}")
 
         # Get any HEDR/version info
         hedr = plugin.tes4.find("HEDR")
         if hedr:
             struct = hedr.find("struct")
             if struct:
-                header_info.append(
-                    f"- File Version: {struct.attrib.get('version', 'N/A')}"
-                )
-                header_info.append(
-                    f"- Number of Records: {struct.attrib.get('numRecords', 'N/A')}"
-                )
-                header_info.append(
-                    f"- Next Object ID: {struct.attrib.get('nextObjectID', 'N/A')}"
-                )
+                line(f"- File Version: {struct.attrib.get('version', 'N/A')}")
+                line(f"- Number of Records: {struct.attrib.get('numRecords', 'N/A')}")
+                line(f"- Next Object ID: {struct.attrib.get('nextObjectID', 'N/A')}")
 
         # Get creator info
         cnam = plugin.tes4.find("CNAM")
         if cnam and cnam.text:
-            header_info.append(f"- Creator: {cnam.text}")
+            line(f"- Creator: {cnam.text}")
 
         # Get master files
         masters = plugin.tes4.find_all("MAST")
         if masters:
-            header_info.append("- Master Files:")
+            line("- Master Files:")
             for master in masters:
-                header_info.append(f"  - {master.text}")
-
-        summary.append("\n".join(header_info))
+                line(f"  - {master.text}")
 
     # Quest Groups
     for group in plugin.groups:
         if group.attrib.get("label") == "QUST":
-            summary.append(f"\n## Quest Group ({len(group.records)} records)\n")
+            line(f"\n## Quest Group ({len(group.records)} records)\n")
 
             for record in group.records:
-                if not isinstance(record, ESXQuest):
-                    continue  # Skip non-quest records
-
-                quest = record
-                summary.append(f"### Quest: {quest.full_name}\n")
-                summary.append(f"- Editor ID: {quest.editor_id}")
-
-                if quest.script:
-                    summary.append(f"- Script: {quest.script}")
-
-                if quest.quest_flags:
-                    summary.append(f"- Flags: {quest.quest_flags}")
-
-                if quest.priority:
-                    summary.append(f"- Priority: {quest.priority}")
-
-                # Objectives
-                if quest.objectives:
-                    summary.append("\n#### Objectives:\n")
-                    for obj in quest.objectives:
-                        target_info = []
-                        for target in obj.targets:
-                            alias_info = f"Alias {target['alias']}"
-                            if target["conditions"]:
-                                cond_strs = []
-                                for cond in target["conditions"]:
-                                    cond_str = f"Function {cond.function_index}"
-                                    if cond.param1:
-                                        cond_str += f" Param1={cond.param1}"
-                                    if cond.param2:
-                                        cond_str += f" Param2={cond.param2}"
-                                    cond_strs.append(cond_str)
-                                alias_info += (
-                                    f" with conditions: [{', '.join(cond_strs)}]"
-                                )
-                            target_info.append(alias_info)
-
-                        summary.append(f"- **{obj.index}: {obj.name}**")
-                        if target_info:
-                            summary.append(f"  - Targets: {', '.join(target_info)}")
-
-                # Aliases
-                if quest.aliases:
-                    summary.append("\n#### Aliases:\n")
-                    for alias in quest.aliases:
-                        alias_info = [f"- **{alias.index}: {alias.name}**"]
-                        if alias.flags:
-                            alias_info.append(f"  - Flags: {alias.flags}")
-                        if alias.ref_id:
-                            alias_info.append(f"  - Reference: {alias.ref_id}")
-
-                        summary.append("\n".join(alias_info))
-
-                summary.append("\n")
-
-    return "\n".join(summary)
+                if isinstance(record, ESXQuest):
+                    _write_quest_summary(record, line)
+
+
+def _write_quest_summary(quest: ESXQuest, line: _Lines) -> None:
+    out = line.out
+    line(f"### Quest: {quest.full_name}\n")
+    line(f"- Editor ID: {quest.editor_id}")
+
+    if quest.script:
+        line(f"- Script: {quest.script}")
+
+    if quest.quest_flags:
+        line(f"- Flags: {quest.quest_flags}")
+
+    if quest.priority:
+        line(f"- Priority: {quest.priority}")
+
+    # Objectives
+    if quest.objectives:
+        line("\n#### Objectives:\n")
+        for obj in quest.objectives:
+            line(f"- **{obj.index}: {obj.name}**")
+            separator = "\n  - Targets: "
+            for target in obj.targets:
+                out.write(separator)
+                separator = ", "
+                out.write(f"Alias {target['alias']}")
+                conditions = target["conditions"]
+                if conditions:
+                    cond_strs = []
+                    for cond in conditions:
+                        cond_str = f"Function {cond.function_index}"
+                        if cond.param1:
+                            cond_str += f" Param1={cond.param1}"
+                        if cond.param2:
+                            cond_str += f" Param2={cond.param2}"
+                        cond_strs.append(cond_str)
+                    out.write(f" with conditions: [{', '.join(cond_strs)}]")
+
+    # Aliases
+    if quest.aliases:
+        line("\n#### Aliases:\n")
+        for alias in quest.aliases:
+            line(f"- **{alias.index}: {alias.name}**")
+            if alias.flags:
+                out.write(f"\n  - Flags: {alias.flags}")
+            if alias.ref_id:
+                out.write(f"\n  - Reference: {alias.ref_id}")
+
+    line("\n")
+
+
+@profiled("stats")
+def plugin_stats(plugin: ESXPlugin) -> Dict[str, Any]:
+    """Counts describing a plugin, gathered in one pass over its records
+
+    Reads child elements directly (no quest views and no summary text):
+    records per group, per-quest alias/objective/target/condition counts,
+    a histogram of CTDA function indexes and how the defined FormIDs sit
+    in the ESL range. Aliases and objectives are counted by ALST and QOBJ
+    blocks, like the parse counters.
+    """
+    groups: Dict[str, int] = {}
+    quests: List[Dict[str, Any]] = []
+    functions: Dict[str, int] = {}
+    defined: Set[int] = set()
+    invalid: List[str] = []
+
+    def define(text: Optional[str], base: int) -> None:
+        # Plain ints: interning every ID as a FormID would outweigh the counts
+        try:
+            defined.add(int(text, base))  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            invalid.append(str(text))
 
+    for group in plugin.groups:
+        label = group.label or group.attrib.get("label", "")
+        groups[label] = groups.get(label, 0) + len(group.records)
+        for record in group.records:
+            if "id" in record.attrib:
+                define(record.attrib["id"], 16)
+            if not isinstance(record, ESXQuest):
+                continue
+            counts = {"ALST": 0, "QOBJ": 0, "QSTA": 0, "CTDA": 0}
+            for child in record.elements:
+                tag = child.tag
+                if tag in counts:
+                    counts[tag] += 1
+                if tag == "ALST":
+                    define(child.text, 10)
+                elif tag == "CTDA":
+                    function = child.find("functionIndex")
+                    key = (function.text or "").strip() if function is not None else ""
+                    functions[key] = functions.get(key, 0) + 1
+            quests.append(
+                {
+                    "editor_id": record.editor_id,
+                    "form_id": record.attrib.get("id"),
+                    "aliases": counts["ALST"],
+                    "objectives": counts["QOBJ"],
+                    "targets": counts["QSTA"],
+                    "conditions": counts["CTDA"],
+                }
+            )
 
+    in_esl = sum(1 for form_id in defined if 0x800 <= form_id <= 0xFFF)
+    return {
+        "groups": groups,
+        "records": sum(groups.values()),
+        "quests": quests,
+        "totals": {
+            key: sum(quest[key] for quest in quests)
+            for key in ("aliases", "objectives", "targets", "conditions")
+        },
+        "condition_functions": dict(
+            sorted(functions.items(), key=lambda item: (-item[1], item[0]))
+        ),
+        "form_ids": {
+            "defined": len(defined),
+            "min": FormID(min(defined)).hex8 if defined else None,
+            "max": FormID(max(defined)).hex8 if defined else None,
+            "esl_range": in_esl,
+            "outside_esl_range": len(defined) - in_esl,
+            "esl_free": 0xFFF - 0x800 + 1 - in_esl,
+            "invalid": invalid,
+        },
+    }
+
+
+@profiled("validate.quest")
 def validate_quest_structure(quest: ESXQuest) -> Tuple[bool, List[str]]:
     """Validate a quest structure"""
     errors = []
@@ -1035,18 +3688,14 @@ def validate_quest_structure(quest: ESXQuest) -> Tuple[bool, List[str]]:
             errors.append(f"Objective {obj.index} is missing a name")
 
     # Check aliases have names
-    for alias in quest.aliases:
-        if not alias.name:
-            errors.append(f"Alias {alias.index} is missing a name")
-
-    # Check for missing target aliases
-    referenced_aliases = set()
-    for obj in quest.objectives:
-        for target in obj.targets:
-            alias_id = target["alias"]
-            referenced_aliases.add(alias_id)
-
-    defined_aliases = {alias.index for alias in quest.aliases}
+    aliases = quest.aliases
+    for row, name in enumerate(aliases.names):
+        if not name:
+            errors.append(f"Alias {aliases.form_id(row)} is missing a name")
+
+    # Check for missing target aliases, over whole ID columns
+    referenced_aliases = quest.targets.alias_set()
+    defined_aliases = quest.aliases.id_set()
     missing_aliases = referenced_aliases - defined_aliases
 
     if missing_aliases:
@@ -1060,19 +3709,9 @@ def validate_esl_compatibility(plugin: ESXPlugin) -> Tuple[bool, List[str]]:
     return plugin.is_esl_compatible()
 
 
-def hex_to_decimal(hex_str: str) -> int:
+def hex_to_decimal(hex_str: Union[int, str]) -> int:
     """Convert hex string to decimal"""
-    if isinstance(hex_str, int):
-        return hex_str
-
-    hex_str = str(hex_str).lower()
-    if hex_str.startswith("0x"):
-        return int(hex_str, 16)
-    else:
-        try:
-            return int(hex_str, 16)
-        except ValueError:
-            return int(hex_str)
+    return FormID.parse(hex_str)
 
 
 def decimal_to_hex(value: Union[int, str], with_prefix: bool = True) -> str:
@@ -1093,33 +3732,354 @@ def decimal_to_hex(value: Union[int, str], with_prefix: bool = True) -> str:
     return f"{prefix}{value:x}"
 
 
-def write_plugin_to_xml(
-    plugin: ESXPlugin, output_file: str, pretty: bool = False
-) -> None:
-    """Write the plugin back to XML"""
-    root = plugin.to_xml()
-    tree = ET.ElementTree(root)
-
-    # Add XML declaration
-    if pretty:
-        # Pretty format XML with indentation
-        from xml.dom import minidom
-
-        xmlstr = minidom.parseString(ET.tostring(root, encoding="UTF-8")).toprettyxml(
-            indent="  "
-        )
-        with open(output_file, "w", encoding="UTF-8") as f:
-            f.write(xmlstr)
+# compression name -> (file suffix, magic bytes, default level)
+COMPRESSIONS: Dict[str, Tuple[str, bytes, int]] = {
+    "gzip": (".gz", b"\x1f\x8b", 6),
+    "xz": (".xz", b"\xfd7zXZ\x00", 6),
+}
+
+
+def compression_for(filename: str) -> Optional[str]:
+    """The compression implied by a file name's suffix, if any"""
+    lowered = filename.lower()
+    for name, (suffix, _, _) in COMPRESSIONS.items():
+        if lowered.endswith(suffix):
+            return name
+    return None
+
+
+def _sniff_compression(f: BinaryIO) -> Optional[str]:
+    """Detect gzip/xz from the first bytes of f without consuming them
+
+    f must support ``peek`` or ``seek``.
+    """
+    peek = getattr(f, "peek", None)
+    if peek is not None:
+        head = peek(6)[:6]
     else:
-        # Standard output without pretty printing
-        tree.write(output_file, encoding="UTF-8", xml_declaration=True)
+        position = f.tell()
+        head = f.read(6)
+        f.seek(position)
+    for name, (_, magic, _) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+@contextlib.contextmanager
+def open_esx(
+    target: Union[str, BinaryIO],
+    mode: str = "rb",
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+) -> Iterator[BinaryIO]:
+    """Open a path or wrap a binary file object, (de)compressing on the fly
+
+    Reading detects gzip and xz from the data itself. Writing uses
+    ``compression`` if given (``"none"`` for plain XML), otherwise the
+    ``.gz``/``.xz`` suffix of a path; file objects default to plain XML.
+    A file object passed in is left open.
+
+    gzip output records no name or timestamp, so the same content always
+    compresses to the same bytes.
+    """
+    if mode not in ("rb", "wb"):
+        raise ValueError(f"Unsupported mode {mode!r} (use 'rb' or 'wb')")
+    if compression is None and mode == "wb" and isinstance(target, str):
+        compression = compression_for(target)
+    if compression not in (None, "none") and compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression {compression!r} (known: none, {', '.join(COMPRESSIONS)})"
+        )
+
+    with contextlib.ExitStack() as stack:
+        raw: BinaryIO
+        if isinstance(target, str):
+            raw = stack.enter_context(open(target, mode))
+        else:
+            raw = target
+        if mode == "rb":
+            if not hasattr(raw, "peek") and not raw.seekable():
+                # Pipes and sockets: buffer them so the magic can be peeked
+                import io
+
+                raw = cast(BinaryIO, io.BufferedReader(cast(Any, raw)))
+            compression = _sniff_compression(raw)
+        if compression is None or compression == "none":
+            yield raw
+            return
+        if level is None:
+            level = COMPRESSIONS[compression][2]
+
+        stream: IO[bytes]
+        if compression == "gzip":
+            import gzip
+
+            if mode == "rb":
+                stream = gzip.GzipFile(fileobj=raw, mode="rb")
+            else:
+                stream = gzip.GzipFile(
+                    filename="", fileobj=raw, mode="wb", compresslevel=level, mtime=0
+                )
+        else:
+            import lzma
+
+            if mode == "rb":
+                stream = lzma.LZMAFile(raw, "rb")
+            else:
+                stream = lzma.LZMAFile(raw, "wb", preset=level)
+        with stream:
+            yield cast(BinaryIO, stream)
+
+
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+_ATTRIB_ESCAPES = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\n": "&#10;",
+        "\r": "&#13;",
+        "\t": "&#09;",
+    }
+)
+
+
+def iter_canonical_xml(plugin: ESXElement, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Serialize a plugin in canonical form, as UTF-8 chunks of about chunk_size
+
+    Canonical form depends only on the model, not on how it was built:
+
+    - ``<?xml version="1.0" encoding="UTF-8"?>``, then one element per
+      line, indented by two spaces per level, ``\\n`` line endings
+    - attributes sorted by name; the plugin root always states its version
+    - a childless element keeps its text verbatim, or is written ``<tag />``
+      without one; text beside child elements is stripped of surrounding
+      whitespace (so re-parsed indentation does not accumulate)
+    """
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n']
+    size = 0
+    stack: List[Tuple[ESXElement, int, str]] = [(plugin, 0, "")]
+    while stack:
+        element, depth, closing = stack.pop()
+        indent = "  " * depth
+        if closing:
+            parts.append(f"{indent}</{closing}>\n")
+            continue
+
+        attrib = element.attrib
+        if isinstance(element, ESXPlugin) and "version" not in attrib:
+            attrib = {**attrib, "version": element.version}
+        names = sorted(attrib)
+        tag = element.tag
+        if tag[:1] == "{" or any(name[:1] == "{" for name in names):
+            tag, attrs = _qualified_start(tag, attrib, names)
+        else:
+            attrs = "".join(
+                f' {name}="{attrib[name].translate(_ATTRIB_ESCAPES)}"' for name in names
+            )
+        children = element.elements
+        if children:
+            text = (element.text or "").strip().translate(_TEXT_ESCAPES)
+            parts.append(f"{indent}<{tag}{attrs}>{text}\n")
+            stack.append((element, depth, tag))
+            stack.extend((child, depth + 1, "") for child in reversed(children))
+        elif element.text:
+            text = element.text.translate(_TEXT_ESCAPES)
+            parts.append(f"{indent}<{tag}{attrs}>{text}</{tag}>\n")
+        else:
+            parts.append(f"{indent}<{tag}{attrs} />\n")
+
+        size += len(parts[-1])
+        if size >= chunk_size:
+            yield "".join(parts).encode("UTF-8")
+            parts = []
+            size = 0
+    yield "".join(parts).encode("UTF-8")
+
+
+def _qualified_start(
+    tag: str, attrib: Dict[str, str], names: List[str]
+) -> Tuple[str, str]:
+    """Tag and attributes with ``{uri}name`` written as ``nsN:name``
+
+    Prefixes are declared on the element itself, numbered in order of use.
+    """
+    prefixes: Dict[str, str] = {}
+
+    def qualify(name: str) -> str:
+        if name[:1] != "{":
+            return name
+        uri, local = name[1:].split("}", 1)
+        prefix = prefixes.setdefault(uri, f"ns{len(prefixes)}")
+        return f"{prefix}:{local}"
+
+    tag = qualify(tag)
+    attrs = [
+        f' {qualify(name)}="{attrib[name].translate(_ATTRIB_ESCAPES)}"' for name in names
+    ]
+    declarations = [
+        f' xmlns:{prefix}="{uri.translate(_ATTRIB_ESCAPES)}"'
+        for uri, prefix in prefixes.items()
+    ]
+    return tag, "".join(declarations + attrs)
+
+
+def _file_digest(filename: str) -> Optional[bytes]:
+    """sha256 of a file's (decompressed) content, or None if it is unreadable"""
+    import hashlib
+    import lzma
+    import zlib
+
+    digest = hashlib.sha256()
+    try:
+        with open_esx(filename, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, lzma.LZMAError, zlib.error):
+        # A damaged archive never matches; it just gets rewritten
+        return None
+    return digest.digest()
+
+
+@contextlib.contextmanager
+def atomic_write(output_file: str) -> Iterator[str]:
+    """Path of a temporary file that atomically replaces output_file
+
+    The temporary file is created next to output_file. When the block
+    exits normally, it replaces output_file and keeps that file's permission
+    bits (a new file gets 0o666 less the umask), unless the block removed
+    it, in which case output_file is left alone. On an exception it is
+    removed.
+    """
+    import os
+    import stat
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, temp_file = tempfile.mkstemp(prefix=".esx-", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        yield temp_file
+        if os.path.exists(temp_file):
+            if os.path.exists(output_file):
+                mode = stat.S_IMODE(os.stat(output_file).st_mode)
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(temp_file, mode)
+            os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.unlink(temp_file)
+        raise
+
+
+def write_plugin_canonical(
+    plugin: ESXPlugin,
+    output_file: Union[str, BinaryIO],
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+) -> bool:
+    """Write the canonical form only if it differs from the existing file
+
+    The output is hashed while it streams to a temporary file next to
+    output_file, which then atomically replaces it (keeping its permission
+    bits) unless the hashes match. An unchanged file is not touched, so its
+    mtime stays put for whatever runs downstream. For compressed files the
+    uncompressed content is compared.
+
+    A file object is always written to.
+
+    Returns:
+        True if output_file was (re)written
+    """
+    import hashlib
+    import os
+
+    if not isinstance(output_file, str):
+        with span("write.canonical"), open_esx(
+            output_file, "wb", compression, level
+        ) as f:
+            for chunk in iter_canonical_xml(plugin):
+                f.write(chunk)
+        return True
+
+    if compression is None:
+        compression = compression_for(output_file)
+    existing = _file_digest(output_file)
+    with atomic_write(output_file) as temp_file:
+        digest = hashlib.sha256()
+        with open(temp_file, "wb") as raw, open_esx(raw, "wb", compression, level) as f:
+            with span("write.canonical"):
+                for chunk in iter_canonical_xml(plugin):
+                    digest.update(chunk)
+                    f.write(chunk)
+        if digest.digest() == existing:
+            os.unlink(temp_file)
+            logger.debug("%s is unchanged", output_file)
+            return False
+    return True
+
+
+def write_plugin_to_xml(
+    plugin: ESXPlugin,
+    output_file: Union[str, BinaryIO],
+    pretty: bool = False,
+    canonical: bool = False,
+    compression: Optional[str] = None,
+    level: Optional[int] = None,
+) -> bool:
+    """Write the plugin back to XML
+
+    With ``canonical``, the canonical form is written (``pretty`` is then
+    ignored) and the file is left alone if its content would not change.
+
+    output_file may be a binary file object. ``compression`` is ``"gzip"``,
+    ``"xz"`` or ``"none"``; by default a ``.gz``/``.xz`` suffix selects it.
+    ``level`` overrides the compression level (gzip 1-9, xz 0-9).
+
+    Returns:
+        True if output_file was written
+    """
+    if canonical:
+        with span("write"):
+            return write_plugin_canonical(plugin, output_file, compression, level)
+
+    with span("write"):
+        with span("write.tree"):
+            root = plugin.to_xml()
+        tree = ET.ElementTree(root)
+
+        # Add XML declaration
+        if pretty:
+            # Pretty format XML with indentation
+            from xml.dom import minidom
+
+            with span("write.pretty"):
+                xmlstr = minidom.parseString(
+                    ET.tostring(root, encoding="UTF-8")
+                ).toprettyxml(indent="  ")
+            with span("write.file"):
+                with open_esx(output_file, "wb", compression, level) as f:
+                    f.write(xmlstr.encode("UTF-8"))
+        else:
+            # Standard output without pretty printing
+            with span("write.serialize"):
+                with open_esx(output_file, "wb", compression, level) as f:
+                    tree.write(f, encoding="UTF-8", xml_declaration=True)
+    return True
 
 
 def main() -> None:
     """Main entry point"""
     if len(sys.argv) < 2:
         print("Usage: python esx_parser.py <input_file> [output_file]")
-        return
+        sys.exit(2)
 
     input_file = sys.argv[1]
 
@@ -1128,8 +4088,8 @@ def main() -> None:
         plugin = parser.parse_file(input_file)
 
         # Print summary
-        summary = summarize_plugin(plugin)
-        print(summary)
+        write_summary(plugin, sys.stdout)
+        print()
 
         # Write back to XML if output file provided
         if len(sys.argv) > 2:
@@ -1142,6 +4102,7 @@ def main() -> None:
         import traceback
 
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == "__main__":
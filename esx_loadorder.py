@@ -0,0 +1,563 @@
+"""Load order model: resolve FormIDs across plugins and their masters.
+
+Usage:
+    python esx_loadorder.py [<plugin_file> ...] [--plugins plugins.txt] [--data DIR]
+                            [--check] [--resolve PLUGIN FORMID]
+
+A FormID inside a plugin file is local: its top byte indexes the plugin's
+own MAST list, and the index after the last master means the plugin
+itself. In the game the top byte is the load order slot instead. Full
+plugins take slots 00-FD in order. Light (ESL) plugins share slot FE and
+are numbered 000-FFF in bits 12-23, leaving 12 bits of object ID.
+
+Only the TES4 headers are read up front; they give the masters and the
+light flag needed to lay out the slots. Each plugin's table of master
+index -> slot is built the first time one of its FormIDs is resolved,
+so resolving is one list lookup. The list of forms a plugin defines is
+scanned only when a reference into its slot is validated, along with
+the plugins that have it as a master (and may inject records into it). ESX (XML) plugins,
+gzip/xz-compressed or not, and binary ESP/ESM/ESL files can be mixed.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from esx_lib import (
+    COMPRESSIONS,
+    ESXElement,
+    ESXError,
+    ESXParser,
+    FormID,
+    compression_for,
+    open_esx,
+)
+
+MASTER_FLAG = 0x1
+LIGHT_FLAG = 0x200
+
+MAX_FULL_PLUGINS = 0xFD
+MAX_LIGHT_PLUGINS = 0x1000
+
+# ESX fields whose text is a hex8 FormID; 00000000 means none
+REFERENCE_FIELDS = ("ALFR", "VTCK", "reference")
+
+ESX_EXTENSIONS = tuple(
+    ".esx" + suffix for suffix in ("", *(entry[0] for entry in COMPRESSIONS.values()))
+)
+
+# Binary record header: type, data size, flags, FormID, then 8 bytes of
+# version control info
+_RECORD_HEADER = struct.Struct("<4sIII8x")
+_SUBRECORD_HEADER = struct.Struct("<4sH")
+
+
+@dataclass
+class PluginHeader:
+    """What the load order needs from a plugin's TES4 record"""
+
+    masters: List[str] = field(default_factory=list)
+    flags: int = 0
+
+    @property
+    def is_light(self) -> bool:
+        return bool(self.flags & LIGHT_FLAG)
+
+    @property
+    def is_master(self) -> bool:
+        return bool(self.flags & MASTER_FLAG)
+
+
+def is_esx_file(path: str) -> bool:
+    return path.lower().endswith(ESX_EXTENSIONS)
+
+
+def read_esx_header(path: str) -> PluginHeader:
+    """TES4 of an ESX file, reading no further than the end of the header"""
+    header = PluginHeader()
+    with open_esx(path) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag == "MAST":
+                header.masters.append(element.text or "")
+            elif element.tag == "TES4":
+                header.flags = int(element.get("flags", "0"), 16)
+                return header
+    raise ESXError(f"{path}: no TES4 header")
+
+
+def scan_esx_forms(path: str) -> Set[int]:
+    """Local FormIDs of the records in an ESX file"""
+    forms: Set[int] = set()
+    stack: List[str] = []
+    with open_esx(path) as f:
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                if stack and stack[-1] == "GRUP" and "id" in element.attrib:
+                    forms.add(int(element.attrib["id"], 16))
+                stack.append(element.tag)
+            else:
+                stack.pop()
+                if element.tag != "GRUP":
+                    # Keep memory flat: record bodies are not needed
+                    element.clear()
+    return forms
+
+
+def read_binary_header(path: str) -> PluginHeader:
+    """TES4 of an ESP/ESM/ESL file"""
+    with open(path, "rb") as f:
+        data = f.read(_RECORD_HEADER.size)
+        if len(data) < _RECORD_HEADER.size:
+            raise ESXError(f"{path}: truncated TES4 header")
+        tag, size, flags, _ = _RECORD_HEADER.unpack(data)
+        if tag != b"TES4":
+            raise ESXError(f"{path}: not a plugin (starts with {tag!r})")
+        body = f.read(size)
+    if flags & 0x40000:
+        raise ESXError(f"{path}: compressed TES4 header")
+
+    header = PluginHeader(flags=flags)
+    position = 0
+    large_size = None
+    while position + _SUBRECORD_HEADER.size <= len(body):
+        tag, length = _SUBRECORD_HEADER.unpack_from(body, position)
+        position += _SUBRECORD_HEADER.size
+        if large_size is not None:
+            length, large_size = large_size, None
+        if tag == b"XXXX":
+            (large_size,) = struct.unpack_from("<I", body, position)
+        elif tag == b"MAST":
+            header.masters.append(
+                body[position : position + length].rstrip(b"\0").decode("cp1252")
+            )
+        position += length
+    return header
+
+
+def scan_binary_forms(path: str) -> Set[int]:
+    """Local FormIDs of the records in an ESP/ESM/ESL file
+
+    Walks record and group headers only; record data (compressed or not)
+    is skipped.
+    """
+    forms: Set[int] = set()
+    size = os.path.getsize(path)
+    header_size = _RECORD_HEADER.size
+    with open(path, "rb") as f:
+        # Skip TES4
+        _, length, _, _ = _RECORD_HEADER.unpack(f.read(header_size))
+        position = header_size + length
+        while position + header_size <= size:
+            f.seek(position)
+            tag, length, flags, form_id = _RECORD_HEADER.unpack(f.read(header_size))
+            if tag == b"GRUP":
+                # Step into the group: its records follow its header
+                position += header_size
+            else:
+                forms.add(form_id)
+                position += header_size + length
+    return forms
+
+
+@dataclass
+class Slot:
+    """Where a plugin sits in the load order"""
+
+    index: int
+    light: bool = False
+
+    def __str__(self) -> str:
+        return f"FE {self.index:03X}" if self.light else f"{self.index:02X}"
+
+
+class LoadOrderPlugin:
+    """One plugin in a load order; header, forms and table load on demand"""
+
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.slot: Optional[Slot] = None
+        self._header: Optional[PluginHeader] = None
+        self._forms: Optional[Set[int]] = None
+        # master index -> (base, mask); the last entry is the plugin itself
+        self._table: Optional[List[Tuple[int, int]]] = None
+
+    @property
+    def header(self) -> PluginHeader:
+        if self._header is None:
+            if self.path is None:
+                # Not on disk: all we know is what the name says
+                flags = LIGHT_FLAG if self.name.lower().endswith(".esl") else 0
+                self._header = PluginHeader(flags=flags)
+            elif is_esx_file(self.path):
+                self._header = read_esx_header(self.path)
+            else:
+                self._header = read_binary_header(self.path)
+            if self.name.lower().endswith(".esl"):
+                self._header.flags |= LIGHT_FLAG
+        return self._header
+
+    @property
+    def masters(self) -> List[str]:
+        return self.header.masters
+
+    @property
+    def is_light(self) -> bool:
+        return self.header.is_light
+
+    @property
+    def forms(self) -> Optional[Set[int]]:
+        """Local FormIDs of every record in the file, or None without a file"""
+        if self._forms is None and self.path is not None:
+            if is_esx_file(self.path):
+                self._forms = scan_esx_forms(self.path)
+            else:
+                self._forms = scan_binary_forms(self.path)
+        return self._forms
+
+    def __repr__(self) -> str:
+        return f"LoadOrderPlugin({self.name!r}, slot={self.slot})"
+
+
+def plugin_name_for(path: str) -> str:
+    """Name other plugins use for a file in their MAST lists
+
+    An ESX file stands in for the ``.esp`` of the same name.
+    """
+    name = os.path.basename(path)
+    if is_esx_file(name):
+        compression = compression_for(name)
+        if compression:
+            name = name[: -len(COMPRESSIONS[compression][0])]
+        return name[: -len(".esx")] + ".esp"
+    return name
+
+
+def read_plugins_txt(path: str) -> List[str]:
+    """Active plugins in a plugins.txt, in order
+
+    Lines starting with ``*`` are active in the newer format; if no line
+    uses ``*``, every line is.
+    """
+    with open(path, encoding="UTF-8") as f:
+        lines = [line.strip() for line in f]
+    lines = [line for line in lines if line and not line.startswith("#")]
+    if any(line.startswith("*") for line in lines):
+        return [line[1:] for line in lines if line.startswith("*")]
+    return lines
+
+
+def find_plugin_file(data_dir: str, name: str) -> Optional[str]:
+    """The plugin's file in a data directory, or an ESX stand-in for it"""
+    stem = os.path.splitext(name)[0]
+    for candidate in (name, *(stem + extension for extension in ESX_EXTENSIONS)):
+        path = os.path.join(data_dir, candidate)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class LoadOrder:
+    """Plugins in load order, with O(1) local <-> load order FormID mapping"""
+
+    def __init__(self) -> None:
+        self.plugins: List[LoadOrderPlugin] = []
+        self._by_name: Dict[str, LoadOrderPlugin] = {}
+        self._full: List[LoadOrderPlugin] = []
+        self._light: List[LoadOrderPlugin] = []
+        self._laid_out = False
+        # plugin name -> object IDs of records in its slot, built on demand
+        self._records: Dict[str, Set[int]] = {}
+
+    @classmethod
+    def from_names(cls, names: List[str], data_dir: Optional[str] = None) -> "LoadOrder":
+        """Load order from plugin names, finding their files in data_dir"""
+        load_order = cls()
+        for name in names:
+            path = find_plugin_file(data_dir, name) if data_dir else None
+            load_order.add(name, path)
+        return load_order
+
+    def add(self, name: str, path: Optional[str] = None) -> LoadOrderPlugin:
+        """Append a plugin; without a path it can be referenced but not checked"""
+        key = name.lower()
+        if key in self._by_name:
+            raise ESXError(f"{name} is already in the load order")
+        plugin = LoadOrderPlugin(name, path)
+        self.plugins.append(plugin)
+        self._by_name[key] = plugin
+        self._laid_out = False
+        self._records.clear()
+        return plugin
+
+    def add_file(self, path: str) -> LoadOrderPlugin:
+        return self.add(plugin_name_for(path), path)
+
+    def get(self, name: str) -> Optional[LoadOrderPlugin]:
+        return self._by_name.get(name.lower())
+
+    def __getitem__(self, name: str) -> LoadOrderPlugin:
+        plugin = self.get(name)
+        if plugin is None:
+            raise ESXError(f"{name} is not in the load order")
+        return plugin
+
+    def __iter__(self) -> Iterator[LoadOrderPlugin]:
+        self._layout()
+        return iter(self.plugins)
+
+    def __len__(self) -> int:
+        return len(self.plugins)
+
+    def _layout(self) -> None:
+        """Assign slots: full plugins 00-FD, light plugins FE 000-FFF"""
+        if self._laid_out:
+            return
+        self._full = []
+        self._light = []
+        for plugin in self.plugins:
+            plugin._table = None
+            if plugin.is_light:
+                plugin.slot = Slot(len(self._light), light=True)
+                self._light.append(plugin)
+            else:
+                plugin.slot = Slot(len(self._full))
+                self._full.append(plugin)
+        if len(self._full) > MAX_FULL_PLUGINS:
+            raise ESXError(
+                f"{len(self._full)} full plugins, only {MAX_FULL_PLUGINS} fit in a load order"
+            )
+        if len(self._light) > MAX_LIGHT_PLUGINS:
+            raise ESXError(
+                f"{len(self._light)} light plugins, only {MAX_LIGHT_PLUGINS} fit in a load order"
+            )
+        self._laid_out = True
+
+    def _table(self, plugin: LoadOrderPlugin) -> List[Tuple[int, int]]:
+        if plugin._table is None:
+            self._layout()
+            table = []
+            for name in [*plugin.masters, plugin.name]:
+                slot = self[name].slot
+                assert slot is not None
+                if slot.light:
+                    table.append((0xFE000000 | slot.index << 12, 0xFFF))
+                else:
+                    table.append((slot.index << 24, 0xFFFFFF))
+            plugin._table = table
+        return plugin._table
+
+    def resolve(self, plugin: Union[str, LoadOrderPlugin], form_id: Union[int, str]) -> FormID:
+        """Load order FormID of a FormID as written in the given plugin
+
+        Master indices past the plugin's own index refer to the plugin
+        itself, as in the game.
+        """
+        if isinstance(plugin, str):
+            plugin = self[plugin]
+        if isinstance(form_id, str):
+            form_id = FormID.parse(form_id)
+        table = self._table(plugin)
+        base, mask = table[min(form_id >> 24, len(table) - 1)]
+        return FormID(base | form_id & mask)
+
+    def owner(self, form_id: Union[int, str]) -> Optional[LoadOrderPlugin]:
+        """Plugin whose slot a load order FormID falls in, if any"""
+        self._layout()
+        form_id = FormID.parse(form_id) if isinstance(form_id, str) else FormID(form_id)
+        if form_id.is_light:
+            index = form_id.light_index
+            slots = self._light
+        else:
+            index = form_id.plugin_index
+            slots = self._full
+        assert index is not None
+        return slots[index] if index < len(slots) else None
+
+    def to_local(self, plugin: Union[str, LoadOrderPlugin], form_id: Union[int, str]) -> FormID:
+        """FormID as the given plugin would write a load order FormID"""
+        if isinstance(plugin, str):
+            plugin = self[plugin]
+        form_id = FormID.parse(form_id) if isinstance(form_id, str) else FormID(form_id)
+        owner = self.owner(form_id)
+        names = [name.lower() for name in [*plugin.masters, plugin.name]]
+        if owner is None or owner.name.lower() not in names:
+            raise ESXError(f"{form_id!r} is not from {plugin.name} or one of its masters")
+        return FormID(form_id.object_id).in_plugin(names.index(owner.name.lower()))
+
+    def defines(self, form_id: Union[int, str]) -> Optional[bool]:
+        """Whether any plugin has a record for a load order FormID
+
+        A record can come from the owning plugin or be injected into its
+        slot by a plugin that has it as a master. None when the owner's
+        file is not available and no dependent injects the form.
+        """
+        owner = self.owner(form_id)
+        if owner is None:
+            return False
+        form_id = FormID.parse(form_id) if isinstance(form_id, str) else FormID(form_id)
+        if form_id.object_id in self._slot_records(owner):
+            return True
+        return None if owner.path is None else False
+
+    def _slot_records(self, owner: LoadOrderPlugin) -> Set[int]:
+        """Object IDs of every record that lands in the owner's slot"""
+        records = self._records.get(owner.name.lower())
+        if records is None:
+            records = set()
+            mask = 0xFFF if owner.is_light else 0xFFFFFF
+            key = owner.name.lower()
+            for plugin in self.plugins:
+                names = [name.lower() for name in plugin.masters]
+                if plugin is owner:
+                    index = len(names)
+                elif key in names:
+                    index = names.index(key)
+                else:
+                    continue
+                last = len(names)
+                for local in plugin.forms or ():
+                    master = local >> 24
+                    if master == index or (index == last and master > last):
+                        records.add(local & mask)
+            self._records[key] = records
+        return records
+
+    def check_masters(self) -> List[str]:
+        """Missing masters and masters loaded after their dependents"""
+        errors = []
+        position = {plugin.name.lower(): i for i, plugin in enumerate(self.plugins)}
+        for i, plugin in enumerate(self.plugins):
+            for master in plugin.masters:
+                index = position.get(master.lower())
+                if index is None:
+                    errors.append(f"{plugin.name}: master {master} is not in the load order")
+                elif index > i:
+                    errors.append(f"{plugin.name}: master {master} loads after it")
+        return errors
+
+    def check_references(self, plugin: Union[str, LoadOrderPlugin]) -> Tuple[int, List[str]]:
+        """Check that the FormIDs an ESX plugin references exist
+
+        References into plugins whose files are not available are
+        resolved but not checked.
+
+        Returns:
+            Number of references resolved, and the problems found
+        """
+        if isinstance(plugin, str):
+            plugin = self[plugin]
+        if plugin.path is None or not is_esx_file(plugin.path):
+            raise ESXError(f"{plugin.name}: references can only be checked in ESX files")
+        masters = {name.lower() for name in plugin.masters}
+        missing = sorted(name for name in masters if self.get(name) is None)
+        if missing:
+            return 0, [f"{plugin.name}: masters not in the load order: {', '.join(missing)}"]
+
+        errors = []
+        resolved = 0
+        parsed = ESXParser().parse_file(plugin.path)
+        for group in parsed.groups:
+            for record in group.records:
+                for element in _walk(record):
+                    if element.tag not in REFERENCE_FIELDS or not element.text:
+                        continue
+                    local = FormID.parse(element.text)
+                    if not local:
+                        continue
+                    resolved += 1
+                    where = f"{plugin.name} {record.editor_id or record.attrib.get('id')}"
+                    if local >> 24 > len(plugin.masters):
+                        errors.append(
+                            f"{where}: {element.tag} {local.hex8} has master index"
+                            f" {local >> 24:02X}, but there are {len(plugin.masters)} masters"
+                        )
+                        continue
+                    form_id = self.resolve(plugin, local)
+                    if self.defines(form_id) is False:
+                        owner = self.owner(form_id)
+                        errors.append(
+                            f"{where}: {element.tag} {local.hex8} ({form_id.hex8})"
+                            f" is not defined in {owner.name if owner else '?'}"
+                        )
+        return resolved, errors
+
+
+def _walk(element: ESXElement) -> Iterator[ESXElement]:
+    stack = [element]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(current.elements))
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    plugins_txt = None
+    data_dir = None
+    check = False
+    resolve: List[Tuple[str, str]] = []
+    files: List[str] = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--plugins":
+            plugins_txt = args[i + 1]
+            i += 2
+        elif args[i] == "--data":
+            data_dir = args[i + 1]
+            i += 2
+        elif args[i] == "--check":
+            check = True
+            i += 1
+        elif args[i] == "--resolve":
+            resolve.append((args[i + 1], args[i + 2]))
+            i += 3
+        else:
+            files.append(args[i])
+            i += 1
+
+    if not files and not plugins_txt:
+        print(__doc__)
+        sys.exit(2)
+
+    try:
+        names = read_plugins_txt(plugins_txt) if plugins_txt else []
+        if data_dir is None and plugins_txt:
+            data_dir = os.path.dirname(os.path.abspath(plugins_txt))
+        load_order = LoadOrder.from_names(names, data_dir)
+        for path in files:
+            load_order.add_file(path)
+
+        for plugin in load_order:
+            source = plugin.path or "(no file)"
+            print(f"{str(plugin.slot):<6} {plugin.name:<32} {source}")
+
+        for name, text in resolve:
+            form_id = load_order.resolve(name, text)
+            owner = load_order.owner(form_id)
+            print(f"{name} {text} -> {form_id.hex8} ({owner.name if owner else 'no plugin'})")
+
+        if check:
+            errors = load_order.check_masters()
+            for plugin in load_order:
+                if plugin.path and is_esx_file(plugin.path):
+                    count, plugin_errors = load_order.check_references(plugin)
+                    print(f"{plugin.name}: {count} references, {len(plugin_errors)} problems")
+                    errors.extend(plugin_errors)
+            for error in errors:
+                print(f"  - {error}")
+            if errors:
+                sys.exit(1)
+    except ESXError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Peak-memory budgets for generating, loading and writing ESL-maxed plugins.
+
+Usage:
+    python esx_memcheck.py check [budgets.json] [--tolerance 0.10] [--scenario NAME ...]
+    python esx_memcheck.py record [budgets.json] [--scenario NAME ...]
+
+``check`` measures the ``tracemalloc`` peak of each phase and exits non-zero
+when one grows beyond its stored budget by more than the tolerance (the
+budget file's own ``tolerance`` unless overridden). ``record`` rewrites the
+budgets from the current measurements. The same checks run under pytest
+in tests/test_memory.py.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from esx_bench import SCENARIOS, Scenario, build_plugin
+from esx_lib import ESXParser, write_plugin_to_xml
+
+DEFAULT_BUDGETS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "esx_memory_budgets.json"
+)
+DEFAULT_TOLERANCE = 0.10
+
+# Scenarios that fill the ESL range; the pretty writer is the one that has
+# run out of memory in CI, so it is covered explicitly
+BUDGET_SCENARIOS = ["single_quest_esl_max", "multi_quest_esl"]
+PHASES = ["build", "parse", "write_compact", "write_pretty"]
+
+
+def traced_peak(fn: Callable[[], Any]) -> Tuple[Any, int]:
+    """Run fn under tracemalloc and return (result, peak bytes it allocated)
+
+    Memory held before the call is not traced, so only the phase itself
+    is counted.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def measure_scenario(scenario: Scenario, workdir: str) -> Dict[str, int]:
+    """Peak bytes of each phase for one scenario"""
+    peaks: Dict[str, int] = {}
+    compact_file = os.path.join(workdir, f"{scenario.name}.esx")
+    pretty_file = os.path.join(workdir, f"{scenario.name}.pretty.esx")
+
+    plugin, peaks["build"] = traced_peak(lambda: build_plugin(scenario))
+    _, peaks["write_compact"] = traced_peak(
+        lambda: write_plugin_to_xml(plugin, compact_file, pretty=False)
+    )
+    _, peaks["write_pretty"] = traced_peak(
+        lambda: write_plugin_to_xml(plugin, pretty_file, pretty=True)
+    )
+    del plugin
+
+    _, peaks["parse"] = traced_peak(lambda: ESXParser().parse_file(compact_file))
+    return {phase: peaks[phase] for phase in PHASES}
+
+
+def measure(names: List[str]) -> Dict[str, Dict[str, int]]:
+    with tempfile.TemporaryDirectory() as workdir:
+        return {name: measure_scenario(SCENARIOS[name], workdir) for name in names}
+
+
+def check(
+    budgets: Dict[str, Any],
+    measured: Dict[str, Dict[str, int]],
+    tolerance: Optional[float] = None,
+) -> Tuple[List[str], List[str]]:
+    """Compare measured peaks with the budgets
+
+    Returns:
+        Tuple of (report_lines, failures)
+    """
+    if tolerance is None:
+        tolerance = budgets.get("tolerance", DEFAULT_TOLERANCE)
+    lines = []
+    failures = []
+    for name, phases in measured.items():
+        scenario_budgets = budgets.get("scenarios", {}).get(name, {})
+        for phase, peak in phases.items():
+            budget = scenario_budgets.get(phase)
+            if budget is None:
+                failures.append(f"{name}/{phase}: no budget recorded")
+                continue
+            limit = budget * (1 + tolerance)
+            flag = ""
+            if peak > limit:
+                flag = "  OVER BUDGET"
+                failures.append(
+                    f"{name}/{phase}: {_mib(peak)} > {_mib(budget)} + {tolerance:.0%}"
+                )
+            lines.append(
+                f"{name + '/' + phase:<40} {_mib(peak):>12} {_mib(budget):>12}"
+                f" {peak / budget:>6.2f}x{flag}"
+            )
+    return lines, failures
+
+
+def _mib(value: float) -> str:
+    return f"{value / 1024 / 1024:.2f} MiB"
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ("check", "record"):
+        print(__doc__)
+        sys.exit(2)
+
+    budgets_file = DEFAULT_BUDGETS_FILE
+    tolerance: Optional[float] = None
+    names: List[str] = []
+    i = 1
+    while i < len(args):
+        if args[i] == "--tolerance":
+            tolerance = float(args[i + 1])
+            i += 2
+        elif args[i] == "--scenario":
+            names.append(args[i + 1])
+            i += 2
+        else:
+            budgets_file = args[i]
+            i += 1
+
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (known: {', '.join(SCENARIOS)})")
+        sys.exit(2)
+    names = names or BUDGET_SCENARIOS
+
+    budgets: Dict[str, Any] = {"tolerance": DEFAULT_TOLERANCE, "scenarios": {}}
+    if os.path.exists(budgets_file):
+        with open(budgets_file, encoding="UTF-8") as f:
+            budgets = json.load(f)
+
+    measured = measure(names)
+
+    if args[0] == "record":
+        budgets.setdefault("scenarios", {}).update(measured)
+        if tolerance is not None:
+            budgets["tolerance"] = tolerance
+        with open(budgets_file, "w", encoding="UTF-8") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        for name, phases in measured.items():
+            for phase, peak in phases.items():
+                print(f"{name + '/' + phase:<40} {_mib(peak):>12}")
+        print(f"\nWrote budgets to {budgets_file}")
+        return
+
+    lines, failures = check(budgets, measured, tolerance)
+    for line in lines:
+        print(line)
+    if failures:
+        print(f"\n{len(failures)} memory budget failures:")
+        for failure in failures:
+            print(f"- {failure}")
+        sys.exit(1)
+    print("\nAll phases within budget")
+
+
+if __name__ == "__main__":
+    main()
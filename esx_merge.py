@@ -0,0 +1,290 @@
+"""Merge several ESX plugins into one with FormID remapping.
+
+Every FormID a source plugin defines (record ``id`` attributes and ALST alias
+IDs) is given a new ID from a single fresh ``FormIDManager``. The new IDs are
+pre-rendered in each textual format used by the model, so rewriting a record
+is one walk over its subtree with dict lookups and no int/str conversions.
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set
+
+from esx_lib import (
+    ESXTES4,
+    ESXElement,
+    ESXFormIDConflictError,
+    ESXGroup,
+    ESXParser,
+    ESXPlugin,
+    ESXQuest,
+    ESXRecord,
+    FormID,
+    FormIDManager,
+    validate_esl_compatibility,
+    write_plugin_to_xml,
+)
+
+
+@dataclass
+class RemapTable:
+    """Old -> new FormID mapping for one source plugin, in every text format"""
+
+    ids: Dict[int, int] = field(default_factory=dict)
+    hex8: Dict[str, str] = field(default_factory=dict)  # "00000800" (record id)
+    decimal: Dict[str, str] = field(default_factory=dict)  # "2050" (ALST, QSTA, VMAD)
+    prefixed: Dict[str, str] = field(default_factory=dict)  # "0x00000802" (CTDA)
+
+    def add(self, old: int, new: int) -> None:
+        old, new = FormID(old), FormID(new)
+        self.ids[old] = new
+        self.hex8[old.hex8] = new.hex8
+        self.decimal[old.decimal] = new.decimal
+        self.prefixed[old.prefixed] = new.prefixed
+
+
+@dataclass
+class MergeResult:
+    """Outcome of merge_plugins"""
+
+    plugin: ESXPlugin
+    remaps: List[RemapTable]
+    conflicts: List[str]
+    form_id_manager: FormIDManager
+
+
+def defined_form_ids(record: ESXElement) -> List[int]:
+    """FormIDs a record defines: its own id followed by its ALST aliases"""
+    ids = []
+    record_id = record.attrib.get("id")
+    if record_id:
+        ids.append(FormID.parse(record_id))
+    for child in record.elements:
+        if child.tag == "ALST" and child.text:
+            ids.append(FormID.from_decimal(child.text))
+    return ids
+
+
+def rewrite_form_ids(record: ESXElement, table: RemapTable) -> List[str]:
+    """Rewrite every FormID-bearing field of a record subtree in one pass
+
+    Returns the alias references (QSTA targets, VMAD alias scripts) that
+    were not found in the table.
+    """
+    unresolved = []
+    record_id = record.attrib.get("id")
+    if record_id:
+        new_id = table.hex8.get(record_id.lower())
+        if new_id is not None:
+            record.touch()
+            record.attrib["id"] = new_id
+
+    stack = list(record.elements)
+    while stack:
+        element = stack.pop()
+        tag = element.tag
+        if tag == "ALST" and element.text:
+            new_text = table.decimal.get(element.text)
+            if new_text is not None:
+                element.touch()
+                element.text = new_text
+        elif tag == "param1" and element.text:
+            new_text = table.prefixed.get(element.text.lower())
+            if new_text is not None:
+                element.touch()
+                element.text = new_text
+        elif tag == "struct" and "alias" in element.attrib:
+            alias = element.attrib["alias"]
+            new_alias = table.decimal.get(alias)
+            if new_alias is None:
+                unresolved.append(alias)
+            else:
+                element.touch()
+                element.attrib["alias"] = new_alias
+        elif tag == "alias" and "object" in element.attrib:
+            alias = element.attrib["object"]
+            new_alias = table.decimal.get(alias)
+            if new_alias is None:
+                unresolved.append(alias)
+            else:
+                element.touch()
+                element.attrib["object"] = new_alias
+        if element.elements:
+            stack.extend(element.elements)
+
+    return unresolved
+
+
+def _copy_record(record: ESXRecord, table: RemapTable) -> tuple[ESXRecord, List[str]]:
+    copied = record.clone()
+    unresolved = rewrite_form_ids(copied, table)
+    if isinstance(copied, ESXQuest):
+        copied.invalidate()
+    else:
+        copied.editor_id = record.editor_id
+    return copied, unresolved
+
+
+def merge_plugins(
+    plugins: Sequence[ESXPlugin],
+    form_id_manager: Optional[FormIDManager] = None,
+    names: Optional[Sequence[str]] = None,
+) -> MergeResult:
+    """Merge plugins into one, remapping all FormIDs they define
+
+    Records whose editor ID was already taken by an earlier plugin are
+    skipped and reported as conflicts, as are QSTA targets and VMAD alias
+    scripts pointing at aliases the source plugin does not define.
+    """
+    manager = form_id_manager or FormIDManager(0x800, 0xFFF)
+    labels = list(names) if names else [f"plugin {i + 1}" for i in range(len(plugins))]
+    conflicts: List[str] = []
+    remaps: List[RemapTable] = []
+
+    # Pre-pass: pick the records to keep and count the IDs they need
+    seen_editor_ids: Dict[str, str] = {}
+    kept: List[List[tuple[ESXGroup, List[ESXRecord]]]] = []
+    needed = 0
+    for plugin, label in zip(plugins, labels):
+        plugin_groups = []
+        plugin_ids: Set[int] = set()
+        for group in plugin.groups:
+            records = []
+            for record in group.records:
+                edid = record.editor_id or record.get_editor_id()
+                if edid and edid in seen_editor_ids:
+                    conflicts.append(
+                        f"{label}: {record.tag} {edid} already defined by "
+                        f"{seen_editor_ids[edid]}, skipped"
+                    )
+                    continue
+                if edid:
+                    seen_editor_ids[edid] = label
+                records.append(record)
+                plugin_ids.update(defined_form_ids(record))
+            plugin_groups.append((group, records))
+        kept.append(plugin_groups)
+        needed += len(plugin_ids)
+
+    available = manager.end_id - manager.start_id + 1 - manager.get_used_count()
+    if needed > available:
+        raise ESXFormIDConflictError(
+            f"Merge needs {needed} form IDs but only {available} are available"
+        )
+
+    # Build one remap table per source plugin
+    for plugin_groups in kept:
+        old_ids: List[int] = []
+        seen_ids: Set[int] = set()
+        for _, records in plugin_groups:
+            for record in records:
+                for old in defined_form_ids(record):
+                    if old in seen_ids:
+                        conflicts.append(f"Form ID 0x{old:x} defined more than once")
+                        continue
+                    seen_ids.add(old)
+                    old_ids.append(old)
+        # Allocate only for unique IDs, so duplicates do not use up the budget
+        try:
+            new_ids = manager.allocate_range(len(old_ids)) if old_ids else []
+        except ESXFormIDConflictError:
+            # Fragmented manager: fall back to first-fit per ID
+            new_ids = [manager.allocate_next_id() for _ in old_ids]
+        table = RemapTable()
+        for old, new in zip(old_ids, new_ids):
+            table.add(old, new)
+        remaps.append(table)
+
+    # Assemble the merged plugin
+    merged = ESXPlugin(tag="plugin", attrib=dict(plugins[0].attrib) if plugins else {})
+    tes4 = ESXTES4(
+        tag="TES4",
+        attrib=dict(plugins[0].tes4.attrib) if plugins and plugins[0].tes4 else {},
+    )
+    masters: List[str] = []
+    for plugin in plugins:
+        if plugin.tes4:
+            for master in plugin.tes4.masters:
+                if master not in masters:
+                    masters.append(master)
+    cnam = plugins[0].tes4.find("CNAM") if plugins and plugins[0].tes4 else None
+    tes4.append(ESXElement("CNAM", text=cnam.text if cnam else "DEFAULT"))
+    for master in masters:
+        tes4.add_master(master)
+    tes4.append(ESXElement("INTV", text="1"))
+    merged.add_tes4(tes4)
+
+    record_count = 0
+    for plugin_groups, table, label in zip(kept, remaps, labels):
+        for group, records in plugin_groups:
+            target_group = merged.get_or_create_group(group.label, group.group_type)
+            for key, value in group.attrib.items():
+                target_group.attrib.setdefault(key, value)
+            for record in records:
+                copied, unresolved = _copy_record(record, table)
+                for alias in unresolved:
+                    conflicts.append(
+                        f"{label}: {record.editor_id or record.tag} references "
+                        f"undefined alias {alias}"
+                    )
+                target_group.add_record(copied)
+                record_count += 1
+
+    # HEDR goes first in TES4, after all IDs are known
+    next_object_id = max(manager.used_ids, default=manager.start_id - 1) + 1
+    hedr = ESXElement("HEDR")
+    hedr.append(
+        ESXElement(
+            "struct",
+            attrib={
+                "version": "1.71000004",
+                "numRecords": str(record_count),
+                "nextObjectID": f"{next_object_id:08x}",
+            },
+        )
+    )
+    tes4.insert(0, hedr)
+
+    return MergeResult(
+        plugin=merged, remaps=remaps, conflicts=conflicts, form_id_manager=manager
+    )
+
+
+def main() -> None:
+    """Main entry point"""
+    if len(sys.argv) < 4:
+        print("Usage: python esx_merge.py <output_file> <input_file> <input_file> [...]")
+        sys.exit(2)
+
+    output_file = sys.argv[1]
+    input_files = sys.argv[2:]
+
+    try:
+        parser = ESXParser()
+        plugins = [parser.parse_file(f) for f in input_files]
+        result = merge_plugins(plugins, names=input_files)
+
+        for conflict in result.conflicts:
+            print(f"Conflict: {conflict}")
+
+        is_compatible, form_count, errors = validate_esl_compatibility(result.plugin)
+        print(f"Merged {len(plugins)} plugins")
+        print(f"Total form IDs used: {result.form_id_manager.get_used_count()}")
+        print(f"ESL compatible: {is_compatible} (Used {form_count}/2048 FormIDs)")
+        for error in errors:
+            print(f"  - {error}")
+
+        write_plugin_to_xml(result.plugin, output_file)
+        print(f"Wrote merged plugin to {output_file}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""Plan quest/objective/alias layouts that fit the ESL FormID budget.
+
+Usage:
+    python esx_planner.py <SmartMarkers.toml> [--plugins N] [--budget N] [--exact]
+
+Demand is given per category: how many quests of a kind, how many
+objectives each, and the minimum number of tracked slots (reference
+aliases) per objective. Every quest costs one FormID, plus one for its
+PlayerRef alias, plus one per alias. The planner first checks that the
+minimums fit, packing whole quests into the given number of plugins.
+It then hands out the spare FormIDs one alias per objective at a time,
+in rounds, heavier categories first, until nothing else fits. Categories
+with ``max_aliases`` stop growing at that cap.
+
+From the command line the demand is the ``[Journal.<key>]`` entries of a
+SmartMarkers config, and the plan shows how far each entry's
+``reference_aliases_per_objective`` could be raised.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from esx_lib import (
+    DNAM_STRUCT,
+    ESXElement,
+    ESXPlugin,
+    ESXValidationError,
+    FormIDManager,
+    QuestBuilder,
+)
+
+# 0x800-0xFFF: the object IDs an ESL-flagged plugin may define
+ESL_BUDGET = 0xFFF - 0x800 + 1
+
+# DNAM flags of the generated quests
+DEFAULT_QUEST_FLAGS = 0x0111
+
+
+@dataclass(frozen=True)
+class Category:
+    """Demand for one kind of quest
+
+    ``weight`` is how many alias-per-objective steps the category takes
+    in each round of spare-slot allocation. ``quest_type`` and
+    ``priority`` go into the quests' DNAM when the plan builds them.
+    """
+
+    name: str
+    quests: int = 1
+    objectives: int = 1
+    min_aliases: int = 1
+    max_aliases: Optional[int] = None
+    weight: int = 1
+    quest_type: Optional[int] = None
+    priority: int = 0
+    player_ref: bool = True
+    editor_id_format: str = "SmartMarkers_{name}_{quest_idx:02d}"
+    full_name_format: str = "Smart Markers {name} {quest_idx}"
+    objective_name_format: str = "Objective {objective_index}"
+    target_base_format: str = "Objective{objective_index}"
+
+    def quest_cost(self, aliases_per_objective: int) -> int:
+        """FormIDs one quest of this category uses"""
+        return 1 + self.player_ref + self.objectives * aliases_per_objective
+
+    def editor_id(self, quest_idx: int) -> str:
+        return self.editor_id_format.format(name=self.name, quest_idx=quest_idx)
+
+    def full_name(self, quest_idx: int) -> str:
+        return self.full_name_format.format(name=self.name, quest_idx=quest_idx)
+
+    def objective_name(self, objective_index: int) -> str:
+        return self.objective_name_format.format(objective_index=objective_index)
+
+    def target_base_name(self, objective_index: int) -> str:
+        return self.target_base_format.format(objective_index=objective_index)
+
+
+@dataclass
+class PlannedQuest:
+    """One quest of a plan: its category, number within it, and plugin"""
+
+    category: Category
+    index: int
+    aliases_per_objective: int
+    plugin: int = 0
+
+    @property
+    def form_ids(self) -> int:
+        return self.category.quest_cost(self.aliases_per_objective)
+
+    @property
+    def slots(self) -> int:
+        return self.category.objectives * self.aliases_per_objective
+
+
+@dataclass
+class CapacityPlan:
+    """A solved layout: aliases per objective for each category
+
+    Quests are listed by category, then number; each knows its plugin.
+    """
+
+    categories: List[Category]
+    aliases: Dict[str, int]
+    quests: List[PlannedQuest]
+    plugins: int = 1
+    budget: int = ESL_BUDGET
+    seconds: float = 0.0
+
+    def quests_in(self, plugin: int = 0) -> List[PlannedQuest]:
+        return [quest for quest in self.quests if quest.plugin == plugin]
+
+    def form_ids(self, plugin: int = 0) -> int:
+        return sum(quest.form_ids for quest in self.quests_in(plugin))
+
+    @property
+    def slots(self) -> int:
+        """Tracked slots (target aliases) across all plugins"""
+        return sum(quest.slots for quest in self.quests)
+
+    @property
+    def spare(self) -> int:
+        return self.plugins * self.budget - sum(quest.form_ids for quest in self.quests)
+
+    def summary(self) -> List[str]:
+        lines = []
+        for category in self.categories:
+            aliases = self.aliases[category.name]
+            lines.append(
+                f"{category.name}: {category.quests} x {category.objectives} objectives"
+                f" x {aliases} aliases (min {category.min_aliases})"
+            )
+        for plugin in range(self.plugins):
+            lines.append(
+                f"plugin {plugin + 1}: {len(self.quests_in(plugin))} quests,"
+                f" {self.form_ids(plugin)}/{self.budget} FormIDs"
+            )
+        lines.append(f"{self.slots} tracked slots, {self.spare} FormIDs spare")
+        return lines
+
+    def fill(self, builder: QuestBuilder, quest: PlannedQuest) -> None:
+        """Add a planned quest's objectives and targets to a builder's quest"""
+        category = quest.category
+        for index in range(1, category.objectives + 1):
+            builder.add_objective_with_targets(
+                index=index,
+                name=category.objective_name(index),
+                target_count=quest.aliases_per_objective,
+                target_base_name=category.target_base_name(index),
+            )
+        builder.update_alias_count()
+
+    def build(
+        self,
+        plugin: ESXPlugin,
+        plugin_index: int = 0,
+        form_id_manager: Optional[FormIDManager] = None,
+    ) -> List[QuestBuilder]:
+        """Build one plugin's share of the plan with QuestBuilder"""
+        form_id_manager = form_id_manager or FormIDManager()
+        builders = []
+        for quest in self.quests_in(plugin_index):
+            category = quest.category
+            builder = QuestBuilder(
+                plugin, category.editor_id(quest.index), form_id_manager=form_id_manager
+            )
+            builder.set_quest_name(category.full_name(quest.index))
+            if category.quest_type is not None or category.priority:
+                _set_dnam(builder, category)
+            if category.player_ref:
+                builder.add_player_ref()
+            self.fill(builder, quest)
+            builders.append(builder)
+        return builders
+
+
+def _set_dnam(builder: QuestBuilder, category: Category) -> None:
+    quest = builder.quest
+    if quest.find("DNAM") is not None:
+        return
+    dnam = ESXElement("DNAM")
+    dnam.append(
+        DNAM_STRUCT.encode(
+            {
+                "flags": DEFAULT_QUEST_FLAGS,
+                "priority": category.priority,
+                "unknown0": 0xFF,
+                "unknown1": 0,
+                "type": category.quest_type or 0,
+            }
+        )
+    )
+    full = quest.find("FULL")
+    quest.insert(quest.index_of(full) + 1 if full is not None else len(quest.elements), dnam)
+    quest.quest_flags = f"0x{DEFAULT_QUEST_FLAGS:04x}"
+    quest.priority = category.priority
+
+
+def _pack(
+    categories: Sequence[Category], aliases: Dict[str, int], plugins: int, budget: int
+) -> Optional[List[int]]:
+    """Plugin of each quest (first fit, largest first), or None if they do not fit"""
+    sizes = [
+        category.quest_cost(aliases[category.name])
+        for category in categories
+        for _ in range(category.quests)
+    ]
+    if plugins == 1:
+        return [0] * len(sizes) if sum(sizes) <= budget else None
+    free = [budget] * plugins
+    placement = [0] * len(sizes)
+    for position in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        for plugin in range(plugins):
+            if sizes[position] <= free[plugin]:
+                free[plugin] -= sizes[position]
+                placement[position] = plugin
+                break
+        else:
+            return None
+    return placement
+
+
+def _fits(
+    categories: Sequence[Category], aliases: Dict[str, int], plugins: int, budget: int
+) -> bool:
+    if plugins == 1:
+        # One plugin needs no packing, only the total
+        total = sum(c.quests * c.quest_cost(aliases[c.name]) for c in categories)
+        return total <= budget
+    return _pack(categories, aliases, plugins, budget) is not None
+
+
+def _after_rounds(
+    aliases: Dict[str, int], growing: Sequence[Category], rounds: int
+) -> Dict[str, int]:
+    """Aliases per objective once each growing category has had ``rounds`` rounds"""
+    grown = dict(aliases)
+    for category in growing:
+        steps = category.weight * rounds
+        if category.max_aliases is not None:
+            steps = min(steps, category.max_aliases - aliases[category.name])
+        grown[category.name] += steps
+    return grown
+
+
+def _full_rounds(
+    categories: Sequence[Category],
+    aliases: Dict[str, int],
+    growing: Sequence[Category],
+    plugins: int,
+    budget: int,
+) -> int:
+    """Most whole rounds of growth that still fit, by binary search"""
+    uncapped = [c for c in growing if c.max_aliases is None]
+    if uncapped:
+        # Past this many rounds one category alone outgrows the spare IDs
+        spare = plugins * budget - sum(
+            c.quests * c.quest_cost(aliases[c.name]) for c in categories
+        )
+        high = spare // min(c.weight * c.quests * c.objectives for c in uncapped) + 1
+    else:
+        high = max(
+            -(-(c.max_aliases - aliases[c.name]) // c.weight)  # type: ignore[operator]
+            for c in growing
+        )
+        if _fits(categories, _after_rounds(aliases, growing, high), plugins, budget):
+            return high
+    low = 0  # Always fits: the current layout
+    while high - low > 1:
+        middle = (low + high) // 2
+        if _fits(categories, _after_rounds(aliases, growing, middle), plugins, budget):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def plugins_needed(categories: Sequence[Category], budget: int = ESL_BUDGET) -> Optional[int]:
+    """Fewest plugins the minimum demand packs into, or None if a quest is too big"""
+    aliases = {category.name: category.min_aliases for category in categories}
+    costs = {
+        category.name: category.quest_cost(category.min_aliases) for category in categories
+    }
+    if any(costs[c.name] > budget for c in categories if c.quests):
+        return None
+    total = sum(category.quests * costs[category.name] for category in categories)
+    plugins = max(1, -(-total // budget))
+    while _pack(categories, aliases, plugins, budget) is None:
+        plugins += 1
+    return plugins
+
+
+def plan_capacity(
+    categories: Sequence[Category], plugins: int = 1, budget: int = ESL_BUDGET
+) -> CapacityPlan:
+    """Solve a layout that meets every minimum and uses the spare FormIDs
+
+    Raises:
+        ESXValidationError: if the minimums do not fit in the plugins
+    """
+    start = time.perf_counter()
+    names = [category.name for category in categories]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Category names must be unique: {names}")
+    for category in categories:
+        if category.quests < 0 or category.objectives < 0 or category.min_aliases < 0:
+            raise ValueError(f"{category.name}: counts must not be negative")
+        if category.max_aliases is not None and category.max_aliases < category.min_aliases:
+            raise ValueError(f"{category.name}: max_aliases is below min_aliases")
+    if plugins < 1:
+        raise ValueError("At least one plugin is needed")
+
+    aliases = {category.name: category.min_aliases for category in categories}
+    placement = _pack(categories, aliases, plugins, budget)
+    if placement is None:
+        need = sum(
+            category.quests * category.quest_cost(category.min_aliases)
+            for category in categories
+        )
+        needed = plugins_needed(categories, budget)
+        hint = f"; {needed} plugins would fit it" if needed else ""
+        raise ESXValidationError(
+            f"Demand needs {need} FormIDs, which does not fit in {plugins}"
+            f" plugin(s) of {budget}{hint}"
+        )
+
+    # Hand out spare FormIDs in rounds until no category can grow
+    growing = [
+        category
+        for category in sorted(categories, key=lambda c: -c.weight)
+        if category.quests and category.objectives
+    ]
+    while growing:
+        # Jump ahead by as many whole rounds as fit, then play the next
+        # round one alias at a time to see which categories stop there
+        rounds = _full_rounds(categories, aliases, growing, plugins, budget)
+        aliases = _after_rounds(aliases, growing, rounds)
+        for category in list(growing):
+            for _ in range(category.weight):
+                current = aliases[category.name]
+                if category.max_aliases is not None and current >= category.max_aliases:
+                    growing.remove(category)
+                    break
+                aliases[category.name] = current + 1
+                if not _fits(categories, aliases, plugins, budget):
+                    aliases[category.name] = current
+                    growing.remove(category)
+                    break
+    placement = _pack(categories, aliases, plugins, budget)
+    assert placement is not None
+
+    quests = []
+    position = 0
+    for category in categories:
+        for quest_idx in range(1, category.quests + 1):
+            quests.append(
+                PlannedQuest(category, quest_idx, aliases[category.name], placement[position])
+            )
+            position += 1
+    return CapacityPlan(
+        categories=list(categories),
+        aliases=aliases,
+        quests=quests,
+        plugins=plugins,
+        budget=budget,
+        seconds=time.perf_counter() - start,
+    )
+
+
+def journal_categories(config_file: str, exact: bool = False) -> List[Category]:
+    """Demand from the ``[Journal.<key>]`` entries of a SmartMarkers config"""
+    from esx_watch import load_journal_specs
+
+    categories = []
+    for spec in load_journal_specs(config_file).values():
+        categories.append(
+            Category(
+                name=spec.key,
+                objectives=spec.objective_count,
+                min_aliases=spec.aliases_per_objective,
+                max_aliases=spec.aliases_per_objective if exact else None,
+                editor_id_format=spec.editor_id,
+                full_name_format=spec.name,
+            )
+        )
+    return categories
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    plugins = 1
+    budget = ESL_BUDGET
+    exact = False
+    files: List[str] = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--plugins":
+            plugins = int(args[i + 1])
+            i += 2
+        elif args[i] == "--budget":
+            budget = int(args[i + 1], 0)
+            i += 2
+        elif args[i] == "--exact":
+            exact = True
+            i += 1
+        else:
+            files.append(args[i])
+            i += 1
+
+    if len(files) != 1:
+        print(__doc__)
+        sys.exit(2)
+
+    try:
+        plan = plan_capacity(journal_categories(files[0], exact), plugins, budget)
+    except (ValueError, ESXValidationError) as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+    for line in plan.summary():
+        print(line)
+    print(f"Solved in {plan.seconds * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""Localized string tables (.STRINGS, .DLSTRINGS, .ILSTRINGS) for ESX plugins.
+
+Usage:
+    python esx_strings.py localize <input_file> <output_file> <strings_dir>
+                                   [--plugin NAME] [--language english] [--encoding cp1252]
+    python esx_strings.py delocalize <input_file> <output_file> <strings_dir>
+                                     [--plugin NAME] [--language english] [--encoding cp1252]
+    python esx_strings.py dump <table_file> [--encoding cp1252]
+
+A localized plugin has the 0x80 flag set on its TES4 record. Its display
+text (quest FULL names, objective NNAM text, stage log CNAM entries) is
+replaced by a numeric string ID, written as decimal text. The strings
+themselves live in ``Strings/<Plugin>_<language>.STRINGS`` and friends.
+Each table stores a text only once, so the 28 quests that all say
+"Misc Objective 1" share one entry.
+
+ALID alias names are not localized by the game, so they stay inline.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from esx_lib import (
+    ESXElement,
+    ESXError,
+    ESXInvalidElementError,
+    ESXParser,
+    ESXPlugin,
+    ESXQuest,
+    ESXRecord,
+    write_plugin_to_xml,
+)
+
+LOCALIZED_FLAG = 0x80
+STRING_KINDS = ("STRINGS", "DLSTRINGS", "ILSTRINGS")
+
+# record tag -> {subrecord tag: table}; plain names go to STRINGS, long
+# texts to DLSTRINGS and dialogue to ILSTRINGS
+LOCALIZED_FIELDS: Dict[str, Dict[str, str]] = {
+    "QUST": {"FULL": "STRINGS", "NNAM": "STRINGS", "CNAM": "DLSTRINGS"},
+}
+
+
+class StringsFile(Mapping[int, str]):
+    """One table file, decoded one string at a time on first lookup
+
+    Only the directory (ID -> offset) is read up front.
+    """
+
+    def __init__(self, data: bytes, kind: str = "STRINGS", encoding: str = "cp1252"):
+        if kind not in STRING_KINDS:
+            raise ValueError(f"Unknown string table {kind!r} (known: {', '.join(STRING_KINDS)})")
+        if len(data) < 8:
+            raise ESXError(f"Truncated {kind} table")
+        count, size = struct.unpack_from("<II", data, 0)
+        self._base = 8 + 8 * count
+        if len(data) < self._base + size:
+            raise ESXError(f"Truncated {kind} table: {len(data)} bytes, need {self._base + size}")
+        directory = array("I")
+        directory.frombytes(data[8 : self._base])
+        if sys.byteorder == "big":
+            directory.byteswap()
+        self._offsets = dict(zip(directory[0::2], directory[1::2]))
+        self._data = data
+        self._cache: Dict[int, str] = {}
+        self.kind = kind
+        self.encoding = encoding
+
+    @classmethod
+    def read(
+        cls, filename: str, kind: Optional[str] = None, encoding: str = "cp1252"
+    ) -> "StringsFile":
+        """Load a table file; the kind defaults to the file's extension"""
+        if kind is None:
+            kind = os.path.splitext(filename)[1][1:].upper()
+        with open(filename, "rb") as f:
+            return cls(f.read(), kind, encoding)
+
+    def __getitem__(self, string_id: int) -> str:
+        text = self._cache.get(string_id)
+        if text is None:
+            offset = self._base + self._offsets[string_id]
+            data = self._data
+            if self.kind == "STRINGS":
+                raw = data[offset : data.index(b"\0", offset)]
+            else:
+                (length,) = struct.unpack_from("<I", data, offset)
+                raw = data[offset + 4 : offset + 3 + length]
+            text = self._cache[string_id] = raw.decode(self.encoding)
+        return text
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, string_id: object) -> bool:
+        return string_id in self._offsets
+
+
+def write_strings_file(
+    filename: str, entries: Mapping[int, str], kind: str = "STRINGS", encoding: str = "cp1252"
+) -> None:
+    """Write one table file; equal texts are stored once and shared"""
+    if kind not in STRING_KINDS:
+        raise ValueError(f"Unknown string table {kind!r} (known: {', '.join(STRING_KINDS)})")
+    offsets: Dict[str, int] = {}
+    directory = array("I")
+    data = bytearray()
+    for string_id in sorted(entries):
+        text = entries[string_id]
+        offset = offsets.get(text)
+        if offset is None:
+            offset = offsets[text] = len(data)
+            try:
+                raw = text.encode(encoding)
+            except UnicodeEncodeError as e:
+                raise ESXError(
+                    f"String {string_id} cannot be written as {encoding}: {e}"
+                ) from None
+            if kind != "STRINGS":
+                data += struct.pack("<I", len(raw) + 1)
+            data += raw
+            data += b"\0"
+        directory.extend((string_id, offset))
+    if sys.byteorder == "big":
+        directory.byteswap()
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<II", len(entries), len(data)))
+        f.write(directory.tobytes())
+        f.write(data)
+
+
+def table_file_name(plugin_name: str, language: str, kind: str) -> str:
+    return f"{plugin_name}_{language}.{kind}"
+
+
+class StringTables:
+    """The three string tables of one plugin and language
+
+    ``add`` hands out IDs (unique across the three tables, starting at 1)
+    and returns the existing ID for a text already in that table.
+    """
+
+    def __init__(self) -> None:
+        self.tables: Dict[str, Mapping[int, str]] = {kind: {} for kind in STRING_KINDS}
+        self.next_id = 1
+        # (kind, text) -> ID, built on first add() for loaded tables
+        self._ids: Optional[Dict[Tuple[str, str], int]] = {}
+
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        plugin_name: str,
+        language: str = "english",
+        encoding: str = "cp1252",
+    ) -> "StringTables":
+        """Open a plugin's table files; strings are decoded on lookup
+
+        A missing file counts as an empty table.
+        """
+        tables = cls()
+        for kind in STRING_KINDS:
+            filename = os.path.join(directory, table_file_name(plugin_name, language, kind))
+            if os.path.exists(filename):
+                table = StringsFile.read(filename, kind, encoding)
+                tables.tables[kind] = table
+                tables.next_id = max(tables.next_id, max(table, default=0) + 1)
+        tables._ids = None
+        return tables
+
+    def add(self, text: str, kind: str = "STRINGS") -> int:
+        """ID of text in the given table, adding it if needed"""
+        ids = self._ids if self._ids is not None else self._index()
+        string_id = ids.get((kind, text))
+        if string_id is None:
+            table = self.tables[kind]
+            if not isinstance(table, dict):
+                table = self.tables[kind] = dict(table)
+            string_id = ids[(kind, text)] = self.next_id
+            table[string_id] = text
+            self.next_id += 1
+        return string_id
+
+    def _index(self) -> Dict[Tuple[str, str], int]:
+        ids: Dict[Tuple[str, str], int] = {}
+        for kind, table in self.tables.items():
+            for string_id in sorted(table):
+                ids.setdefault((kind, table[string_id]), string_id)
+        self._ids = ids
+        return ids
+
+    def get(self, string_id: int, kind: str = "STRINGS") -> Optional[str]:
+        """Text of an ID, or None if the table does not have it"""
+        return self.tables[kind].get(string_id)
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables.values())
+
+    def write(
+        self,
+        directory: str,
+        plugin_name: str,
+        language: str = "english",
+        encoding: str = "cp1252",
+    ) -> List[str]:
+        """Write all three table files (the game expects each to exist)"""
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        for kind in STRING_KINDS:
+            filename = os.path.join(directory, table_file_name(plugin_name, language, kind))
+            write_strings_file(filename, self.tables[kind], kind, encoding)
+            written.append(filename)
+        return written
+
+
+def _tes4_flags(plugin: ESXPlugin) -> int:
+    if plugin.tes4 is None:
+        raise ESXInvalidElementError("Plugin has no TES4 header")
+    return int(plugin.tes4.attrib.get("flags", "0x00000000"), 16)
+
+
+def is_localized(plugin: ESXPlugin) -> bool:
+    return bool(_tes4_flags(plugin) & LOCALIZED_FLAG)
+
+
+def set_localized(plugin: ESXPlugin, localized: bool = True) -> None:
+    """Set or clear the localized flag on the plugin's TES4 record"""
+    flags = _tes4_flags(plugin)
+    flags = flags | LOCALIZED_FLAG if localized else flags & ~LOCALIZED_FLAG
+    tes4 = plugin.tes4
+    assert tes4 is not None
+    tes4.touch()
+    tes4.attrib["flags"] = f"0x{flags:08x}"
+
+
+def _localized_fields(
+    plugin: ESXPlugin,
+) -> Iterator[Tuple[ESXRecord, List[Tuple[ESXElement, str]]]]:
+    """(record, [(field element, table)]) for records with localizable fields"""
+    for group in plugin.groups:
+        for record in group.records:
+            fields = LOCALIZED_FIELDS.get(record.tag)
+            if not fields:
+                continue
+            found = [
+                (child, fields[child.tag]) for child in record.elements if child.tag in fields
+            ]
+            if found:
+                yield record, found
+
+
+def localize_plugin(plugin: ESXPlugin, tables: Optional[StringTables] = None) -> StringTables:
+    """Move display text into string tables, in place, and set the flag
+
+    Returns:
+        The tables, with the plugin's strings added
+    """
+    if is_localized(plugin):
+        raise ESXError("Plugin is already localized")
+    tables = tables if tables is not None else StringTables()
+    for record, fields in _localized_fields(plugin):
+        for element, kind in fields:
+            if element.text:
+                element.touch()
+                element.text = str(tables.add(element.text, kind))
+        if isinstance(record, ESXQuest):
+            record.invalidate()
+    set_localized(plugin, True)
+    return tables
+
+
+def delocalize_plugin(plugin: ESXPlugin, tables: StringTables) -> int:
+    """Put the text from the tables back inline, in place, and clear the flag
+
+    Returns:
+        Number of strings resolved
+    """
+    if not is_localized(plugin):
+        raise ESXError("Plugin is not localized")
+    resolved = 0
+    for record, fields in _localized_fields(plugin):
+        for element, kind in fields:
+            text = element.text
+            if not text:
+                continue
+            try:
+                string_id = int(text)
+            except ValueError:
+                raise ESXError(f"{record.editor_id}: {element.tag} is not a string ID: {text!r}")
+            value = tables.get(string_id, kind) if string_id else ""
+            if value is None:
+                raise ESXError(
+                    f"{record.editor_id}: string {string_id} is missing from {kind}"
+                )
+            element.touch()
+            element.text = value or None
+            resolved += 1
+        if isinstance(record, ESXQuest):
+            record.invalidate()
+    set_localized(plugin, False)
+    return resolved
+
+
+def plugin_base_name(filename: str) -> str:
+    """Plugin name used in table file names: the file name without extensions"""
+    name = os.path.basename(filename)
+    while True:
+        stem, extension = os.path.splitext(name)
+        if not extension:
+            return name
+        name = stem
+
+
+def main() -> None:
+    """Main entry point"""
+    args = sys.argv[1:]
+    if not args or args[0] not in ("localize", "delocalize", "dump"):
+        print(__doc__)
+        sys.exit(2)
+
+    command = args[0]
+    plugin_name = None
+    language = "english"
+    encoding = "cp1252"
+    files: List[str] = []
+    i = 1
+    while i < len(args):
+        if args[i] == "--plugin":
+            plugin_name = args[i + 1]
+            i += 2
+        elif args[i] == "--language":
+            language = args[i + 1]
+            i += 2
+        elif args[i] == "--encoding":
+            encoding = args[i + 1]
+            i += 2
+        else:
+            files.append(args[i])
+            i += 1
+
+    try:
+        if command == "dump":
+            if len(files) != 1:
+                print(__doc__)
+                sys.exit(2)
+            table = StringsFile.read(files[0], encoding=encoding)
+            for string_id in sorted(table):
+                print(f"{string_id}\t{table[string_id]!r}")
+            return
+
+        if len(files) != 3:
+            print(__doc__)
+            sys.exit(2)
+        input_file, output_file, strings_dir = files
+        plugin = ESXParser().parse_file(input_file)
+        if command == "localize":
+            name = plugin_name or plugin_base_name(output_file)
+            tables = localize_plugin(plugin)
+            written = tables.write(strings_dir, name, language, encoding)
+            write_plugin_to_xml(plugin, output_file)
+            print(f"Localized {len(tables)} strings into {', '.join(written)}")
+        else:
+            name = plugin_name or plugin_base_name(input_file)
+            tables = StringTables.load(strings_dir, name, language, encoding)
+            count = delocalize_plugin(plugin, tables)
+            write_plugin_to_xml(plugin, output_file)
+            print(f"Resolved {count} strings from {strings_dir}")
+        print(f"Wrote {output_file}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Rebuild the SmartMarkers plugin incrementally while its TOML config changes.
+
+Usage:
+    python esx_watch.py <SmartMarkers.toml> <output_file> [--interval SECONDS]
+                        [--pretty | --canonical] [--once] [--ids formids.json]
+
+The built plugin and its FormIDManager stay in memory. Each time the config
+file changes, only the ``[Journal.<key>]`` entries that differ are updated:
+objectives and target aliases are added or removed in place, existing ones
+keep their FormIDs, and freed IDs go back to the pool. The output is then
+rewritten atomically; with ``--canonical`` it is only replaced when its
+content changed. With ``--ids`` the FormID assignment map is loaded at
+start and saved after each rebuild, so IDs also survive restarts.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import time
+import tomllib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from esx_lib import (
+    HEDR_STRUCT,
+    ESXTES4,
+    ESXElement,
+    ESXError,
+    ESXPlugin,
+    FormID,
+    FormIDManager,
+    QuestBuilder,
+    Transaction,
+    atomic_write,
+    compression_for,
+    configure_logging,
+    extract_log_args,
+    write_plugin_to_xml,
+)
+
+logger = logging.getLogger("esx.watch")
+
+
+@dataclass(frozen=True)
+class JournalSpec:
+    """The parts of a [Journal.<key>] table that shape the plugin"""
+
+    key: str
+    editor_id: str
+    name: str
+    objective_count: int
+    aliases_per_objective: int
+
+
+def load_journal_specs(config_file: str) -> Dict[str, JournalSpec]:
+    """Read the journal entries that this plugin defines from the TOML config
+
+    Entries whose ``quest`` points into another plugin (``[file, formid]``)
+    are skipped.
+    """
+    with open(config_file, "rb") as f:
+        config = tomllib.load(f)
+
+    specs = {}
+    for key, journal in config.get("Journal", {}).items():
+        quest = journal.get("quest", f"SmartMarkers_{key}")
+        if not isinstance(quest, str):
+            continue
+        specs[key] = JournalSpec(
+            key=key,
+            editor_id=quest,
+            name=journal.get("name", key),
+            objective_count=int(journal.get("objective_count", 0)),
+            aliases_per_objective=int(journal.get("reference_aliases_per_objective", 0)),
+        )
+    return specs
+
+
+def _objective_name(index: int) -> str:
+    return f"Objective {index}"
+
+
+def _target_base_name(index: int) -> str:
+    return f"Objective{index}"
+
+
+class WatchSession:
+    """An in-memory plugin kept in sync with a set of journal specs"""
+
+    def __init__(
+        self,
+        start_id: int = 0x800,
+        end_id: int = 0xFFF,
+        assignments_file: Optional[str] = None,
+    ):
+        self.form_id_manager = FormIDManager(start_id, end_id)
+        self.assignments_file = assignments_file
+        if assignments_file:
+            self.form_id_manager.load_assignments(assignments_file)
+        self.plugin = ESXPlugin(tag="plugin", attrib={"version": "0.7.4"})
+        tes4 = ESXTES4(tag="TES4")
+        hedr = ESXElement("HEDR")
+        hedr.append(
+            HEDR_STRUCT.encode(
+                {"version": 1.71000004, "numRecords": 0, "nextObjectID": 0x800}
+            )
+        )
+        tes4.append(hedr)
+        tes4.append(ESXElement("CNAM", text="DEFAULT"))
+        tes4.add_master("Skyrim.esm")
+        tes4.append(ESXElement("INTV", text="1"))
+        self.plugin.add_tes4(tes4)
+        self.plugin.get_or_create_group("QUST")
+
+        self.specs: Dict[str, JournalSpec] = {}
+        self.builders: Dict[str, QuestBuilder] = {}
+
+    def apply(self, specs: Dict[str, JournalSpec]) -> List[str]:
+        """Bring the plugin in line with specs, returning what changed
+
+        All or nothing: if a step fails, the plugin, its FormIDs and the
+        builders are rolled back to how they were before the call.
+        """
+        builders = dict(self.builders)
+        try:
+            with Transaction():
+                return self._apply(specs)
+        except BaseException:
+            self.builders = builders
+            raise
+
+    def _apply(self, specs: Dict[str, JournalSpec]) -> List[str]:
+        changes = []
+        for key in [k for k in self.specs if k not in specs]:
+            self._remove_journal(key)
+            changes.append(f"removed journal {key}")
+        for key, spec in specs.items():
+            old = self.specs.get(key)
+            if old is None:
+                self._add_journal(spec)
+                changes.append(f"added journal {key}")
+            elif old != spec:
+                changes.extend(self._update_journal(old, spec))
+        # IDs loaded for aliases the specs no longer define are free again
+        self.form_id_manager.release_unclaimed()
+        self.specs = dict(specs)
+        if changes:
+            self._update_header()
+        return changes
+
+    def _add_journal(self, spec: JournalSpec) -> None:
+        builder = QuestBuilder(
+            self.plugin, spec.editor_id, form_id_manager=self.form_id_manager
+        )
+        builder.set_quest_name(spec.name)
+        builder.add_player_ref()
+        for index in range(1, spec.objective_count + 1):
+            builder.add_objective_with_targets(
+                index=index,
+                name=_objective_name(index),
+                target_count=spec.aliases_per_objective,
+                target_base_name=_target_base_name(index),
+            )
+        builder.update_alias_count()
+        self.builders[spec.key] = builder
+
+    def _remove_journal(self, key: str) -> None:
+        builder = self.builders.pop(key)
+        group = self.plugin.get_or_create_group("QUST")
+        group.remove_record(builder.quest)
+        self.form_id_manager.release_ids([builder.quest_form_id, *builder.aliases])
+
+    def _update_journal(self, old: JournalSpec, new: JournalSpec) -> List[str]:
+        if old.editor_id != new.editor_id:
+            # A different quest: rebuild it from scratch
+            self._remove_journal(old.key)
+            self._add_journal(new)
+            return [f"rebuilt journal {new.key} as {new.editor_id}"]
+
+        builder = self.builders[new.key]
+        quest = builder.quest
+        changes = []
+        if old.name != new.name:
+            builder.set_quest_name(new.name)
+            changes.append(f"{new.key}: renamed to {new.name!r}")
+
+        # Drop objectives beyond the new count, with their aliases
+        dropped = list(range(new.objective_count + 1, old.objective_count + 1))
+        if dropped:
+            freed = [
+                int(target["alias"])  # type: ignore[arg-type]
+                for objective in quest.objectives
+                if objective.index in dropped
+                for target in objective.targets
+            ]
+            quest.remove_objectives(dropped)
+            self._release_aliases(builder, freed)
+            changes.append(f"{new.key}: removed objectives {dropped[0]}-{dropped[-1]}")
+
+        # Resize the objectives that remain
+        kept = min(old.objective_count, new.objective_count)
+        if new.aliases_per_objective < old.aliases_per_objective:
+            freed = [
+                int(target["alias"])  # type: ignore[arg-type]
+                for objective in quest.objectives
+                if objective.index <= kept
+                for target in objective.targets[new.aliases_per_objective :]
+            ]
+            quest.remove_aliases(freed)
+            self._release_aliases(builder, freed)
+        elif new.aliases_per_objective > old.aliases_per_objective:
+            extra = new.aliases_per_objective - old.aliases_per_objective
+            builder.add_targets(
+                {index: extra for index in range(1, kept + 1)},
+                {index: _target_base_name(index) for index in range(1, kept + 1)},
+            )
+        if kept and new.aliases_per_objective != old.aliases_per_objective:
+            changes.append(
+                f"{new.key}: {old.aliases_per_objective} -> "
+                f"{new.aliases_per_objective} aliases per objective"
+            )
+
+        # Append new objectives
+        added = range(old.objective_count + 1, new.objective_count + 1)
+        for index in added:
+            builder.add_objective_with_targets(
+                index=index,
+                name=_objective_name(index),
+                target_count=new.aliases_per_objective,
+                target_base_name=_target_base_name(index),
+            )
+        if added:
+            changes.append(f"{new.key}: added objectives {added[0]}-{added[-1]}")
+
+        builder.update_alias_count()
+        return changes
+
+    def _release_aliases(self, builder: QuestBuilder, alias_ids: List[int]) -> None:
+        for alias_id in alias_ids:
+            builder.aliases.pop(alias_id, None)
+        self.form_id_manager.release_ids(alias_ids)
+
+    def _update_header(self) -> None:
+        hedr = self.plugin.tes4.find("HEDR") if self.plugin.tes4 else None
+        struct = hedr.find("struct") if hedr else None
+        if struct is None:
+            return
+        used = self.form_id_manager.used_ids
+        struct.touch()
+        struct.attrib["numRecords"] = str(len(self.builders))
+        struct.attrib["nextObjectID"] = FormID(max(used, default=0x7FF) + 1).hex8
+
+    def write(
+        self, output_file: str, pretty: bool = False, canonical: bool = False
+    ) -> None:
+        """Write the plugin via a temporary file and an atomic rename
+
+        The output keeps the permission bits of the file it replaces.
+        """
+        if canonical:
+            # Atomic on its own, and skipped when nothing changed
+            write_plugin_to_xml(self.plugin, output_file, canonical=True)
+            if self.assignments_file:
+                self.form_id_manager.save_assignments(self.assignments_file)
+            return
+        with atomic_write(output_file) as temp_file:
+            write_plugin_to_xml(
+                self.plugin,
+                temp_file,
+                pretty=pretty,
+                compression=compression_for(output_file) or "none",
+            )
+        if self.assignments_file:
+            self.form_id_manager.save_assignments(self.assignments_file)
+
+
+def _file_state(path: str) -> Optional[Any]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watch(
+    config_file: str,
+    output_file: str,
+    interval: float = 0.5,
+    pretty: bool = False,
+    once: bool = False,
+    assignments_file: Optional[str] = None,
+    canonical: bool = False,
+) -> None:
+    """Build once, then poll the config and apply changes until interrupted"""
+    session = WatchSession(assignments_file=assignments_file)
+    last_state = None
+    while True:
+        state = _file_state(config_file)
+        if state is not None and state != last_state:
+            last_state = state
+            start = time.perf_counter()
+            try:
+                specs = load_journal_specs(config_file)
+            except (tomllib.TOMLDecodeError, ValueError) as e:
+                # Keep the last good build while the file is mid-edit
+                print(f"Config error, keeping previous build: {e}")
+            else:
+                try:
+                    changes = session.apply(specs)
+                except ESXError as e:
+                    # apply() rolled back, so the session still matches the output
+                    print(f"Build error, keeping previous build: {e}")
+                    changes = []
+                if changes:
+                    session.write(output_file, pretty=pretty, canonical=canonical)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    print(
+                        f"Rebuilt {output_file} in {elapsed:.1f} ms"
+                        f" ({session.form_id_manager.get_used_count()} form IDs)"
+                    )
+                    for change in changes:
+                        logger.info("%s", change)
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main() -> None:
+    """Main entry point"""
+    args, log_options = extract_log_args(sys.argv[1:])
+    configure_logging(log_options)
+
+    interval = 0.5
+    pretty = False
+    once = False
+    canonical = False
+    assignments_file = None
+    files: List[str] = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--interval":
+            interval = float(args[i + 1])
+            i += 2
+        elif args[i] == "--pretty":
+            pretty = True
+            i += 1
+        elif args[i] == "--canonical":
+            canonical = True
+            i += 1
+        elif args[i] == "--ids":
+            assignments_file = args[i + 1]
+            i += 2
+        elif args[i] == "--once":
+            once = True
+            i += 1
+        else:
+            files.append(args[i])
+            i += 1
+
+    if len(files) != 2:
+        print(__doc__)
+        sys.exit(2)
+
+    try:
+        if once:
+            print(f"Building from {files[0]}")
+        else:
+            print(f"Watching {files[0]} (Ctrl+C to stop)")
+        watch(
+            files[0],
+            files[1],
+            interval=interval,
+            pretty=pretty,
+            once=once,
+            assignments_file=assignments_file,
+            canonical=canonical,
+        )
+    except KeyboardInterrupt:
+        print("\nStopped")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
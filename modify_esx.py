@@ -1,3 +1,4 @@
+import logging
 import sys
 from typing import Optional
 
@@ -7,13 +8,32 @@ from esx_lib import (
     ESXQuest,
     FormIDManager,
     QuestBuilder,
+    configure_logging,
+    extract_log_args,
+    extract_profile_args,
+    profiling,
+    report_counters,
     validate_esl_compatibility,
     write_plugin_to_xml,
 )
+from esx_planner import Category, plan_capacity
 
+logger = logging.getLogger("esx.modify")
 
-def modify_esx_file(input_file: str, output_file: str) -> bool:
-    """Apply the specified modifications to the ESX file"""
+# The journal quest's objectives, and the reference aliases SmartMarkers.toml
+# tracks for each; the planner adds any that still fit
+OBJECTIVE_COUNT = 20
+MIN_ALIASES_PER_OBJECTIVE = 100
+
+
+def modify_esx_file(
+    input_file: str, output_file: str, assignments_file: Optional[str] = None
+) -> bool:
+    """Apply the specified modifications to the ESX file
+
+    With ``assignments_file``, FormIDs are taken from (and saved back to) a
+    persistent map keyed by quest editor ID and alias name.
+    """
     parser = ESXParser()
     plugin = parser.parse_file(input_file)
 
@@ -26,68 +46,71 @@ def modify_esx_file(input_file: str, output_file: str) -> bool:
                     break
 
     if not quest_record:
-        print("Error: No quest record found in the plugin")
+        logger.error("No quest record found in the plugin")
         return False
 
-    modify_quest_using_builder(plugin, quest_record)
+    form_manager = None
+    if assignments_file:
+        form_manager = FormIDManager(0x800, 0xFFF)
+        form_manager.load_assignments(assignments_file)
+
+    modify_quest_using_builder(plugin, quest_record, form_manager)
     write_plugin_to_xml(plugin, output_file, pretty=True)
+
+    if form_manager is not None and assignments_file:
+        form_manager.release_unclaimed()
+        form_manager.save_assignments(assignments_file)
     return True
 
 
-def modify_quest_using_builder(plugin: ESXPlugin, quest: ESXQuest) -> None:
+def modify_quest_using_builder(
+    plugin: ESXPlugin, quest: ESXQuest, form_id_manager: Optional[FormIDManager] = None
+) -> None:
     """Apply modifications to a quest record using the QuestBuilder"""
-    print(f"Modifying quest: {quest.editor_id}")
+    logger.info("Modifying quest: %s", quest.editor_id)
 
     # Step 1: Set up form ID manager and preserve essential elements
     form_manager = FormIDManager(0x800, 0xFFF)
     quest_id = form_manager.reserve_id(0x800)
 
     # Create a new QuestBuilder instance
-    builder = QuestBuilder(plugin, quest.editor_id or "SmartMarkersQuest", "00000800")
+    builder = QuestBuilder(
+        plugin,
+        quest.editor_id or "SmartMarkersQuest",
+        "00000800",
+        form_id_manager=form_id_manager,
+    )
 
     # Set the quest name
     builder.set_quest_name("Smart Markers")
 
     # Add player reference alias
     player_ref_id = builder.add_player_ref()
-    print(f"Added PlayerRef alias (0x{player_ref_id:x})")
-
-    # Step 2: Calculate number of objectives and aliases per objective
-    # Staying within ESL constraints
-    max_aliases = 2046  # Max aliases we can have (2048 - 2)
-    num_objectives = 20
-    aliases_per_objective = 100
-    total_aliases = num_objectives * aliases_per_objective + 1  # +1 for PlayerRef
-
-    if total_aliases > max_aliases:
-        print(
-            f"Warning: Total aliases ({total_aliases}) exceeds ESL limit. Adjusting..."
-        )
-        num_objectives = 20
-        aliases_per_objective = (
-            100  # 20*100 = 2000 aliases (+ quest + playerref = 2002 form IDs)
-        )
-        total_aliases = num_objectives * aliases_per_objective + 1
-
-    print(
-        f"Creating {num_objectives} objectives with {aliases_per_objective} aliases each"
+    logger.info("Added PlayerRef alias (0x%x)", player_ref_id)
+
+    # Step 2: Size the objectives to fill the ESL FormID budget, with at
+    # least the slots SmartMarkers.toml tracks per objective
+    plan = plan_capacity(
+        [
+            Category(
+                "journal",
+                objectives=OBJECTIVE_COUNT,
+                min_aliases=MIN_ALIASES_PER_OBJECTIVE,
+            )
+        ]
+    )
+    planned = plan.quests[0]
+    logger.info(
+        "Creating %d objectives with %d aliases each (%d aliases total)",
+        OBJECTIVE_COUNT,
+        planned.aliases_per_objective,
+        planned.slots + 1,  # +1 for PlayerRef
     )
-    print(f"Total alias count: {total_aliases}")
-
-    # Step 3: Use QuestBuilder to create objectives with targets
-    for obj_index in range(1, num_objectives + 1):
-        print(f"Adding objective {obj_index} with {aliases_per_objective} targets")
-        result = builder.add_objective_with_targets(
-            index=obj_index,
-            name=f"Objective {obj_index}",
-            target_count=aliases_per_objective,
-            target_base_name=f"Objective{obj_index}",
-        )
 
-    # Step 4: Update alias count
-    builder.update_alias_count()
+    # Step 3: Create the objectives with targets, and update the alias count
+    plan.fill(builder, planned)
 
-    # Step 5: Get summary of form ID usage
+    # Step 4: Get summary of form ID usage
     summary = builder.get_form_id_summary()
 
     print("\nForm ID allocation summary:")
@@ -107,23 +130,46 @@ def modify_quest_using_builder(plugin: ESXPlugin, quest: ESXQuest) -> None:
 
 
 def main() -> None:
-    if len(sys.argv) < 3:
-        print("Usage: python modify_esx.py <input_file> <output_file>")
-        return
+    args, profile_options = extract_profile_args(sys.argv[1:])
+    args, log_options = extract_log_args(args)
+    assignments_file = None
+    files = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--ids" and i + 1 < len(args):
+            assignments_file = args[i + 1]
+            i += 2
+        else:
+            files.append(args[i])
+            i += 1
+    if len(files) < 2:
+        print(
+            "Usage: python modify_esx.py <input_file> <output_file> [--ids formids.json]"
+            " [-v|-vv|-q] [--counters[=FILE]]"
+            " [--profile] [--profile-memory] [--cprofile[=FILE]]"
+        )
+        sys.exit(2)
+    configure_logging(log_options)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file = files[0]
+    output_file = files[1]
 
     try:
-        if modify_esx_file(input_file, output_file):
-            print(f"Successfully modified {input_file} and saved to {output_file}")
-        else:
-            print("Modification failed")
+        with profiling(profile_options):
+            succeeded = modify_esx_file(input_file, output_file, assignments_file)
+            if succeeded:
+                print(f"Successfully modified {input_file} and saved to {output_file}")
+            else:
+                print("Modification failed")
+        report_counters(log_options)
+        if not succeeded:
+            sys.exit(1)
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
 
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == "__main__":
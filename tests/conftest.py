@@ -0,0 +1,64 @@
+"""Shared fixtures: small plugins built the way the generators build them"""
+
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import pytest
+
+from esx_lib import HEDR_STRUCT, ESXTES4, ESXElement, ESXPlugin, FormIDManager, QuestBuilder
+
+# Editor ID -> (objectives, aliases per objective)
+QuestShape = Dict[str, Tuple[int, int]]
+
+
+def build_plugin(
+    quests: QuestShape, form_id_manager: Optional[FormIDManager] = None
+) -> Tuple[ESXPlugin, FormIDManager]:
+    """An ESL-range plugin with one QuestBuilder quest per entry"""
+    form_id_manager = form_id_manager or FormIDManager(0x800, 0xFFF)
+    plugin = ESXPlugin(tag="plugin", attrib={"version": "0.7.4"})
+    tes4 = ESXTES4(tag="TES4")
+    hedr = ESXElement("HEDR")
+    hedr.append(
+        HEDR_STRUCT.encode({"version": 1.71000004, "numRecords": 0, "nextObjectID": 0x800})
+    )
+    tes4.append(hedr)
+    tes4.append(ESXElement("CNAM", text="DEFAULT"))
+    tes4.add_master("Skyrim.esm")
+    tes4.append(ESXElement("INTV", text="1"))
+    plugin.add_tes4(tes4)
+    for editor_id, (objectives, aliases) in quests.items():
+        builder = QuestBuilder(plugin, editor_id, form_id_manager=form_id_manager)
+        builder.set_quest_name(f"{editor_id} Name")
+        builder.add_player_ref()
+        for index in range(1, objectives + 1):
+            builder.add_objective_with_targets(
+                index=index,
+                name=f"Objective {index}",
+                target_count=aliases,
+                target_base_name=f"Objective{index}",
+            )
+        builder.update_alias_count()
+    return plugin, form_id_manager
+
+
+@pytest.fixture
+def make_plugin() -> Callable[..., Tuple[ESXPlugin, FormIDManager]]:
+    return build_plugin
+
+
+def build_vmad(alias_scripts: Sequence[Tuple[int, str]]) -> ESXElement:
+    """A quest VMAD with a quest script and one script per (alias ID, name)"""
+    vmad = ESXElement("VMAD")
+    vmad.append(ESXElement("script", {"name": "SmartMarkersQuestScript", "status": "0"}))
+    fragments = ESXElement("fragments")
+    for alias_id, name in alias_scripts:
+        alias = ESXElement("alias", {"object": str(alias_id)})
+        alias.append(ESXElement("script", {"name": name, "status": "0"}))
+        fragments.append(alias)
+    vmad.append(fragments)
+    return vmad
+
+
+@pytest.fixture
+def make_vmad() -> Callable[..., ESXElement]:
+    return build_vmad
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from esx_batch import expand_inputs, make_jobs, run_batch
+from esx_lib import write_plugin_to_xml
+
+
+@pytest.fixture
+def variants(make_plugin, tmp_path):
+    """SmartMarkers.esx in two load-order directories, with different content"""
+    paths = []
+    for name, aliases in (("a", 2), ("b", 3)):
+        os.makedirs(tmp_path / name)
+        plugin, _ = make_plugin({"SmartMarkers_Journal": (1, aliases)})
+        path = tmp_path / name / "SmartMarkers.esx"
+        write_plugin_to_xml(plugin, str(path))
+        paths.append(str(path))
+    return paths
+
+
+def test_same_named_inputs_get_separate_outputs(variants, tmp_path):
+    out = tmp_path / "out"
+    jobs = make_jobs(variants, str(out))
+    assert [job.output_file for job in jobs] == [
+        str(out / "a" / "SmartMarkers.esx"),
+        str(out / "b" / "SmartMarkers.esx"),
+    ]
+
+    results = list(run_batch(jobs, workers=1))
+    assert all(result.ok and result.written for result in results)
+    assert [result.aliases for result in results] == [3, 4]
+    assert (out / "a" / "SmartMarkers.esx").read_bytes() != (
+        out / "b" / "SmartMarkers.esx"
+    ).read_bytes()
+
+
+def test_inputs_from_one_directory_keep_their_names(variants, tmp_path):
+    jobs = make_jobs(expand_inputs([os.path.dirname(variants[0])]), str(tmp_path / "out"))
+    assert [job.output_file for job in jobs] == [str(tmp_path / "out" / "SmartMarkers.esx")]
+
+
+def test_out_onto_inputs_is_refused(variants, tmp_path):
+    with pytest.raises(ValueError, match="overwrite an input"):
+        make_jobs([variants[0]], os.path.dirname(variants[0]))
+
+
+def test_same_file_twice_is_refused(variants, tmp_path):
+    again = os.path.join(os.path.dirname(variants[0]), ".", "SmartMarkers.esx")
+    with pytest.raises(ValueError, match="would both be written"):
+        make_jobs([variants[0], again], str(tmp_path / "out"))
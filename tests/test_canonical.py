@@ -0,0 +1,49 @@
+import os
+
+from esx_lib import ESXElement, ESXParser, write_plugin_to_xml
+
+
+def _write_twice(plugin, path):
+    assert write_plugin_to_xml(plugin, str(path), canonical=True)
+    stat = os.stat(path)
+    assert not write_plugin_to_xml(plugin, str(path), canonical=True)
+    return stat
+
+
+def test_unchanged_plugin_is_not_rewritten(make_plugin, tmp_path):
+    plugin, _ = make_plugin({"SmartMarkers_A": (2, 3)})
+    path = tmp_path / "plugin.esx"
+    first = _write_twice(plugin, path)
+    os.chmod(path, 0o640)
+
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (first.st_ino, first.st_mtime_ns)
+    assert sorted(os.listdir(tmp_path)) == ["plugin.esx"]
+
+    quest = plugin.groups[0].records[0]
+    quest.append(ESXElement("ANAM", text="7"))
+    assert write_plugin_to_xml(plugin, str(path), canonical=True)
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(tmp_path)) == ["plugin.esx"]
+
+
+def test_canonical_form_ignores_source_formatting(make_plugin, tmp_path):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 3), "SmartMarkers_B": (1, 2)})
+    compact, pretty = tmp_path / "compact.esx", tmp_path / "pretty.esx"
+    write_plugin_to_xml(plugin, str(compact))
+    write_plugin_to_xml(plugin, str(pretty), pretty=True)
+
+    target = tmp_path / "canonical.esx"
+    assert write_plugin_to_xml(ESXParser().parse_file(str(compact)), str(target), canonical=True)
+    # Re-reading the canonical file, or the pretty-printed one, changes nothing
+    for source in (target, pretty):
+        parsed = ESXParser().parse_file(str(source))
+        assert not write_plugin_to_xml(parsed, str(target), canonical=True)
+
+
+def test_compressed_files_compare_their_content(make_plugin, tmp_path):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 2)})
+    path = tmp_path / "plugin.esx.gz"
+    _write_twice(plugin, path)
+    parsed = ESXParser().parse_file(str(path))
+    assert not write_plugin_to_xml(parsed, str(path), canonical=True)
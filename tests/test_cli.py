@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def esx(*args, cwd=None):
+    return subprocess.run(
+        [sys.executable, str(ROOT / "esx_cli.py"), *map(str, args)],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+    )
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        ["modify", "nope.esx", "out.esx"],
+        ["merge", "out.esx", "nope1.esx", "nope2.esx"],
+        ["compact", "nope.esx", "out.esx"],
+        ["summarize", "nope.esx"],
+        ["validate", "nope.esx"],
+    ],
+)
+def test_missing_input_fails(command, tmp_path):
+    result = esx(*command, cwd=tmp_path)
+    assert result.returncode == 1, result.stdout
+    assert "Error" in result.stdout + result.stderr
+    assert not (tmp_path / "out.esx").exists()
+
+
+def test_generate_fails_on_unwritable_output(tmp_path):
+    result = esx("generate", tmp_path / "missing" / "out.esx", cwd=tmp_path)
+    assert result.returncode == 1
+
+
+def test_generate_succeeds(tmp_path):
+    result = esx("generate", "out.esx", cwd=tmp_path)
+    assert result.returncode == 0, result.stdout
+    assert (tmp_path / "out.esx").exists()
+
+
+def test_unknown_command():
+    assert esx("nope").returncode == 2
+
+
+def test_validate_skips_unneeded_imports(make_plugin, tmp_path):
+    from esx_lib import write_plugin_to_xml
+
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 3)})
+    path = tmp_path / "plugin.esx"
+    write_plugin_to_xml(plugin, str(path))
+    script = (
+        "import sys, esx_cli\n"
+        f"assert esx_cli.run('validate', [{str(path)!r}]) == 0\n"
+        "print(sorted({'gzip', 'logging', 'lzma'} & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "[]"
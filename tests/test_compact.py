@@ -0,0 +1,118 @@
+import pytest
+
+from esx_compact import compact_form_ids, largest_free_run
+from esx_lib import ESXError, FormIDManager, QuestBuilder, Transaction
+from esx_merge import defined_form_ids
+
+
+def _defined(plugin):
+    return sorted(
+        form_id
+        for group in plugin.groups
+        for record in group.records
+        for form_id in defined_form_ids(record)
+    )
+
+
+def _hollow_plugin(make_plugin):
+    """Quests A and B with A removed and its IDs freed: a 5-ID hole at 0x800"""
+    plugin, manager = make_plugin({"SmartMarkers_A": (1, 3), "SmartMarkers_B": (1, 3)})
+    group = plugin.groups[0]
+    quest_a = group.records[0]
+    freed = defined_form_ids(quest_a)
+    group.remove_record(quest_a)
+    manager.release_ids(freed)
+    return plugin, manager
+
+
+def test_compact_fills_holes(make_plugin):
+    plugin, manager = _hollow_plugin(make_plugin)
+    mapping = compact_form_ids(plugin, form_id_manager=manager)
+
+    assert _defined(plugin) == list(range(0x800, 0x805))
+    assert mapping[0x805] == 0x800
+    assert set(manager.used_ids) == set(range(0x800, 0x805))
+    assert largest_free_run(_defined(plugin)) == 0xFFF - 0x804
+    struct = plugin.tes4.find("HEDR").find("struct")
+    assert struct.attrib["nextObjectID"] == "00000805"
+    quest = plugin.groups[0].records[0]
+    targets = {target["alias"] for o in quest.objectives for target in o.targets}
+    assert targets == {0x802, 0x803, 0x804}
+
+
+def test_allocations_after_compaction_roll_back(make_plugin):
+    plugin, manager = _hollow_plugin(make_plugin)
+    compact_form_ids(plugin, form_id_manager=manager)
+    before = set(manager.used_ids)
+
+    with pytest.raises(ESXError):
+        with Transaction():
+            builder = QuestBuilder(plugin, "SmartMarkers_C", form_id_manager=manager)
+            builder.add_player_ref()
+            builder.add_objective_with_targets(1, "Objective 1", 3)
+            raise ESXError("abandon")
+
+    assert set(manager.used_ids) == before
+
+
+def test_compaction_rolls_back(make_plugin):
+    plugin, manager = _hollow_plugin(make_plugin)
+    ids_before = _defined(plugin)
+    used_before = set(manager.used_ids)
+
+    with pytest.raises(ESXError):
+        with Transaction():
+            compact_form_ids(plugin, form_id_manager=manager)
+            raise ESXError("abandon")
+
+    assert _defined(plugin) == ids_before
+    assert set(manager.used_ids) == used_before
+    assert plugin.tes4.find("HEDR").find("struct").attrib["nextObjectID"] == "00000800"
+
+
+def test_compaction_remaps_saved_assignments(make_plugin, tmp_path):
+    manager = FormIDManager(0x800, 0xFFF, assignments={})
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 3), "SmartMarkers_B": (1, 3)}, manager)
+    group = plugin.groups[0]
+    quest_a = group.records[0]
+    group.remove_record(quest_a)
+    manager.release_ids(defined_form_ids(quest_a))
+    compact_form_ids(plugin, form_id_manager=manager)
+    ids_file = tmp_path / "formids.json"
+    manager.save_assignments(str(ids_file))
+
+    # The next run rebuilds B from the saved map and lands on the same IDs
+    rerun = FormIDManager(0x800, 0xFFF)
+    rerun.load_assignments(str(ids_file))
+    rebuilt, _ = make_plugin({"SmartMarkers_B": (1, 3)}, rerun)
+    assert _defined(rebuilt) == _defined(plugin) == list(range(0x800, 0x805))
+    assert rerun.release_unclaimed() == []
+
+
+def test_manager_only_ids_do_not_collide(make_plugin):
+    plugin, manager = make_plugin({"SmartMarkers_A": (1, 3), "SmartMarkers_B": (1, 3)})
+    group = plugin.groups[0]
+    quest_a = group.records[0]
+    group.remove_record(quest_a)
+    # The manager still holds 0x802, which no record defines any more
+    manager.release_ids([i for i in defined_form_ids(quest_a) if i != 0x802])
+    mapping = compact_form_ids(plugin, form_id_manager=manager)
+
+    assert mapping[0x802] == 0x800
+    assert _defined(plugin) == list(range(0x801, 0x806))
+    assert set(manager.used_ids) == set(range(0x800, 0x806))
+
+
+def test_compaction_keeps_alias_scripts(make_plugin, make_vmad):
+    plugin, manager = _hollow_plugin(make_plugin)
+    quest = plugin.groups[0].records[0]
+    # B's last target alias, and a reference outside the compacted range
+    quest.insert(1, make_vmad([(0x809, "MyScript"), (0x1000, "Outside")]))
+    assert [alias.scripts for alias in quest.aliases] == [[], [], [], ["MyScript"]]
+
+    compact_form_ids(plugin, form_id_manager=manager)
+
+    scripts = {int(alias.index): alias.scripts for alias in quest.aliases}
+    assert scripts == {0x801: [], 0x802: [], 0x803: [], 0x804: ["MyScript"]}
+    objects = [e.attrib["object"] for e in quest.find("VMAD").find("fragments").elements]
+    assert objects == [str(0x804), str(0x1000)]
@@ -0,0 +1,63 @@
+from esx_diff import (
+    ESXEdit,
+    apply_patch,
+    diff_plugins,
+    edits_from_json,
+    edits_to_json,
+    encode_element,
+)
+from esx_lib import ESXElement
+
+OLD = {"SmartMarkers_A": (2, 3)}
+NEW = {"SmartMarkers_A": (2, 4), "SmartMarkers_B": (1, 2)}
+
+
+def test_patch_round_trip(make_plugin):
+    old, _ = make_plugin(OLD)
+    new, _ = make_plugin(NEW)
+    edits = diff_plugins(old, new)
+    assert edits
+
+    base, _ = make_plugin(OLD)
+    apply_patch(base, edits_from_json(edits_to_json(edits)))
+    assert diff_plugins(base, new) == []
+
+
+def test_identical_plugins_have_no_edits(make_plugin):
+    assert diff_plugins(make_plugin(OLD)[0], make_plugin(OLD)[0]) == []
+
+
+def test_add_with_missing_anchor_appends(make_plugin):
+    plugin, _ = make_plugin(OLD)
+    quest = plugin.groups[0].records[0]
+    key = f"id:{quest.attrib['id'].lower()}"
+    edit = ESXEdit(
+        "add",
+        ["QUST", key, "field:XNAM:0"],
+        after="nonexistent",
+        elements=[encode_element(ESXElement("XNAM", text="1"))],
+    )
+    apply_patch(plugin, [edit])
+    assert quest.elements[-1].tag == "XNAM"
+
+
+def test_record_add_with_missing_anchor_appends(make_plugin):
+    plugin, _ = make_plugin(OLD)
+    other, _ = make_plugin({"SmartMarkers_C": (1, 1)})
+    record = other.groups[0].records[0]
+    record.attrib["id"] = "00000FFF"
+    edit = ESXEdit(
+        "add", ["QUST", "id:00000fff"], after="id:nonexistent", elements=[encode_element(record)]
+    )
+    apply_patch(plugin, [edit])
+    assert plugin.groups[0].records[-1].attrib["id"] == "00000FFF"
+
+
+def test_patch_round_trip_with_renumbered_quests(make_plugin):
+    # Growing A shifts B's FormID; B is matched by editor ID instead
+    old_shape = {"SmartMarkers_A": (1, 2), "SmartMarkers_B": (2, 2)}
+    new_shape = {"SmartMarkers_A": (1, 5), "SmartMarkers_B": (2, 2)}
+    new, _ = make_plugin(new_shape)
+    base, _ = make_plugin(old_shape)
+    apply_patch(base, diff_plugins(make_plugin(old_shape)[0], new))
+    assert diff_plugins(base, new) == []
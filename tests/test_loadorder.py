@@ -0,0 +1,69 @@
+from esx_lib import write_plugin_to_xml
+from esx_loadorder import LoadOrder, plugin_name_for, read_plugins_txt
+
+
+def _write(plugin, path, flags=0, masters=()):
+    plugin.tes4.attrib["flags"] = f"0x{flags:08x}"
+    for master in masters:
+        plugin.tes4.add_master(master)
+    write_plugin_to_xml(plugin, str(path))
+    return str(path)
+
+
+def _load_order(make_plugin, tmp_path):
+    """Skyrim.esm (no file), light A.esx (quest 0x800), then B.esx on both"""
+    light, _ = make_plugin({"SmartMarkers_A": (1, 3)})
+    # Without masters, A's own records are 00xxxxxx
+    light.tes4.remove_many(light.tes4.find_all("MAST") + light.tes4.find_all("DATA"))
+    light.tes4.masters.clear()
+    full, _ = make_plugin({"SmartMarkers_B": (1, 2)})
+    # B's PlayerRef alias points at A's quest record
+    full.groups[0].records[0].find("ALFR").text = "01000800"
+    load_order = LoadOrder()
+    load_order.add("Skyrim.esm")
+    load_order.add_file(_write(light, tmp_path / "A.esx", flags=0x200))
+    load_order.add_file(_write(full, tmp_path / "B.esx", masters=["A.esp"]))
+    return load_order
+
+
+def test_resolve_across_full_and_light_slots(make_plugin, tmp_path):
+    load_order = _load_order(make_plugin, tmp_path)
+    assert [str(plugin.slot) for plugin in load_order] == ["00", "FE 000", "01"]
+
+    assert load_order.resolve("A.esp", 0x01000802) == 0xFE000802
+    assert load_order.resolve("B.esp", "01000802") == 0xFE000802
+    assert load_order.resolve("B.esp", 0x00000014) == 0x00000014
+    # Master indexes past the last master mean the plugin itself
+    assert load_order.resolve("B.esp", 0x02000800) == 0x01000800
+    assert load_order.resolve("B.esp", 0x07000800) == 0x01000800
+
+    assert load_order.owner(0xFE000802).name == "A.esp"
+    assert load_order.to_local("B.esp", 0xFE000802) == 0x01000802
+    assert load_order.to_local("B.esp", 0x01000801) == 0x02000801
+
+
+def test_references_and_masters_are_checked(make_plugin, tmp_path):
+    load_order = _load_order(make_plugin, tmp_path)
+    assert load_order.check_masters() == []
+    assert load_order.defines(0xFE000800) is True
+    # Aliases are not records
+    assert load_order.defines(0xFE000802) is False
+    assert load_order.defines(0x00000014) is None
+
+    resolved, errors = load_order.check_references("B.esp")
+    assert (resolved, errors) == (1, [])
+
+    broken = tmp_path / "B.esx"
+    broken.write_text(broken.read_text().replace("01000800", "01000900"))
+    reordered = LoadOrder.from_names(["Skyrim.esm", "B.esp", "A.esp"], str(tmp_path))
+    assert reordered.check_masters() == ["B.esp: master A.esp loads after it"]
+    _, errors = reordered.check_references("B.esp")
+    assert errors == ["B.esp SmartMarkers_B: ALFR 01000900 (fe000900) is not defined in A.esp"]
+
+
+def test_plugin_names_and_plugins_txt(tmp_path):
+    assert plugin_name_for("/data/SmartMarkers.esx.gz") == "SmartMarkers.esp"
+    assert plugin_name_for("Update.esm") == "Update.esm"
+    plugins_txt = tmp_path / "plugins.txt"
+    plugins_txt.write_text("# comment\n*Skyrim.esm\nDisabled.esp\n*SmartMarkers.esp\n")
+    assert read_plugins_txt(str(plugins_txt)) == ["Skyrim.esm", "SmartMarkers.esp"]
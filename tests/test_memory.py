@@ -0,0 +1,45 @@
+"""Peak-memory regression tests against esx_memory_budgets.json
+
+``python esx_memcheck.py record`` updates the budgets after an intended change.
+"""
+
+import json
+
+import pytest
+
+from esx_bench import SCENARIOS
+from esx_memcheck import (
+    BUDGET_SCENARIOS,
+    DEFAULT_BUDGETS_FILE,
+    DEFAULT_TOLERANCE,
+    PHASES,
+    check,
+    measure_scenario,
+)
+
+with open(DEFAULT_BUDGETS_FILE, encoding="UTF-8") as f:
+    BUDGETS = json.load(f)
+
+
+@pytest.fixture(scope="module", params=BUDGET_SCENARIOS)
+def measured(request, tmp_path_factory):
+    workdir = tmp_path_factory.mktemp(request.param)
+    return request.param, measure_scenario(SCENARIOS[request.param], str(workdir))
+
+
+@pytest.mark.parametrize("phase", PHASES)
+def test_peak_within_budget(measured, phase):
+    name, peaks = measured
+    budget = BUDGETS["scenarios"][name][phase]
+    tolerance = BUDGETS.get("tolerance", DEFAULT_TOLERANCE)
+    assert peaks[phase] <= budget * (1 + tolerance), (
+        f"{name}/{phase} peaked at {peaks[phase]} bytes, budget {budget} + {tolerance:.0%}"
+    )
+
+
+def test_check_reports_growth():
+    budgets = {"tolerance": 0.1, "scenarios": {"s": {"parse": 1000}}}
+    _, failures = check(budgets, {"s": {"parse": 1101}})
+    assert len(failures) == 1 and failures[0].startswith("s/parse")
+    assert check(budgets, {"s": {"parse": 1100}})[1] == []
+    assert check(budgets, {"s": {"write_pretty": 1}})[1] == ["s/write_pretty: no budget recorded"]
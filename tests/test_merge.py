@@ -0,0 +1,83 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from esx_lib import FormIDManager
+from esx_merge import defined_form_ids, merge_plugins
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _records(plugin):
+    return [record for group in plugin.groups for record in group.records]
+
+
+def test_merge_remaps_overlapping_ids(make_plugin):
+    first, _ = make_plugin({"SmartMarkers_A": (1, 3)})
+    second, _ = make_plugin({"SmartMarkers_B": (2, 2)})
+    result = merge_plugins([first, second])
+
+    assert result.conflicts == []
+    ids = [i for record in _records(result.plugin) for i in defined_form_ids(record)]
+    assert ids == list(range(0x800, 0x800 + 5 + 6))
+    assert result.remaps[1].ids[0x800] == 0x805
+    # Targets and conditions follow their aliases
+    quest_b = _records(result.plugin)[1]
+    assert [t["alias"] for o in quest_b.objectives for t in o.targets] == [
+        0x807,
+        0x808,
+        0x809,
+        0x80A,
+    ]
+    params = {p.text for ctda in quest_b.find_all("CTDA") for p in ctda.find_all("param1")}
+    assert params == {
+        "0x00000807",
+        "0x00000808",
+        "0x00000809",
+        "0x0000080a",
+    }
+
+
+def test_merge_remaps_alias_scripts(make_plugin, make_vmad):
+    first, _ = make_plugin({"SmartMarkers_A": (1, 3)})
+    second, _ = make_plugin({"SmartMarkers_B": (1, 2)})
+    # B's second target (0x803) and a stale ID that B does not define
+    _records(second)[0].insert(1, make_vmad([(0x803, "TargetScript"), (0x900, "Stale")]))
+    result = merge_plugins([first, second], names=["first", "second"])
+
+    quest_b = _records(result.plugin)[1]
+    scripts = {int(alias.index): alias.scripts for alias in quest_b.aliases}
+    assert scripts == {0x806: [], 0x807: [], 0x808: ["TargetScript"]}
+    objects = [e.attrib["object"] for e in quest_b.find("VMAD").find("fragments").elements]
+    assert objects == [str(0x808), str(0x900)]
+    assert result.conflicts == ["second: SmartMarkers_B references undefined alias 2304"]
+
+
+def test_merge_skips_duplicate_editor_ids(make_plugin):
+    first, _ = make_plugin({"SmartMarkers_A": (1, 3)})
+    second, _ = make_plugin({"SmartMarkers_A": (1, 1), "SmartMarkers_B": (1, 1)})
+    result = merge_plugins([first, second], names=["first", "second"])
+
+    editor_ids = [record.editor_id for record in _records(result.plugin)]
+    assert editor_ids == ["SmartMarkers_A", "SmartMarkers_B"]
+    assert len(result.conflicts) == 1 and "already defined by first" in result.conflicts[0]
+
+
+def test_duplicate_ids_do_not_use_the_budget(make_plugin):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 1), "SmartMarkers_B": (1, 1)})
+    # B now claims A's quest FormID as well
+    _records(plugin)[1].attrib["id"] = "00000800"
+    manager = FormIDManager(0x800, 0xFFF)
+    result = merge_plugins([plugin], form_id_manager=manager)
+
+    assert result.conflicts == ["Form ID 0x800 defined more than once"]
+    assert manager.get_used_count() == 5
+
+
+def test_cli_fails_on_missing_input(tmp_path):
+    output = tmp_path / "merged.esx"
+    args = [sys.executable, str(ROOT / "esx_merge.py"), str(output), "nope1.esx", "nope2.esx"]
+    result = subprocess.run(args, capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "Error:" in result.stdout
+    assert not output.exists()
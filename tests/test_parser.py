@@ -0,0 +1,90 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from esx_lib import ESXParser, FormID, write_plugin_to_xml
+
+# Covers what the two backends could disagree on: pretty-printing
+# whitespace and tails, entities, namespaced names, children the parser
+# does not copy, and records without a schema
+EDGE_CASES = b"""<?xml version='1.0' encoding='UTF-8'?>
+<plugin version="0.7.4" xmlns:x="urn:x">
+  <TES4 flags="0x00000000" id="00000000">
+    <HEDR><struct version="1.71" nextObjectID="00000802" /><ignored /></HEDR>
+    <CNAM>A &amp; B<nested>dropped</nested>tail</CNAM>
+    <MAST>Skyrim.esm</MAST>
+  </TES4>
+  <unknown><child /></unknown>
+  <GRUP label="QUST" groupType="0" x:extra="1">
+    <QUST id="00000800" flags="0x00000000">
+      <EDID>SmartMarkers_A</EDID>
+      <FULL xml:lang="en">Quest &lt;A&gt;</FULL>
+      <ALST>2049</ALST>
+      <ALID>PlayerRef</ALID>
+      <ALED />
+      <CTDA><operator>0x00</operator><x:param1>0x00000801</x:param1></CTDA>
+    </QUST>
+    <MISC id="00000801"><EDID>Other</EDID><DATA><a>1</a>tail</DATA></MISC>
+  </GRUP>
+</plugin>
+"""
+
+
+def _dump(element, depth=0):
+    rows = [(depth, type(element).__name__, element.tag, element.attrib, element.text)]
+    for child in element.elements:
+        assert child.parent is element
+        rows.extend(_dump(child, depth + 1))
+    return rows
+
+
+def _parse_both(path):
+    return (
+        ESXParser().parse_file(str(path)),
+        ESXParser().parse_file(str(path), backend="expat"),
+    )
+
+
+def test_expat_matches_etree_on_edge_cases(tmp_path):
+    path = tmp_path / "edge.esx"
+    path.write_bytes(EDGE_CASES)
+    etree, expat = _parse_both(path)
+
+    assert _dump(expat) == _dump(etree)
+    assert expat.tes4.masters == etree.tes4.masters == ["Skyrim.esm"]
+    quest = expat.groups[0].records[0]
+    assert quest.editor_id == "SmartMarkers_A"
+    assert quest.full_name == "Quest <A>"
+    assert [alias.name for alias in quest.aliases] == ["PlayerRef"]
+    assert "{urn:x}extra" in expat.groups[0].attrib
+
+
+@pytest.mark.parametrize("pretty", [False, True])
+def test_expat_matches_etree_on_generated_plugins(make_plugin, tmp_path, pretty):
+    plugin, _ = make_plugin({"SmartMarkers_A": (2, 3), "SmartMarkers_B": (1, 4)})
+    path = tmp_path / "generated.esx"
+    write_plugin_to_xml(plugin, str(path), pretty=pretty)
+    etree, expat = _parse_both(path)
+
+    assert _dump(expat) == _dump(etree)
+    for parsed in (etree, expat):
+        quests = parsed.groups[0].records
+        assert [len(q.aliases) for q in quests] == [7, 5]
+        assert [len(o.targets) for o in quests[0].objectives] == [3, 3]
+
+
+def test_expat_reports_parse_errors_like_etree(tmp_path):
+    path = tmp_path / "broken.esx"
+    path.write_bytes(b"<plugin><TES4></plugin>")
+    for backend in ("etree", "expat"):
+        with pytest.raises(ET.ParseError):
+            ESXParser().parse_file(str(path), backend=backend)
+
+
+def test_form_id_text_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(FormID, "PARSE_CACHE_SIZE", 4)
+    for value in range(0x800, 0x810):
+        assert FormID.parse(f"0x{value:x}") == FormID.parse(f"{value:08x}") == value
+        assert FormID.from_decimal(str(value)) is FormID(value)
+        assert len(FormID._from_hex) <= 4
+        assert len(FormID._from_decimal) <= 4
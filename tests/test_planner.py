@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+
+from esx_lib import ESXPlugin, ESXValidationError, FormIDManager, validate_esl_compatibility
+from esx_planner import (
+    ESL_BUDGET,
+    Category,
+    journal_categories,
+    plan_capacity,
+    plugins_needed,
+)
+
+CONFIG = Path(__file__).resolve().parent.parent / "SKSE" / "Plugins" / "SmartMarkers.toml"
+
+
+def test_journal_fills_the_budget():
+    plan = plan_capacity([Category("journal", objectives=20, min_aliases=100)])
+    assert plan.aliases == {"journal": 102}
+    assert plan.form_ids() == 2042
+    # Another alias per objective would need 20 more
+    assert 0 <= plan.spare < 20
+
+
+def test_caps_and_weights():
+    categories = [
+        Category("capped", quests=2, objectives=1, min_aliases=5, max_aliases=10),
+        Category("light", quests=1, objectives=2, min_aliases=1),
+        Category("heavy", quests=1, objectives=2, min_aliases=1, weight=3),
+    ]
+    plan = plan_capacity(categories, budget=100)
+    assert plan.aliases["capped"] == 10
+    # heavy takes three steps for each of light's
+    assert plan.aliases["heavy"] - 1 >= 3 * (plan.aliases["light"] - 1)
+    assert plan.aliases["light"] + plan.aliases["heavy"] == 36
+    assert plan.spare < 2
+
+
+def test_exact_demand_is_unchanged():
+    category = Category("exact", quests=3, objectives=2, min_aliases=7, max_aliases=7)
+    plan = plan_capacity([category])
+    assert plan.aliases == {"exact": 7}
+    assert plan.spare == ESL_BUDGET - 3 * (2 + 14)
+
+
+def test_infeasible_demand_suggests_plugins():
+    categories = [Category("big", quests=3, objectives=10, min_aliases=150)]
+    assert plugins_needed(categories) == 3
+    with pytest.raises(ESXValidationError, match="3 plugins would fit it"):
+        plan_capacity(categories)
+
+    plan = plan_capacity(categories, plugins=3)
+    assert [len(plan.quests_in(plugin)) for plugin in range(3)] == [1, 1, 1]
+    assert all(plan.form_ids(plugin) <= ESL_BUDGET for plugin in range(3))
+
+
+def test_large_budgets_solve_quickly():
+    categories = [
+        Category("misc", quests=20, objectives=1, min_aliases=30),
+        Category("single", quests=4, objectives=1, min_aliases=15),
+        Category("multi", quests=4, objectives=15, min_aliases=15),
+    ]
+    plan = plan_capacity(categories, plugins=4, budget=0xFFF7FF)
+    assert plan.seconds < 0.1
+    assert all(plan.form_ids(plugin) <= 0xFFF7FF for plugin in range(4))
+    assert plan.aliases["misc"] > 790000
+
+
+def test_build_matches_the_plan():
+    categories = [
+        Category("a", quests=2, objectives=3, min_aliases=10, quest_type=6, priority=5),
+        Category("b", quests=1, objectives=1, min_aliases=50),
+    ]
+    plan = plan_capacity(categories)
+    plugin = ESXPlugin(tag="plugin")
+    manager = FormIDManager()
+    builders = plan.build(plugin, form_id_manager=manager)
+
+    assert len(builders) == 3
+    assert manager.get_used_count() == plan.form_ids() == ESL_BUDGET - plan.spare
+    compatible, _, errors = validate_esl_compatibility(plugin)
+    assert compatible, errors
+    quest = builders[0].quest
+    assert quest.editor_id == "SmartMarkers_a_01"
+    assert quest.priority == 5
+    assert len(quest.objectives) == 3
+    assert all(len(objective.targets) == plan.aliases["a"] for objective in quest.objectives)
+
+
+def test_journal_categories_from_config():
+    categories = journal_categories(str(CONFIG), exact=True)
+    assert categories and all(c.max_aliases == c.min_aliases for c in categories)
+    assert plan_capacity(categories).aliases == {c.name: c.min_aliases for c in categories}
@@ -0,0 +1,55 @@
+from esx_lib import ESXElement, ESXParser, write_plugin_to_xml
+
+
+def _condition(function_index, value):
+    ctda = ESXElement("CTDA")
+    ctda.append(ESXElement("operator", text="Equal to"))
+    ctda.append(ESXElement("comparisonValueFloat", text=str(value)))
+    ctda.append(ESXElement("functionIndex", text=str(function_index)))
+    return ctda
+
+
+def _quest_with_alias_data(make_plugin, make_vmad):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 2)})
+    quest = plugin.groups[0].records[0]
+    assert [alias.conditions for alias in quest.aliases] == [[], [], []]
+
+    # Condition inside the first target alias block, scripts on two aliases
+    alid = next(e for e in quest.elements if e.text == "Objective1_Target1")
+    quest.insert(quest.elements.index(alid) + 1, _condition(72, 1.0))
+    quest.insert(1, make_vmad([(0x802, "AliasScriptA"), (0x801, "PlayerScript")]))
+    return plugin, quest
+
+
+def test_alias_rows_carry_conditions_and_scripts(make_plugin, make_vmad):
+    _, quest = _quest_with_alias_data(make_plugin, make_vmad)
+    player, first, second = quest.aliases
+
+    assert [(c.function_index, c.comparison_value) for c in first.conditions] == [(72, 1.0)]
+    assert second.conditions == [] and player.conditions == []
+    assert first.scripts == ["AliasScriptA"]
+    assert player.scripts == ["PlayerScript"]
+    assert second.scripts == []
+
+    alias = first.to_alias()
+    assert alias.scripts == ["AliasScriptA"]
+    assert alias.conditions[0].operator == "Equal to"
+    # Target conditions after QSTA stay with the target, not the alias
+    assert len(quest.objectives[0].targets[0]["conditions"]) == 1
+
+
+def test_alias_data_follows_edits_and_reparse(make_plugin, make_vmad, tmp_path):
+    plugin, quest = _quest_with_alias_data(make_plugin, make_vmad)
+    assert quest.aliases[1].scripts == ["AliasScriptA"]
+
+    vmad = quest.find("VMAD")
+    quest.remove(vmad)
+    assert quest.aliases[1].scripts == []
+    assert len(quest.aliases[1].conditions) == 1
+
+    quest.insert(1, vmad)
+    path = tmp_path / "quest.esx"
+    write_plugin_to_xml(plugin, str(path))
+    parsed = ESXParser().parse_file(str(path)).groups[0].records[0]
+    assert [a.scripts for a in parsed.aliases] == [["PlayerScript"], ["AliasScriptA"], []]
+    assert [len(a.conditions) for a in parsed.aliases] == [0, 1, 0]
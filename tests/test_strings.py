@@ -0,0 +1,71 @@
+import pytest
+
+from esx_lib import ESXError, write_plugin_to_xml
+from esx_strings import (
+    StringsFile,
+    StringTables,
+    delocalize_plugin,
+    is_localized,
+    localize_plugin,
+    write_strings_file,
+)
+
+
+def test_localize_round_trip(make_plugin, tmp_path):
+    plugin, _ = make_plugin({"SmartMarkers_A": (2, 1), "SmartMarkers_B": (1, 1)})
+    plugin.tes4.attrib["flags"] = "0x00000000"  # As in files written by xEdit
+    original = tmp_path / "original.esx"
+    write_plugin_to_xml(plugin, str(original))
+
+    tables = localize_plugin(plugin)
+    assert is_localized(plugin)
+    quest_a, quest_b = plugin.groups[0].records
+    assert quest_a.full_name == str(tables.add("SmartMarkers_A Name"))
+    # Both quests say "Objective 1": one string, one ID
+    assert quest_a.objectives[0].name == quest_b.objectives[0].name
+    assert len(tables) == 4
+
+    strings_dir = tmp_path / "Strings"
+    tables.write(str(strings_dir), "SmartMarkers")
+    loaded = StringTables.load(str(strings_dir), "SmartMarkers")
+    assert delocalize_plugin(plugin, loaded) == 5
+    assert not is_localized(plugin)
+    assert quest_b.full_name == "SmartMarkers_B Name"
+
+    restored = tmp_path / "restored.esx"
+    write_plugin_to_xml(plugin, str(restored))
+    assert restored.read_bytes() == original.read_bytes()
+
+
+def test_table_files_share_equal_texts(tmp_path):
+    path = tmp_path / "SmartMarkers_english.DLSTRINGS"
+    entries = {1: "Café", 2: "Misc Objective 1", 5: "Misc Objective 1", 9: ""}
+    write_strings_file(str(path), entries, "DLSTRINGS")
+
+    table = StringsFile.read(str(path))
+    assert table.kind == "DLSTRINGS"
+    assert dict(table) == entries
+    # Header, four directory entries, then three texts with length prefixes
+    assert len(path.read_bytes()) == 8 + 4 * 8 + (4 + 5) + (4 + 17) + (4 + 1)
+
+
+def test_loaded_tables_continue_ids(tmp_path):
+    tables = StringTables()
+    first = tables.add("Quest Name")
+    tables.add("Long text", "DLSTRINGS")
+    tables.write(str(tmp_path), "SmartMarkers")
+
+    loaded = StringTables.load(str(tmp_path), "SmartMarkers")
+    assert loaded.add("Quest Name") == first
+    assert loaded.add("Quest Name", "ILSTRINGS") == 3
+    assert loaded.get(2, "DLSTRINGS") == "Long text"
+
+
+def test_missing_and_unencodable_strings_fail(make_plugin, tmp_path):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 1)})
+    localize_plugin(plugin)
+    with pytest.raises(ESXError, match="missing"):
+        delocalize_plugin(plugin, StringTables())
+
+    with pytest.raises(ESXError, match="cp1252"):
+        write_strings_file(str(tmp_path / "bad.STRINGS"), {1: "日本"})
@@ -0,0 +1,96 @@
+import pytest
+
+from esx_lib import (
+    ESXElement,
+    ESXError,
+    ESXFormIDConflictError,
+    FormIDManager,
+    QuestBuilder,
+    Transaction,
+)
+
+
+def _snapshot(element):
+    return (
+        element.tag,
+        dict(element.attrib),
+        element.text,
+        [_snapshot(child) for child in element.elements],
+    )
+
+
+def _quest_state(plugin, manager):
+    quest = plugin.groups[0].records[0]
+    return (
+        _snapshot(plugin),
+        [(alias.index, alias.name) for alias in quest.aliases],
+        [(o.index, len(o.targets)) for o in quest.objectives],
+        set(manager.used_ids),
+    )
+
+
+def test_failed_build_rolls_back_quest_and_manager(make_plugin):
+    manager = FormIDManager(0x800, 0x808)
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 3)}, manager)
+    before = _quest_state(plugin, manager)
+
+    # Room for 4 more IDs: the builder's and the first objective's fit
+    with pytest.raises(ESXFormIDConflictError):
+        with Transaction():
+            builder = QuestBuilder(plugin, "SmartMarkers_A", form_id_manager=manager)
+            builder.add_objective_with_targets(2, "Objective 2", 3)
+            builder.add_objective_with_targets(3, "Objective 3", 3)
+
+    assert _quest_state(plugin, manager) == before
+    builder = QuestBuilder(plugin, "SmartMarkers_A", form_id_manager=manager)
+    builder.add_objective_with_targets(2, "Objective 2", 3)
+    assert [len(o.targets) for o in plugin.groups[0].records[0].objectives] == [3, 3]
+
+
+def test_touched_fields_and_moved_children_are_restored():
+    first = ESXElement("QUST", attrib={"id": "00000800"})
+    second = ESXElement("QUST", attrib={"id": "00000801"})
+    edid = ESXElement("EDID", text="SmartMarkers_A")
+    first.append(edid)
+    before = (_snapshot(first), _snapshot(second))
+
+    transaction = Transaction()
+    transaction.begin()
+    edid.touch()
+    edid.text = "Renamed"
+    first.touch()
+    first.attrib["id"] = "00000900"
+    first.remove(edid)
+    second.append(edid)
+    first.insert(0, ESXElement("FULL", text="New"))
+    transaction.rollback()
+
+    assert (_snapshot(first), _snapshot(second)) == before
+    assert edid.parent is first
+
+
+def test_outer_rollback_undoes_committed_inner_transaction():
+    root = ESXElement("GRUP")
+    root.append(ESXElement("QUST"))
+    with pytest.raises(ESXError):
+        with Transaction():
+            with Transaction():
+                root.append(ESXElement("QUST"))
+            root.elements[0].touch()
+            root.elements[0].text = "changed"
+            raise ESXError("abandon")
+
+    assert _snapshot(root) == ("GRUP", {}, None, [("QUST", {}, None, [])])
+
+
+def test_only_the_innermost_transaction_can_end():
+    outer = Transaction()
+    outer.begin()
+    inner = Transaction()
+    inner.begin()
+    with pytest.raises(ESXError):
+        outer.commit()
+    inner.commit()
+    outer.commit()
+    with pytest.raises(ESXError):
+        outer.rollback()
@@ -0,0 +1,126 @@
+import os
+import stat
+
+import pytest
+
+from esx_lib import ESXError, ESXParser, validate_quest_structure
+from esx_watch import JournalSpec, WatchSession, load_journal_specs
+
+
+def _spec(key, objectives, aliases, name=None, editor_id=None):
+    return JournalSpec(
+        key, editor_id or f"SmartMarkers_{key}", name or f"{key} Name", objectives, aliases
+    )
+
+
+def _ids(session):
+    """Alias name -> FormID per journal, and every ID the plugin uses"""
+    names = {}
+    used = set()
+    for key, builder in session.builders.items():
+        quest = builder.quest
+        assert validate_quest_structure(quest)[0]
+        names[key] = {alias.name: int(alias.index) for alias in quest.aliases}
+        used.add(builder.quest_form_id)
+        used.update(names[key].values())
+    assert used == set(session.form_id_manager.used_ids)
+    return names
+
+
+def _layout(session):
+    return {
+        key: [len(o.targets) for o in builder.quest.objectives]
+        for key, builder in session.builders.items()
+    }
+
+
+def test_incremental_apply_keeps_surviving_ids(tmp_path):
+    session = WatchSession()
+    session.apply({"A": _spec("A", 2, 3), "B": _spec("B", 1, 2)})
+    before = _ids(session)
+
+    changes = session.apply({"A": _spec("A", 3, 2, name="Renamed")})
+    assert changes == [
+        "removed journal B",
+        "A: renamed to 'Renamed'",
+        "A: 3 -> 2 aliases per objective",
+        "A: added objectives 3-3",
+    ]
+    after = _ids(session)
+    kept = {name: form_id for name, form_id in after["A"].items() if name in before["A"]}
+    assert kept == {
+        name: form_id
+        for name, form_id in before["A"].items()
+        if not name.endswith("_Target3")
+    }
+    assert session.builders["A"].quest.full_name == "Renamed"
+    assert session.apply({"A": _spec("A", 3, 2, name="Renamed")}) == []
+
+    # The same specs built from scratch give the same layout
+    fresh = WatchSession()
+    fresh.apply({"A": _spec("A", 3, 2, name="Renamed")})
+    assert _layout(session) == _layout(fresh) == {"A": [2, 2, 2]}
+
+    output = tmp_path / "SmartMarkers.esx"
+    session.write(str(output))
+    quest = ESXParser().parse_file(str(output)).groups[0].records[0]
+    assert {alias.name: int(alias.index) for alias in quest.aliases} == after["A"]
+
+
+def test_failed_apply_leaves_session_unchanged():
+    session = WatchSession(0x800, 0x80F)
+    specs = {"A": _spec("A", 2, 3)}
+    session.apply(specs)
+    before = (_ids(session), _layout(session))
+
+    with pytest.raises(ESXError):
+        session.apply({"A": _spec("A", 2, 3), "B": _spec("B", 3, 3)})
+
+    assert (_ids(session), _layout(session)) == before
+    assert session.specs == specs
+    assert session.apply({"A": _spec("A", 2, 4)}) == ["A: 3 -> 4 aliases per objective"]
+
+
+def test_ids_survive_restarts(tmp_path):
+    ids_file = str(tmp_path / "formids.json")
+    specs = {"A": _spec("A", 2, 2), "B": _spec("B", 1, 3)}
+    first = WatchSession(assignments_file=ids_file)
+    first.apply(specs)
+    first.write(str(tmp_path / "first.esx"))
+
+    second = WatchSession(assignments_file=ids_file)
+    second.apply({"B": specs["B"], "A": specs["A"]})
+    assert _ids(second) == _ids(first)
+
+
+def test_journal_specs_from_config(tmp_path):
+    config = tmp_path / "SmartMarkers.toml"
+    config.write_text(
+        "[Journal.Misc]\n"
+        'name = "Misc"\n'
+        "objective_count = 2\n"
+        "reference_aliases_per_objective = 5\n"
+        "[Journal.Other]\n"
+        'quest = ["Other.esp", 0x800]\n'
+    )
+    assert load_journal_specs(str(config)) == {
+        "Misc": JournalSpec("Misc", "SmartMarkers_Misc", "Misc", 2, 5)
+    }
+
+
+def test_rebuilds_keep_the_output_mode(tmp_path):
+    session = WatchSession()
+    session.apply({"A": _spec("A", 1, 2)})
+    output = tmp_path / "SmartMarkers.esx"
+    old_umask = os.umask(0o022)
+    try:
+        session.write(str(output))
+        assert stat.S_IMODE(os.stat(output).st_mode) == 0o644
+        os.chmod(output, 0o664)
+        for canonical in (False, True):
+            session.apply({"A": _spec("A", 1, 3 + canonical)})
+            session.write(str(output), canonical=canonical)
+            assert stat.S_IMODE(os.stat(output).st_mode) == 0o664
+    finally:
+        os.umask(old_umask)
+    assert sorted(os.listdir(tmp_path)) == ["SmartMarkers.esx"]
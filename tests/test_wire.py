@@ -0,0 +1,69 @@
+import pickle
+
+import pytest
+
+from esx_lib import (
+    ESXError,
+    ESXQuest,
+    element_from_wire,
+    element_to_wire,
+    write_plugin_to_xml,
+)
+
+
+def _shape(element):
+    return (
+        type(element),
+        element.tag,
+        element.attrib,
+        element.text,
+        [_shape(child) for child in element.elements],
+    )
+
+
+def _check_parents(element):
+    for child in element.elements:
+        assert child.parent is element
+        _check_parents(child)
+
+
+def test_plugin_pickles_through_the_wire_format(make_plugin, tmp_path):
+    plugin, _ = make_plugin({"SmartMarkers_A": (2, 3), "SmartMarkers_B": (1, 2)})
+    copy = pickle.loads(pickle.dumps(plugin, pickle.HIGHEST_PROTOCOL))
+
+    assert _shape(copy) == _shape(plugin)
+    _check_parents(copy)
+    assert copy.tes4 is copy.elements[0]
+    group = copy.groups[0]
+    assert group.records == group.elements
+    quest = group.records[0]
+    assert isinstance(quest, ESXQuest)
+    assert quest.editor_id == "SmartMarkers_A"
+    assert [alias.name for alias in quest.aliases] == [
+        alias.name for alias in plugin.groups[0].records[0].aliases
+    ]
+
+    original, restored = tmp_path / "original.esx", tmp_path / "restored.esx"
+    write_plugin_to_xml(plugin, str(original))
+    write_plugin_to_xml(copy, str(restored))
+    assert restored.read_bytes() == original.read_bytes()
+
+
+def test_subtree_copy_is_detached(make_plugin):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 2)})
+    quest = plugin.groups[0].records[0]
+    copy = element_from_wire(element_to_wire(quest))
+
+    assert copy.parent is None
+    assert _shape(copy) == _shape(quest)
+    assert [o.index for o in copy.objectives] == [1]
+    # Edits to the copy do not reach the original
+    copy.elements[0].text = "Changed"
+    assert quest.elements[0].text == "SmartMarkers_A"
+
+
+def test_unknown_wire_version_is_rejected(make_plugin):
+    plugin, _ = make_plugin({"SmartMarkers_A": (1, 1)})
+    wire = element_to_wire(plugin)
+    with pytest.raises(ESXError):
+        element_from_wire((wire[0] + 1,) + wire[1:])